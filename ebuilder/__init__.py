@@ -9,10 +9,26 @@ Tools for building encounters using CR2.0
 https://www.gmbinder.com/share/-N4m46K77hpMVnh7upYa
 
 """
+from .batch import run_batch
+from .cache import ResultCache, cache_key
+from .campaign import CampaignSimulator
+from .challenge import recalculate_cr
+from .dice import DiceExpression, damage_index
 from .encounter import AdventuringDay, Encounter
+from .grid import DifficultyGrid
+from .incremental import IncrementalAdventuringDay, IncrementalEncounter
+from .instrument import disable_stats, enable_stats, reset_stats, stats
+from .library import Library
+from .loot import LootSampler
 from .main import main
-from .monsters import Monster, MonsterParty, cr_num_to_str, cr_str_to_num
+from .monsters import (
+    Monster, MonsterParty, cr_num_to_str, cr_str_to_num, search_monsters
+)
 from .party import Party
+from .party_frame import PartyFrame
 from .pc import PlayerCharacter
 from .randomizer import Randomizer
-from .sorlock import SorlockState, sorlock_table_level
\ No newline at end of file
+from .render import render_items
+from .shared import export_shared, use_shared
+from .simulator import CombatSimulator
+from .sorlock import SorlockState, sorlock_table_level
@@ -0,0 +1,222 @@
+"""
+
+======
+aio.py
+======
+
+Asyncio interface to the encounter builder for use inside event loops
+
+"""
+
+import os
+
+import json
+
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .encounter import AdventuringDay, Encounter
+from .main import monster_party_from_names
+from .monsters import MonsterParty
+from .party import Party
+from .randomizer import Randomizer
+
+
+def _read_text(path):
+    """Read a text file"""
+    with open(path, "r") as text_file:
+        return text_file.read()
+
+
+def _score(adventuring_day):
+    """Structured results of an adventuring day"""
+    return adventuring_day.to_dict()
+
+
+class AsyncBuilder():
+    """
+    Class for awaitable loading and scoring that keeps the event loop responsive
+
+    File reads, compendium builds, and scoring run in an executor. Concurrent requests
+    for the same compendium share one load, and the loaded compendiums are kept until
+    clear is called. Awaiting callers can be cancelled at any time; a shared load keeps
+    running for the other callers.
+    """
+
+    def __init__(self, executor=None, max_workers=None, randomizer=None):
+        """
+        Constructor for the async builder
+
+        Parameters
+        ----------
+        executor : concurrent.futures.Executor, optional
+            Executor for the blocking work. A process pool isolates the pandas work
+            from the event loop completely. Defaults to a thread pool owned by the
+            builder
+        max_workers : int, optional
+            Number of threads of the default thread pool. Defaults to the
+            ThreadPoolExecutor default
+        randomizer : ebuilder.Randomizer, optional
+            Randomizer for the compendium. Defaults to a new randomizer
+        """
+        self.owns_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="ebuilder"
+            )
+        if randomizer is None:
+            randomizer = Randomizer()
+        self.executor = executor
+        self.randomizer = randomizer
+        self.shared = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        """Shut down the executor if the builder created it"""
+        if self.owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def clear(self):
+        """Forget the loaded compendiums"""
+        self.shared.clear()
+
+    async def run(self, func, *args):
+        """
+        Run a blocking function in the executor
+
+        Parameters
+        ----------
+        func : callable
+        *args
+            Arguments of func
+
+        Returns
+        -------
+        result
+            Return value of func
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _shared(self, key, func, *args):
+        """Run func once for all concurrent (and later) requests with the same key"""
+        task = self.shared.get(key)
+        if task is None or (task.done() and (task.cancelled() or task.exception())):
+            task = asyncio.ensure_future(self.run(func, *args))
+            self.shared[key] = task
+        # Shield the shared load from the cancellation of any one caller
+        return await asyncio.shield(task)
+
+    async def read_text(self, path):
+        """Read a text file without blocking the event loop"""
+        return await self.run(_read_text, path)
+
+    async def party_from_json(self, json_file):
+        """Awaitable ebuilder.Party.from_json"""
+        return Party.from_list(json.loads(await self.read_text(json_file)))
+
+    async def monster_party_from_json(self, json_file):
+        """Awaitable ebuilder.MonsterParty.from_json"""
+        return MonsterParty.from_list(json.loads(await self.read_text(json_file)))
+
+    async def get_compendium(self, category):
+        """
+        Awaitable ebuilder.Randomizer.get_compendium
+
+        Parameters
+        ----------
+        category : str
+            Category of compendium
+
+        Returns
+        -------
+        compendium : pandas.DataFrame
+            Compendium shared by all callers. Copy it before modifying it.
+        """
+        return await self._shared(
+            ("get_compendium", category), self.randomizer.get_compendium, category
+        )
+
+    async def create_csv(self, category):
+        """
+        Awaitable ebuilder.Randomizer.create_csv
+
+        Concurrent builds of the same category share one build, which also replaces
+        the loaded compendium of the category.
+        """
+        df = await self._shared(
+            ("create_csv", category), self.randomizer.create_csv, category
+        )
+        self.shared.pop(("create_csv", category), None)
+        self.shared.pop(("get_compendium", category), None)
+        return df
+
+    async def score(self, adventuring_day):
+        """
+        Score an adventuring day in the executor
+
+        Parameters
+        ----------
+        adventuring_day : ebuilder.AdventuringDay
+
+        Returns
+        -------
+        results : dict
+            See ebuilder.AdventuringDay.to_dict
+        """
+        return await self.run(_score, adventuring_day)
+
+    async def main(
+        self,
+        party_json,
+        monsters,
+        charge_consumables=None,
+        onetime_consumables=None,
+        difficulty_method="cr2"
+    ):
+        """
+        Awaitable version of ebuilder.main returning the structured results
+
+        Parameters
+        ----------
+        party_json : str
+            Path to party JSON file
+        monsters : list of str
+            List of monster names or list of monster party JSON files
+        charge_consumables : list of str, optional
+            Rarities of consumable magic items that have charges per day
+        onetime_consumables : list of str, optional
+            Rarities of consumable magic items that are one-time use only
+        difficulty_method : str, optional
+            Method for computing difficulty. Defaults to "cr2"
+
+        Returns
+        -------
+        results : dict
+            See ebuilder.AdventuringDay.to_dict
+        """
+        party = await self.party_from_json(party_json)
+        adventuring_day = AdventuringDay(party)
+
+        if await self.run(os.path.isfile, monsters[0]):
+            monster_parties = await asyncio.gather(*[
+                self.monster_party_from_json(monster_json) for monster_json in monsters
+            ])
+        else:
+            # Resolving monster names may load the compendium
+            monster_parties = [await self.run(monster_party_from_names, monsters)]
+        for monster_party in monster_parties:
+            adventuring_day.add(Encounter(party, monster_party, method=difficulty_method))
+
+        for consumable in charge_consumables or []:
+            adventuring_day.add_consumable(consumable, "CHARGE")
+        for consumable in onetime_consumables or []:
+            adventuring_day.add_consumable(consumable, "CONSUMABLE")
+
+        return await self.score(adventuring_day)
@@ -0,0 +1,186 @@
+"""
+
+========
+batch.py
+========
+
+Tools for scoring streams of adventuring days
+
+Each job is one line of JSON with the following entries:
+
+    party : str or list
+        Path to a party JSON file or the list of player characters
+    encounters : list
+        Each encounter is a path to an encounter JSON file, a list of monsters in the
+        encounter JSON format, or a list of monster names and CRs
+    consumables : dict, optional
+        Lists of rarities of "charge" and "onetime" consumable magic items
+    method : str, optional
+        Method for computing difficulty. Defaults to "cr2"
+    id : optional
+        Copied to the result
+
+"""
+
+import json
+
+from collections import deque
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .encounter import AdventuringDay, Encounter
+from .main import monster_party_from_names
+from .monsters import MonsterParty
+from .party import Party
+
+CONSUMABLE_CATEGORIES = {"charge": "CHARGE", "onetime": "CONSUMABLE"}
+"""
+Consumable categories by their key in a job
+"""
+
+JOB_ERRORS = (KeyError, ValueError, TypeError, AttributeError, OSError, RuntimeError)
+"""
+Errors reported in the result of a bad job instead of stopping the batch
+"""
+
+
+def adventuring_day_from_job(job):
+    """
+    Build the adventuring day of a job
+
+    Parameters
+    ----------
+    job : dict
+        Job in the format described in ebuilder.batch
+
+    Returns
+    -------
+    adventuring_day : ebuilder.AdventuringDay
+    """
+    party = job["party"]
+    if isinstance(party, str):
+        party = Party.from_json(party)
+    else:
+        party = Party.from_list(party)
+
+    method = job.get("method", "cr2")
+    adventuring_day = AdventuringDay(party)
+    for encounter in job["encounters"]:
+        if isinstance(encounter, str):
+            monster_party = MonsterParty.from_json(encounter)
+        elif all([isinstance(monster, dict) for monster in encounter]):
+            monster_party = MonsterParty.from_list(encounter)
+        else:
+            monster_party = monster_party_from_names(encounter)
+        adventuring_day.add(Encounter(party, monster_party, method=method))
+
+    for key, rarities in (job.get("consumables") or {}).items():
+        for rarity in rarities:
+            adventuring_day.add_consumable(rarity, CONSUMABLE_CATEGORIES[key])
+
+    return adventuring_day
+
+
+def score_line(index, line):
+    """
+    Score one line of a batch
+
+    Parameters
+    ----------
+    index : int
+        Line number
+    line : str
+        Job as JSON
+
+    Returns
+    -------
+    result : dict
+        "line" and "id" of the job along with either the results (see
+        ebuilder.AdventuringDay.to_dict) or the "error"
+    """
+    result = {"line": index}
+    try:
+        job = json.loads(line)
+        if "id" in job:
+            result["id"] = job["id"]
+        result.update(adventuring_day_from_job(job).to_dict())
+    except JOB_ERRORS as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+    return result
+
+
+def score_lines(lines):
+    """Score a chunk of (line number, line) pairs"""
+    return [score_line(index, line) for index, line in lines]
+
+
+def _chunks(lines, chunk_size):
+    """Group the non-empty lines with their line numbers into chunks"""
+    chunk = []
+    for index, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        chunk.append((index, line))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(lines, jobs=1, ordered=True, chunk_size=64, max_pending=None):
+    """
+    Score a stream of jobs
+
+    Lines are read as they are needed and only a bounded number of chunks are in
+    flight, so arbitrarily long streams are scored in bounded memory. Each worker
+    process loads the data tables once.
+
+    Parameters
+    ----------
+    lines : iterable of str
+        Jobs as JSON lines (e.g. an open file or sys.stdin)
+    jobs : int, optional
+        Number of worker processes. Defaults to 1 (scored in this process)
+    ordered : bool, optional
+        Flag to yield the results in input order. Otherwise results are yielded as
+        they complete. Defaults to True
+    chunk_size : int, optional
+        Number of jobs sent to a worker at a time. Defaults to 64
+    max_pending : int, optional
+        Maximum number of chunks in flight. Defaults to 4 per worker
+
+    Yields
+    ------
+    result : dict
+        See score_line
+    """
+    chunks = _chunks(lines, chunk_size)
+    if jobs == 1:
+        for chunk in chunks:
+            yield from score_lines(chunk)
+        return
+
+    if max_pending is None:
+        max_pending = 4 * jobs
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(score_lines, chunk))
+            while len(pending) >= max_pending:
+                yield from _finished(pending, ordered)
+        while pending:
+            yield from _finished(pending, ordered)
+
+
+def _finished(pending, ordered):
+    """Wait for the next (or first completed) chunk and remove it from pending"""
+    if ordered:
+        return pending.popleft().result()
+
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    results = []
+    for future in done:
+        pending.remove(future)
+        results.extend(future.result())
+    return results
@@ -0,0 +1,257 @@
+"""
+
+========
+cache.py
+========
+
+On-disk cache of encounter and adventuring day results
+
+"""
+
+import os
+
+import json
+
+import sqlite3
+
+import hashlib
+
+import time
+
+from collections import Counter
+
+from .instrument import count, timer
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+DEFAULT_CACHE_FILE = os.path.join(
+    os.path.expanduser("~"), ".cache", "ebuilder", "results.sqlite"
+)
+
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2
+"""
+Default maximum size of the stored results (64 MiB)
+"""
+
+
+def data_version():
+    """
+    Hash of the data tables used for scoring
+
+    Returns
+    -------
+    version : str
+        SHA-256 hex digest of the CSV and JSON tables in the data directory (the
+        generated compendium files are excluded)
+    """
+    digest = hashlib.sha256()
+    for filename in sorted(os.listdir(DATA_DIR)):
+        if filename.startswith("compendium_") or not filename.endswith((".csv", ".json")):
+            continue
+        digest.update(filename.encode())
+        with open(os.path.join(DATA_DIR, filename), "rb") as data_file:
+            digest.update(data_file.read())
+    return digest.hexdigest()
+
+
+with timer("load.data_version"):
+    DATA_VERSION = data_version()
+
+
+def canonical_inputs(adventuring_day):
+    """
+    Normalize the inputs of an adventuring day
+
+    Only the inputs that affect the results are kept: the PCs' level splits, item
+    totals and advantages (as a sorted list), the multiset of monsters in each
+    encounter, the difficulty methods, the consumables, and the data version.
+
+    Parameters
+    ----------
+    adventuring_day : ebuilder.AdventuringDay
+
+    Returns
+    -------
+    inputs : dict
+    """
+    pcs = sorted([
+        [
+            pc.primary_levels,
+            pc.aux_levels,
+            pc.junk_levels,
+            sum(pc.items.values()),
+            bool(pc.advantages.get("PC_ADVANTAGE", False)),
+            bool(pc.advantages.get("MONSTER_ADVANTAGE", False)),
+            bool(pc.advantages.get("MONSTER_DISADVANTAGE", False)),
+        ]
+        for pc in adventuring_day.party.pcs
+    ])
+
+    encounters = []
+    for encounter in adventuring_day.encounters:
+        monsters = Counter()
+        for monster, quantity in encounter.monster_party.monsters:
+            monsters[(
+                monster.name,
+                float(monster.cr),
+                bool(monster.bypass_resistance),
+                bool(monster.ohko),
+            )] += quantity
+        encounters.append({
+            "method": encounter.method,
+            "monsters": sorted([list(key) + [count] for key, count in monsters.items()]),
+        })
+
+    return {
+        "pcs": pcs,
+        "encounters": encounters,
+        "consumables": float(adventuring_day.consumables),
+        "data_version": DATA_VERSION,
+    }
+
+
+def cache_key(adventuring_day):
+    """
+    Content hash of the normalized inputs of an adventuring day
+
+    Parameters
+    ----------
+    adventuring_day : ebuilder.AdventuringDay
+
+    Returns
+    -------
+    key : str
+        SHA-256 hex digest
+    """
+    inputs = json.dumps(canonical_inputs(adventuring_day), sort_keys=True)
+    return hashlib.sha256(inputs.encode()).hexdigest()
+
+
+class ResultCache():
+    """Class for a size-bounded SQLite cache of results"""
+
+    def __init__(self, filename=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Constructor for the result cache
+
+        Parameters
+        ----------
+        filename : str, optional
+            Path to the SQLite file. Defaults to DEFAULT_CACHE_FILE
+        max_bytes : int, optional
+            Maximum total size of the stored results. The least recently used results
+            are evicted past this size. Defaults to DEFAULT_MAX_BYTES
+        """
+        if filename is None:
+            filename = DEFAULT_CACHE_FILE
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(filename)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT, size INTEGER, accessed REAL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)"
+            )
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def size(self):
+        """Total size of the stored results in bytes"""
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+
+    def get(self, key):
+        """
+        Get a stored result
+
+        Parameters
+        ----------
+        key : str
+
+        Returns
+        -------
+        result : dict or None
+            Stored result or None if the key is not in the cache
+        """
+        row = self.connection.execute(
+            "SELECT value FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        with self.connection:
+            self.connection.execute(
+                "UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """
+        Store a result, evicting the least recently used results if needed
+
+        Parameters
+        ----------
+        key : str
+        result : dict
+            JSON serializable result
+        """
+        value = json.dumps(result)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+
+            # Evict until under the size bound
+            excess = self.size() - self.max_bytes
+            if excess > 0:
+                evict = []
+                for old_key, size in self.connection.execute(
+                    "SELECT key, size FROM results WHERE key != ? ORDER BY accessed",
+                    (key,)
+                ):
+                    if excess <= 0:
+                        break
+                    evict.append((old_key,))
+                    excess -= size
+                self.connection.executemany("DELETE FROM results WHERE key = ?", evict)
+
+    def score(self, adventuring_day):
+        """
+        Get the results of an adventuring day, scoring it only on a cache miss
+
+        Parameters
+        ----------
+        adventuring_day : ebuilder.AdventuringDay
+
+        Returns
+        -------
+        result : dict
+            See ebuilder.AdventuringDay.to_dict
+        """
+        key = cache_key(adventuring_day)
+        result = self.get(key)
+        if result is None:
+            count("cache.misses")
+            result = adventuring_day.to_dict()
+            self.put(key, result)
+        else:
+            count("cache.hits")
+        return result
+
+    def clear(self):
+        """Remove all stored results"""
+        with self.connection:
+            self.connection.execute("DELETE FROM results")
+
+    def close(self):
+        """Close the connection to the SQLite file"""
+        self.connection.close()
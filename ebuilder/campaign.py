@@ -0,0 +1,331 @@
+"""
+
+===========
+campaign.py
+===========
+
+Tools for projecting party power over a campaign
+
+"""
+
+import os
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .encounter import CONSUMABLES, FATIGUE, difficulty_cr2_from_ratio
+from .frozen import freeze_frame
+from .party_frame import TIER_MAX_LEVELS
+from .pc import ADVANTAGE_FLAGS, MAX_LEVEL, POWER_CUBE, PlayerCharacter, advantage_index
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+XP_BY_LEVEL = freeze_frame(pd.read_csv(os.path.join(
+    DATA_DIR,
+    "xp_by_level.csv"
+)).set_index("level"))
+"""
+Experience points needed to reach each character level
+"""
+
+CampaignResults = namedtuple(
+    "CampaignResults",
+    ["xp", "level", "party_level", "party_power", "tier", "day_cost", "fatigue"]
+)
+CampaignResults.__doc__ = """
+Results of simulating campaign schedules
+
+All the arrays have the shape (schedules, days) (with an extra trailing axis of
+characters for level) and describe the party at the start of each adventuring day.
+
+Attributes
+----------
+xp : numpy.ndarray
+    Experience points of each character
+level : numpy.ndarray
+    Level of each character with shape (schedules, days, characters)
+party_level : numpy.ndarray
+    Average party level
+party_power : numpy.ndarray
+    Total party power
+tier : numpy.ndarray
+    Party tier
+day_cost : numpy.ndarray
+    Total cost of the encounters of the day (NaN for days with encounters that do not
+    use the CR2.0 method)
+fatigue : numpy.ndarray
+    Row of the fatigue table for the day (-1 for days with encounters that do not use
+    the CR2.0 method)
+"""
+
+
+def level_plan_table(pc, plan=None):
+    """
+    Primary, auxiliary, and junk levels of a character at every total level
+
+    Parameters
+    ----------
+    pc : ebuilder.PlayerCharacter
+    plan : dict, optional
+        Class levels by total level in the format of ebuilder.sorlock.CLASS_LEVELS.
+        Levels missing from the plan go to the primary class. Defaults to putting every
+        new level in the primary class
+
+    Returns
+    -------
+    table : numpy.ndarray
+        Primary, auxiliary, and junk levels indexed by total level with shape
+        (MAX_LEVEL + 1, 3). Levels at or below the character's current level keep the
+        current split.
+    """
+    if plan is None:
+        plan = {}
+
+    table = np.zeros((MAX_LEVEL + 1, 3), dtype=int)
+    split = np.array([pc.primary_levels, pc.aux_levels, pc.junk_levels])
+    table[:pc.level + 1] = split
+    for level in range(pc.level + 1, MAX_LEVEL + 1):
+        if level in plan:
+            split = np.array(PlayerCharacter.extract_levels({
+                class_name.upper(): num_levels
+                for class_name, num_levels in plan[level].items()
+            }))
+        else:
+            split = split + [1, 0, 0]
+        table[level] = split
+    return table
+
+
+class CampaignSimulator():
+    """Class for projecting how a party advances through many campaign schedules"""
+
+    def __init__(self, party, adventuring_days, plans=None):
+        """
+        Constructor for the campaign simulator
+
+        Parameters
+        ----------
+        party : ebuilder.Party
+            Party at the start of the campaign. Characters start with the XP needed for
+            their current level.
+        adventuring_days : list of ebuilder.AdventuringDay
+            Adventuring days that schedules are built from. Only the monsters, difficulty
+            methods, and consumables (added with AdventuringDay.add_consumable) of the
+            days are used since the party changes over the campaign.
+        plans : dict, optional
+            Multiclass plan (see level_plan_table) of each character by name. Defaults
+            to levelling every character in their primary class
+
+        Raises
+        ------
+        ValueError if a planned level of a character is outside of the level point
+        tables
+        """
+        if plans is None:
+            plans = {}
+        self.party = party
+        self.adventuring_days = adventuring_days
+        self.count = party.count()
+
+        # Character tables
+        self.level_tables = np.stack([
+            level_plan_table(pc, plans.get(pc.name)) for pc in party.pcs
+        ])
+        self.start_levels = np.array([pc.level for pc in party.pcs])
+        self.item_totals = np.array([sum(pc.items.values()) for pc in party.pcs])
+        self.advantages = advantage_index(*np.array([
+            [pc.advantages.get(flag, False) for flag in ADVANTAGE_FLAGS]
+            for pc in party.pcs
+        ]).T)
+        self.power_tables = self._power_tables()
+
+        # Adventuring day tables
+        num_tiers = len(TIER_MAX_LEVELS)
+        num_encounters = max([len(day.encounters) for day in adventuring_days] + [1])
+        self.day_xp = np.zeros(len(adventuring_days))
+        self.day_power = np.zeros((len(adventuring_days), num_encounters, num_tiers))
+        self.day_consumables = np.zeros((len(adventuring_days), num_tiers))
+        self.day_cr2 = np.ones(len(adventuring_days), dtype=bool)
+        for row, day in enumerate(adventuring_days):
+            for column, encounter in enumerate(day.encounters):
+                self.day_xp[row] += encounter.monster_party.xp()
+                self.day_power[row, column] = [
+                    encounter.monster_party.power(tier)
+                    for tier in range(1, num_tiers + 1)
+                ]
+                # Fatigue is only defined for the CR2.0 method
+                if encounter.method != "cr2":
+                    self.day_cr2[row] = False
+
+            # Consumables save a different cost at each tier
+            for rarity, consumable_category in day.consumable_items:
+                self.day_consumables[row] += CONSUMABLES.loc[
+                    1:num_tiers, f"{rarity}_{consumable_category}"
+                ].to_numpy()
+
+    def _power_tables(self):
+        """
+        Power of each character at every total level of their plan
+
+        Returns
+        -------
+        tables : numpy.ndarray
+            Power indexed by [character, total level]. Levels below the character's
+            current level are -1
+
+        Raises
+        ------
+        ValueError if a planned level is outside of the level point tables
+        """
+        levels = np.arange(MAX_LEVEL + 1)
+        reached = levels >= self.start_levels[:, None]
+        index = (
+            self.level_tables[..., 0],
+            self.level_tables[..., 1],
+            self.level_tables[..., 2],
+            np.broadcast_to(self.item_totals[:, None], reached.shape),
+            np.broadcast_to(self.advantages[:, None], reached.shape),
+        )
+        in_range = reached.copy()
+        for axis, values in enumerate(index):
+            in_range &= (values >= 0) & (values < POWER_CUBE.shape[axis])
+
+        tables = np.full(reached.shape, -1, dtype=int)
+        tables[in_range] = POWER_CUBE[tuple(values[in_range] for values in index)]
+        invalid = reached & (tables < 0)
+        if invalid.any():
+            raise ValueError("Planned levels outside of the level point tables: " + ", ".join(
+                f"{pc.name} at level {level}"
+                for character, level in zip(*np.nonzero(invalid))
+                for pc in [self.party.pcs[character]]
+            ))
+        return tables
+
+    def random_schedules(self, num_schedules, num_days, rng=None, weights=None):
+        """
+        Draw random schedules of the adventuring days
+
+        Parameters
+        ----------
+        num_schedules : int
+        num_days : int
+            Number of adventuring days in each schedule
+        rng : numpy.random.Generator, optional
+            Random number generator. Defaults to a new unseeded generator
+        weights : array_like, optional
+            Probability of drawing each adventuring day. Defaults to uniform
+
+        Returns
+        -------
+        schedules : numpy.ndarray
+            Index of the adventuring day with shape (num_schedules, num_days)
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)
+            weights = weights / weights.sum()
+        return rng.choice(
+            len(self.adventuring_days), size=(num_schedules, num_days), p=weights
+        )
+
+    def run(self, schedules=None):
+        """
+        Advance the party through schedules of adventuring days
+
+        XP of each day is split evenly among the characters, who level up between
+        adventuring days.
+
+        Parameters
+        ----------
+        schedules : array_like, optional
+            Index of the adventuring day with shape (schedules, days). Defaults to a
+            single schedule of the adventuring days in order
+
+        Returns
+        -------
+        results : ebuilder.campaign.CampaignResults
+        """
+        if schedules is None:
+            schedules = np.arange(len(self.adventuring_days))
+        schedules = np.atleast_2d(np.asarray(schedules, dtype=int))
+
+        # XP and levels at the start of each day
+        start_xp = XP_BY_LEVEL["xp"].to_numpy()[self.start_levels - 1]
+        earned = np.cumsum(self.day_xp[schedules], axis=1) / self.count
+        earned = np.concatenate([np.zeros((len(schedules), 1)), earned[:, :-1]], axis=1)
+        xp = start_xp + earned[..., None]
+        level = np.maximum(
+            np.searchsorted(XP_BY_LEVEL["xp"].to_numpy(), xp, side="right"),
+            self.start_levels
+        )
+
+        # Party power and tier
+        party_power = self.power_tables[np.arange(self.count), level].sum(axis=-1)
+        party_level = level.mean(axis=-1)
+        tier = np.searchsorted(TIER_MAX_LEVELS, party_level, side="left") + 1
+
+        # Encounter costs and fatigue
+        monster_power = np.take_along_axis(
+            self.day_power[schedules], (tier - 1)[..., None, None], axis=-1
+        )[..., 0]
+        ratio = monster_power / party_power[..., None]
+        day_cost = difficulty_cr2_from_ratio(ratio)[2].sum(axis=-1)
+        savings = np.take_along_axis(
+            self.day_consumables[schedules], (tier - 1)[..., None], axis=-1
+        )[..., 0] / self.count
+        fatigue = np.maximum(
+            (day_cost[..., None] >= FATIGUE["cost"].to_numpy() + savings[..., None]).sum(axis=-1) - 1,
+            0
+        )
+
+        # Days with other difficulty methods have no fatigue (see AdventuringDay.fatigue)
+        cr2 = self.day_cr2[schedules]
+        day_cost = np.where(cr2, day_cost, np.nan)
+        fatigue = np.where(cr2, fatigue, -1)
+
+        return CampaignResults(
+            xp[..., 0], level, party_level, party_power, tier, day_cost, fatigue
+        )
+
+    @staticmethod
+    def summary(results, percentiles=(10, 50, 90)):
+        """
+        Summarize simulated schedules by day
+
+        Parameters
+        ----------
+        results : ebuilder.campaign.CampaignResults
+        percentiles : tuple of float, optional
+            Percentiles of the party level and power over the schedules. Defaults to
+            (10, 50, 90)
+
+        Returns
+        -------
+        summary : pandas.DataFrame
+            Percentiles of party level and power, mean tier and day cost, and the most
+            common fatigue category indexed by day. Days without fatigue are left out
+            of the mean day cost and counted as "N/A"
+        """
+        summary = pd.DataFrame(index=pd.RangeIndex(results.party_level.shape[1], name="day"))
+        for value in ["party_level", "party_power"]:
+            for percentile, row in zip(
+                percentiles, np.percentile(getattr(results, value), percentiles, axis=0)
+            ):
+                summary[f"{value}_p{percentile}"] = row
+        summary["tier_mean"] = results.tier.mean(axis=0)
+        counted = np.isfinite(results.day_cost).sum(axis=0)
+        summary["day_cost_mean"] = np.where(
+            counted > 0, np.nansum(results.day_cost, axis=0) / np.maximum(counted, 1), np.nan
+        )
+
+        # Shift the rows by one so that days without fatigue (-1) are counted first
+        fatigue = np.apply_along_axis(
+            np.bincount, 0, results.fatigue + 1, minlength=len(FATIGUE) + 1
+        ).argmax(axis=0)
+        summary["fatigue_mode"] = np.concatenate(
+            [["N/A"], FATIGUE["category"].to_numpy(dtype=object)]
+        )[fatigue]
+        return summary
@@ -0,0 +1,172 @@
+"""
+
+============
+challenge.py
+============
+
+Tools for recalculating monster challenge ratings from their stat blocks
+
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .frozen import freeze_frame
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+MONSTER_STATISTICS = freeze_frame(pd.read_csv(os.path.join(
+    DATA_DIR,
+    "monster_statistics.csv"
+)).set_index("cr"))
+"""
+Monster statistics by challenge rating (DMG "Creating a Monster" table)
+"""
+
+RESISTANCE_MULTIPLIERS = freeze_frame(pd.DataFrame(
+    {
+        "cr": [0, 5, 11, 17],
+        "resist": [2, 1.5, 1.25, 1],
+        "immune": [2, 2, 1.5, 1.25],
+    }
+).set_index("cr"))
+"""
+Effective hit point multipliers for damage resistances and immunities by expected
+challenge rating
+"""
+
+
+def cr_values(cr):
+    """
+    Convert a Series of CRs (e.g. "1/4" or "13") to numbers
+
+    Parameters
+    ----------
+    cr : pandas.Series
+
+    Returns
+    -------
+    cr_num : numpy.ndarray
+        Numerical CRs, NaN where the CR is missing or invalid
+    """
+    cr = cr.astype(str).str.strip()
+    fraction = cr.str.extract(r"^(\d+)\s*/\s*(\d+)$").astype(float)
+    return np.where(
+        fraction[0].notna(),
+        fraction[0] / fraction[1],
+        pd.to_numeric(cr, errors="coerce")
+    ).astype(float)
+
+
+def _leading_numbers(values):
+    """Leading integer of each entry of a Series such as "45 (6d10+12)" """
+    return pd.to_numeric(
+        values.astype(str).str.extract(r"^\s*(\d+)")[0], errors="coerce"
+    ).to_numpy(float)
+
+
+def _has_entry(monsters, column):
+    """Flag rows with a non-empty entry in column"""
+    if column not in monsters.columns:
+        return np.zeros(len(monsters), dtype=bool)
+    values = monsters[column]
+    return (values.notna() & (values.astype(str).str.strip() != "")).to_numpy()
+
+
+def _nearest_cr(cr):
+    """Round numerical CRs to the nearest CR of the statistics table"""
+    table = MONSTER_STATISTICS.index.to_numpy(float)
+    index = np.abs(cr[:, None] - table[None, :]).argmin(axis=1)
+    return table[index]
+
+
+def recalculate_cr(monsters, tolerance=2):
+    """
+    Recalculate the challenge ratings of a monster compendium
+
+    Follows the DMG's "Creating a Monster" procedure for every monster at once. The
+    defensive CR comes from the effective hit points (hit points scaled up for damage
+    resistances and immunities) and is adjusted one CR for every two points of armor
+    class above or below the table. The offensive CR comes from the damage per round
+    and is adjusted one CR for every two points of attack bonus (or save DC) above or
+    below the table. The CR is the average of the two.
+
+    Parameters
+    ----------
+    monsters : pandas.DataFrame
+        Monster compendium with "cr", "hp", "ac", and the damage index columns
+        ("dpr_mean", "to_hit", and "save_dc")
+    tolerance : int, optional
+        Number of steps on the CR table between the listed and calculated CR to flag
+        as a mismatch. Defaults to 2
+
+    Returns
+    -------
+    crs : pandas.DataFrame
+        "cr", "defensive_cr", "offensive_cr", "cr_calc", and "mismatch" columns aligned
+        with monsters. Entries are NaN where the stat block is incomplete.
+    """
+    table = MONSTER_STATISTICS
+    table_cr = table.index.to_numpy(float)
+    last = len(table_cr) - 1
+
+    cr = cr_values(monsters["cr"])
+    hp = _leading_numbers(monsters["hp"])
+    ac = _leading_numbers(monsters["ac"])
+    dpr = monsters["dpr_mean"].to_numpy(float)
+    to_hit = monsters["to_hit"].to_numpy(float)
+    save_dc = monsters["save_dc"].to_numpy(float)
+
+    # Effective hit points from resistances and immunities at the listed CR
+    multipliers = RESISTANCE_MULTIPLIERS.iloc[
+        np.searchsorted(RESISTANCE_MULTIPLIERS.index, np.nan_to_num(cr), side="right") - 1
+    ]
+    immune = _has_entry(monsters, "immune")
+    resist = _has_entry(monsters, "resist") & ~immune
+    hp = hp * np.where(
+        immune,
+        multipliers["immune"].to_numpy(),
+        np.where(resist, multipliers["resist"].to_numpy(), 1)
+    )
+
+    # Defensive CR
+    defensive = np.minimum(
+        np.searchsorted(table["hp_max"].to_numpy(), np.nan_to_num(hp), side="left"), last
+    )
+    defensive = defensive + np.trunc((ac - table["ac"].to_numpy()[defensive]) / 2)
+    defensive = np.where(np.isnan(hp) | np.isnan(ac), np.nan, defensive)
+
+    # Offensive CR
+    offensive = np.minimum(
+        np.searchsorted(table["dpr_max"].to_numpy(), np.nan_to_num(dpr), side="left"), last
+    )
+    accuracy = np.where(
+        np.isnan(to_hit),
+        save_dc - table["save_dc"].to_numpy()[offensive],
+        to_hit - table["attack_bonus"].to_numpy()[offensive],
+    )
+    offensive = offensive + np.trunc(np.nan_to_num(accuracy) / 2)
+    offensive = np.where(np.isnan(dpr), np.nan, offensive)
+
+    # Average the CRs on the table
+    defensive_cr = table_cr[np.clip(np.nan_to_num(defensive), 0, last).astype(int)]
+    offensive_cr = table_cr[np.clip(np.nan_to_num(offensive), 0, last).astype(int)]
+    cr_calc = _nearest_cr((defensive_cr + offensive_cr) / 2)
+
+    complete = ~np.isnan(defensive) & ~np.isnan(offensive)
+    steps = np.abs(
+        np.searchsorted(table_cr, cr_calc) - np.searchsorted(table_cr, np.nan_to_num(cr))
+    )
+
+    return pd.DataFrame(
+        {
+            "cr": cr,
+            "defensive_cr": np.where(np.isnan(defensive), np.nan, defensive_cr),
+            "offensive_cr": np.where(np.isnan(offensive), np.nan, offensive_cr),
+            "cr_calc": np.where(complete, cr_calc, np.nan),
+            "mismatch": complete & ~np.isnan(cr) & (steps >= tolerance),
+        },
+        index=monsters.index,
+    )
@@ -0,0 +1,310 @@
+"""
+
+=======
+dice.py
+=======
+
+Tools for parsing dice expressions and computing monster damage per round
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from .textstore import parse_text
+
+DICE_PATTERN = r"(?P<num>\d*)\s*[dD]\s*(?P<sides>\d+)(?:\s*(?P<sign>[+\-−])\s*(?P<bonus>\d+)(?!\s*[dD\d]))?"
+"""
+Regular expression for a single dice term such as "2d6 + 3"
+"""
+
+NUMBER_WORDS = {
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+}
+"""
+Numbers as they are written out in multiattack descriptions
+"""
+
+MULTIATTACK_PATTERN = r"(?i)\bmakes\s+(?P<count>" + "|".join(NUMBER_WORDS) + r"|\d+)\b"
+"""
+Regular expression for the number of attacks in a multiattack such as "The dragon makes
+three attacks"
+"""
+
+RECHARGE_PATTERN = r"(?i)recharge\s*(?P<low>\d)(?:\s*[-–]\s*\d)?"
+
+LIMITED_USE_PATTERN = r"(?i)recharges? after|/\s*day"
+
+LIMITED_USE_CHANCE = 1 / 3
+"""
+Chance per round of using an ability that recharges only on a rest or is limited per
+day, assuming a three round combat
+"""
+
+
+def compile_dice(num, sides, bonus):
+    """
+    Compile dice terms into their mean and variance
+
+    Parameters
+    ----------
+    num : array_like
+        Number of dice
+    sides : array_like
+        Number of sides per die
+    bonus : array_like
+        Flat bonus
+
+    Returns
+    -------
+    mean : numpy.ndarray
+        Expected value
+    variance : numpy.ndarray
+        Variance
+    """
+    num = np.asarray(num, dtype=float)
+    sides = np.asarray(sides, dtype=float)
+    bonus = np.asarray(bonus, dtype=float)
+    return num * (sides + 1) / 2 + bonus, num * (sides ** 2 - 1) / 12
+
+
+def extract_dice(text):
+    """
+    Extract all the dice terms from a Series of text
+
+    Parameters
+    ----------
+    text : pandas.Series
+        Text to parse
+
+    Returns
+    -------
+    terms : pandas.DataFrame
+        One row per dice term with "num", "sides", "bonus", "mean", and "variance"
+        columns and a MultiIndex of (index of text, match number)
+    """
+    terms = text.astype(str).str.extractall(DICE_PATTERN)
+    num = pd.to_numeric(terms["num"].replace("", "1")).fillna(1)
+    sides = pd.to_numeric(terms["sides"])
+    bonus = pd.to_numeric(terms["bonus"]).fillna(0)
+    bonus = bonus.where(terms["sign"].isna() | (terms["sign"] == "+"), -bonus)
+
+    mean, variance = compile_dice(num, sides, bonus)
+    return pd.DataFrame(
+        {
+            "num": num,
+            "sides": sides,
+            "bonus": bonus,
+            "mean": mean,
+            "variance": variance,
+        },
+        index=terms.index,
+    )
+
+
+class DiceExpression():
+    """Class for a dice expression such as "2d6+3" or "1d8 + 2d6 + 2" """
+
+    def __init__(self, expression):
+        """
+        Constructor for the dice expression
+
+        Parameters
+        ----------
+        expression : str
+            Dice expression. Flat bonuses may only follow a dice term.
+
+        Raises
+        ------
+        ValueError if the expression contains no dice
+        """
+        self.expression = expression
+        self.terms = extract_dice(pd.Series([expression]))
+        if self.terms.empty:
+            raise ValueError(f"Invalid dice expression: {expression}")
+
+    def mean(self):
+        """Expected value of the expression"""
+        return float(self.terms["mean"].sum())
+
+    def variance(self):
+        """Variance of the expression"""
+        return float(self.terms["variance"].sum())
+
+    def roll(self, rng, size=None):
+        """
+        Roll the expression
+
+        Parameters
+        ----------
+        rng : numpy.random.Generator
+            Random number generator
+        size : int or tuple, optional
+            Output shape. Defaults to a single roll
+
+        Returns
+        -------
+        total : int or numpy.ndarray
+        """
+        total = 0
+        for num, sides, bonus in self.terms[["num", "sides", "bonus"]].to_numpy(int):
+            shape = (num,) if size is None else np.atleast_1d(size).tolist() + [num]
+            total = total + rng.integers(1, sides + 1, size=shape).sum(axis=-1) + bonus
+        return total
+
+    def __str__(self):
+        return self.expression
+
+
+def _as_list(value):
+    """Convert a compendium entry (possibly stringified) into a list of dictionaries"""
+    if isinstance(value, str):
+        value = parse_text(value)
+    if isinstance(value, dict):
+        return [value]
+    if isinstance(value, list):
+        return [entry for entry in value if isinstance(entry, dict)]
+    return []
+
+
+def _as_text(value):
+    """Join text entries that may be a string or a list of strings"""
+    if isinstance(value, list):
+        return " ".join([str(entry) for entry in value if entry is not None])
+    if value is None:
+        return ""
+    return str(value)
+
+
+def explode_actions(actions):
+    """
+    Explode monster actions into one row per action
+
+    Parameters
+    ----------
+    actions : pandas.Series
+        Action entries of the monster compendium, either as lists of dictionaries or
+        as their string representation
+
+    Returns
+    -------
+    exploded : pandas.DataFrame
+        Columns "name", "text", and "attack" indexed by the row of each monster
+    """
+    exploded = actions.map(_as_list).explode().dropna()
+    return pd.DataFrame(
+        {
+            "name": exploded.map(lambda x: _as_text(x.get("name"))),
+            "text": exploded.map(lambda x: _as_text(x.get("text"))),
+            "attack": exploded.map(lambda x: _as_text(x.get("attack"))),
+        },
+        index=exploded.index,
+    )
+
+
+def damage_index(monsters):
+    """
+    Compute the damage per round index for a monster compendium
+
+    Damage per round assumes every attack hits, matching the DMG's "Creating a
+    Monster" table. Monsters with a multiattack use their strongest attack for each
+    attack of the multiattack. Recharge and limited-use damage abilities replace the
+    attacks on the rounds they are available.
+
+    Parameters
+    ----------
+    monsters : pandas.DataFrame
+        Monster compendium with an "action" column
+
+    Returns
+    -------
+    index : pandas.DataFrame
+        "dpr_mean", "dpr_var", "to_hit", and "save_dc" columns aligned with monsters
+    """
+    index = pd.DataFrame(
+        np.nan,
+        index=monsters.index,
+        columns=["dpr_mean", "dpr_var", "to_hit", "save_dc"]
+    )
+    if "action" not in monsters.columns:
+        return index
+    actions = explode_actions(monsters["action"]).rename_axis("monster")
+    actions = actions.reset_index()
+    if actions.empty:
+        return index.fillna({"dpr_mean": 0.0, "dpr_var": 0.0})
+
+    # Damage of each action, falling back to the attack string (e.g. "Bite|4|2d4+2")
+    # when the text has no dice
+    damage = extract_dice(actions["text"]).groupby(level=0)[["mean", "variance"]].sum()
+    attack_damage = extract_dice(actions["attack"]).groupby(level=0)[["mean", "variance"]].sum()
+    damage = damage.combine_first(attack_damage)
+    actions = actions.join(damage).fillna({"mean": 0.0, "variance": 0.0})
+
+    # Attack bonuses and save DCs
+    to_hit = actions["text"].str.extract(r"([+\-]\s*\d+)\s+to hit")[0]
+    to_hit = to_hit.fillna(actions["attack"].str.extract(r"\|\s*([+\-]?\d+)\s*\|")[0])
+    actions["to_hit"] = pd.to_numeric(to_hit.str.replace(" ", ""), errors="coerce")
+    actions["save_dc"] = pd.to_numeric(
+        actions["text"].str.extract(r"DC\s*(\d+)")[0], errors="coerce"
+    )
+    is_attack = actions["to_hit"].notna()
+
+    # Multiattack counts
+    multiattack = actions["name"].str.contains("multiattack", case=False)
+    count = actions.loc[multiattack, "text"].str.extract(MULTIATTACK_PATTERN)["count"]
+    count = pd.to_numeric(
+        count.str.lower().map(lambda x: NUMBER_WORDS.get(x, x)), errors="coerce"
+    )
+    actions["count"] = count.reindex(actions.index)
+
+    # Chance per round a recharging ability is available
+    low = pd.to_numeric(
+        actions["name"].str.extract(RECHARGE_PATTERN)["low"], errors="coerce"
+    )
+    chance = (7 - low) / 6
+    limited = actions["name"].str.contains(LIMITED_USE_PATTERN)
+    actions["chance"] = chance.where(low.notna(), np.where(limited, LIMITED_USE_CHANCE, 1.0))
+
+    grouped = actions.groupby("monster")
+    attacks = actions[is_attack & (actions["chance"] == 1)]
+    best = attacks.sort_values("mean").groupby("monster").last()
+    num_attacks = grouped["count"].max().fillna(1).clip(lower=1)
+
+    attack_mean = (best["mean"] * num_attacks).reindex(monsters.index).fillna(0)
+    attack_var = (best["variance"] * num_attacks).reindex(monsters.index).fillna(0)
+
+    # Strongest non-attack damage ability with its availability
+    specials = actions[~is_attack & (actions["mean"] > 0)].copy()
+    specials["expected"] = specials["chance"] * specials["mean"]
+    special = specials.sort_values("expected").groupby("monster").last()
+    special = special.reindex(monsters.index)
+    chance = special["chance"].fillna(0)
+    special_mean = special["mean"].fillna(0)
+    special_var = special["variance"].fillna(0)
+
+    # Use the special ability on the rounds it is available if it beats the attacks
+    use_special = special_mean > attack_mean
+    chance = chance.where(use_special, 0)
+    dpr_mean = chance * special_mean + (1 - chance) * attack_mean
+    dpr_var = (
+        chance * (special_var + special_mean ** 2)
+        + (1 - chance) * (attack_var + attack_mean ** 2)
+        - dpr_mean ** 2
+    )
+
+    return pd.DataFrame(
+        {
+            "dpr_mean": dpr_mean.to_numpy(),
+            "dpr_var": dpr_var.clip(lower=0).to_numpy(),
+            "to_hit": grouped["to_hit"].max().reindex(monsters.index).to_numpy(),
+            "save_dc": grouped["save_dc"].max().reindex(monsters.index).to_numpy(),
+        },
+        index=monsters.index,
+    )
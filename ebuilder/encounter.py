@@ -14,31 +14,160 @@ import json
 import numpy as np
 import pandas as pd
 
+from .frozen import freeze_array, freeze_frame, freeze_mapping
+from .instrument import timed
+from .monsters import MONSTER_POWER, XP_BY_CR, cr_str_to_num
+
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
-ENCOUNTER = pd.read_csv(os.path.join(
+ENCOUNTER = freeze_frame(pd.read_csv(os.path.join(
     DATA_DIR,
     "encounter_difficulty.csv"
-))
+)))
 
-ENCOUNTER_2024 = pd.read_csv(os.path.join(
+ENCOUNTER_2024 = freeze_frame(pd.read_csv(os.path.join(
     DATA_DIR,
     "encounter_difficulty_2024.csv"
-))
+)))
 
 with open(os.path.join(DATA_DIR, "encounter_difficulty_descriptions_2024.json"), "r") as ediff_file:
-    ENCOUNTER_DESC_2024  = json.load(ediff_file)
+    ENCOUNTER_DESC_2024 = freeze_mapping(json.load(ediff_file))
 
-FATIGUE = pd.read_csv(os.path.join(
+FATIGUE = freeze_frame(pd.read_csv(os.path.join(
     DATA_DIR,
     "fatigue.csv"
-))
+)))
 
 
-CONSUMABLES = pd.read_csv(os.path.join(
+CONSUMABLES = freeze_frame(pd.read_csv(os.path.join(
     DATA_DIR,
     "consumables.csv"
-)).set_index("tier")
+)).set_index("tier"))
+
+DIFFICULTY_LABELS_2024 = ["low", "moderate", "high"]
+
+# Columns of the difficulty tables as arrays, looked up for scalars and arrays alike
+_CR2_COLUMNS = freeze_mapping({
+    "category": freeze_array(ENCOUNTER["category"].to_numpy(dtype=object)),
+    "description": freeze_array(ENCOUNTER["description"].to_numpy(dtype=object)),
+    "multiplier": ENCOUNTER["multiplier"].to_numpy(),
+    "cost": ENCOUNTER["cost"].to_numpy(),
+})
+_LABELS_2024 = freeze_array(np.array(DIFFICULTY_LABELS_2024, dtype=object))
+_DESCRIPTIONS_2024 = freeze_array(np.array(
+    [ENCOUNTER_DESC_2024[label] for label in DIFFICULTY_LABELS_2024], dtype=object
+))
+
+
+def difficulty_cr2_from_ratio(power_ratio, interpolate=True):
+    """
+    Look up the CR2.0 difficulty of a power ratio
+
+    Parameters
+    ----------
+    power_ratio : float or array_like
+        Monster power divided by party power
+    interpolate : bool, optional
+        Flag to interpolate the encounter cost. Defaults to True
+
+    Returns
+    -------
+    difficulty_category : str or numpy.ndarray
+        String label for difficulty category
+    difficulty_description : str or numpy.ndarray
+        Description of difficulty
+    cost : float or numpy.ndarray
+        Cost of encounter
+    """
+    multipliers = _CR2_COLUMNS["multiplier"]
+    costs = _CR2_COLUMNS["cost"]
+
+    # Floor the table
+    row = np.maximum(np.searchsorted(multipliers, power_ratio, side="right") - 1, 0)
+    cost = costs[row]
+    if interpolate:
+        cost = np.interp(power_ratio, multipliers, costs)
+
+    return _CR2_COLUMNS["category"][row], _CR2_COLUMNS["description"][row], cost
+
+
+def thresholds_2024(level, num_pcs):
+    """
+    XP thresholds of the DMG 2024 difficulties for a party
+
+    Parameters
+    ----------
+    level : float
+        Average party level
+    num_pcs : int
+        Number of characters in the party
+
+    Returns
+    -------
+    thresholds : numpy.ndarray
+        XP thresholds for DIFFICULTY_LABELS_2024
+    """
+    row = max(
+        np.searchsorted(ENCOUNTER_2024["party_level"].to_numpy(), level, side="right") - 1,
+        0
+    )
+    return ENCOUNTER_2024[DIFFICULTY_LABELS_2024].iloc[row].to_numpy() * num_pcs
+
+
+def difficulty_2024_from_xp(xp, thresholds):
+    """
+    Look up the DMG 2024 difficulty of an XP total
+
+    Parameters
+    ----------
+    xp : int or array_like
+        Total monster XP
+    thresholds : numpy.ndarray
+        XP thresholds for the party (see thresholds_2024)
+
+    Returns
+    -------
+    difficulty_category : str or numpy.ndarray
+        The label for the difficulty of the encounter ('low', 'moderate', or 'high').
+        XP totals below the 'low' threshold are labeled 'low'
+    description : str or numpy.ndarray
+        String difficulty for encounter
+    nx_high_difficulty : float or numpy.ndarray
+        The xp divided by the 'high' difficulty threshold
+    """
+    # Get the last difficulty exceeded
+    row = np.maximum(np.searchsorted(thresholds, xp, side="right") - 1, 0)
+
+    # Get number of times greater than threshold
+    nx_high_difficulty = np.divide(xp, thresholds[-1])
+
+    return _LABELS_2024[row], _DESCRIPTIONS_2024[row], nx_high_difficulty
+
+
+def fatigue_level(total_cost, consumable_savings=0):
+    """
+    Look up the fatigue of an adventuring day
+
+    Parameters
+    ----------
+    total_cost : float
+        Total cost of the encounters
+    consumable_savings : float, optional
+        Savings from consumables per character. Defaults to 0
+
+    Returns
+    -------
+    fatigue_category : str
+    fatigue_description : str
+    total_cost : float
+    """
+    row = max(
+        np.searchsorted(
+            FATIGUE["cost"].to_numpy() + consumable_savings, total_cost, side="right"
+        ) - 1,
+        0
+    )
+    return FATIGUE["category"].iat[row], FATIGUE["description"].iat[row], total_cost
 
 
 class Encounter():
@@ -93,6 +222,7 @@ class Encounter():
         
         raise RuntimeError(f"Unexpected difficulty method: {method}")
 
+    @timed("encounter.difficulty_2024")
     def difficulty_2024(self):
         """
         Compute the encounter difficulty using DMG 2024
@@ -106,27 +236,12 @@ class Encounter():
         nx_high_difficulty : float
             The xp divided by the 'high' difficulty threshold for this level
         """
-        xp = self.monster_party.xp()
-        level = self.party.level()
-
-        difficulties = ENCOUNTER_2024[ENCOUNTER_2024["party_level"] <= level].iloc[-1]
-    
-        # Scale the XP by number of party members
-        difficulty_labels = ["low", "moderate", "high"]
-        difficulties[difficulty_labels] *= len(self.party)
-
-        # Get the last difficulty exceeded
-        above_threshold = [xp >= difficulties[col]  for col in difficulty_labels]
-        difficulty_category = difficulty_labels[
-            len(above_threshold) - above_threshold[::-1].index(True) - 1
-        ]
-        
-        
-        # Get number of times greater than threshold
-        nx_high_difficulty = xp / difficulties["high"] 
-
-        return difficulty_category, ENCOUNTER_DESC_2024[difficulty_category], nx_high_difficulty
+        return difficulty_2024_from_xp(
+            self.monster_party.xp(),
+            thresholds_2024(self.party.level(), len(self.party))
+        )
 
+    @timed("encounter.difficulty_cr2")
     def difficulty_cr2(self, interpolate=True):
         """
         Compute the encounter difficulty
@@ -152,19 +267,150 @@ class Encounter():
             / self.party.power()
         )
 
-        # Floor the table
-        difficulty = ENCOUNTER[ENCOUNTER["multiplier"] <= power_ratio].iloc[-1]
-        difficulty_category = difficulty["category"]
-        difficulty_description = difficulty["description"]
+        return difficulty_cr2_from_ratio(power_ratio, interpolate)
+
+    def _groups(self):
+        """Arrays of the name, quantity, effective CR, power, and XP of each monster group"""
+        tier = self.party.tier()
+        monsters = self.monster_party.monsters
+        return (
+            [monster.name for monster, _ in monsters],
+            np.array([quantity for _, quantity in monsters], dtype=int),
+            np.array([monster.cr_eff for monster, _ in monsters], dtype=float),
+            np.array([monster.power(tier) for monster, _ in monsters], dtype=float),
+            np.array([monster.xp() for monster, _ in monsters], dtype=float),
+        )
+
+    def marginal_contributions(self):
+        """
+        Contribution of each monster group to the encounter difficulty
+
+        Returns
+        -------
+        contributions : pandas.DataFrame
+            One row per monster group with its total power and XP, its share of the
+            power ratio, and the power ratio, CR2.0 cost, and fraction of the DMG 2024
+            'high' threshold of the encounter without the group
+        """
+        names, quantity, cr_eff, power, xp = self._groups()
+        group_power = power * quantity
+        group_xp = xp * quantity
+        party_power = self.party.power()
+        thresholds = thresholds_2024(self.party.level(), len(self.party))
+
+        ratio = group_power.sum() / party_power
+        ratio_without = ratio - group_power / party_power
+        cost = difficulty_cr2_from_ratio(ratio)[2]
+        cost_without = difficulty_cr2_from_ratio(ratio_without)[2]
+
+        return pd.DataFrame({
+            "name": names,
+            "quantity": quantity,
+            "cr_eff": cr_eff,
+            "power": group_power,
+            "power_share": group_power / group_power.sum(),
+            "ratio_contribution": group_power / party_power,
+            "ratio_without": ratio_without,
+            "cost_without": cost_without,
+            "marginal_cost": cost - cost_without,
+            "xp": group_xp,
+            "xp_share": group_xp / group_xp.sum(),
+            "nx_high_without": (group_xp.sum() - group_xp) / thresholds[-1],
+        })
+
+    def next_threshold(self, method=None):
+        """
+        Changes to each monster group that reach the next difficulty category
+
+        The changes are solved for directly from the difficulty tables: the power (or
+        XP) missing to reach the next category is divided by the power (or XP) of one
+        monster of the group to get the number of monsters to add, and the table of
+        power (or XP) by CR is searched for the CR that one monster of the group would
+        need instead.
+
+        Parameters
+        ----------
+        method : str, optional
+            Method for computing difficulty. Defaults to self.method
+
+        Returns
+        -------
+        thresholds : pandas.DataFrame
+            One row per monster group with the next difficulty category, the number of
+            monsters of the group to add to reach it, and the effective CR that one
+            monster of the group would need to reach it alone. Entries are NaN when
+            the change is not possible (for example, already at the hardest category).
+        """
+        if method is None:
+            method = self.method
+        names, quantity, cr_eff, power, xp = self._groups()
+
+        if method == "cr2":
+            labels = ENCOUNTER["category"].to_numpy()
+            steps = ENCOUNTER["multiplier"].to_numpy() * self.party.power()
+            per_monster = power
+            current = (power * quantity).sum()
+            table = MONSTER_POWER[f"tier{self.party.tier()}"]
+            table_cr = table.index.to_numpy(float)
+        elif method == "2024":
+            labels = np.array(DIFFICULTY_LABELS_2024)
+            steps = thresholds_2024(self.party.level(), len(self.party))
+            per_monster = xp
+            current = (xp * quantity).sum()
+            table = XP_BY_CR["xp"]
+            table_cr = np.array([cr_str_to_num(cr) for cr in table.index], dtype=float)
+        else:
+            raise RuntimeError(f"Unexpected difficulty method: {method}")
+
+        # The next category starts at the first step above the current total. Totals
+        # below the first step are labeled with the first category (see
+        # difficulty_2024_from_xp), so the next category is at least the second
+        row = max(np.searchsorted(steps, current, side="right"), 1)
+        if row == len(steps):
+            missing = np.nan
+            next_category = None
+        else:
+            missing = steps[row] - current
+            next_category = labels[row]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            extra = np.ceil(missing / per_monster - 1e-9)
+        extra = np.where(per_monster > 0, extra, np.nan)
+
+        # Smallest CR whose power (or XP) covers the missing amount
+        values = np.maximum.accumulate(table.to_numpy(float))
+        needed = np.searchsorted(values, per_monster + missing, side="left")
+        needed_cr = np.where(
+            needed < len(values), table_cr[np.minimum(needed, len(values) - 1)], np.nan
+        )
 
-        cost = difficulty["cost"]
-        if interpolate:
-            cost = np.interp(
-                power_ratio, ENCOUNTER["multiplier"], ENCOUNTER["cost"]
-            )
+        return pd.DataFrame({
+            "name": names,
+            "quantity": quantity,
+            "cr_eff": cr_eff,
+            "next_category": next_category,
+            "extra_quantity": extra,
+            "next_cr_eff": needed_cr,
+        })
 
-        return difficulty["category"], difficulty["description"], cost
+    def to_dict(self):
+        """
+        Structured results for the encounter
 
+        Returns
+        -------
+        results : dict
+            Difficulty method, monster power, monster XP, and difficulty
+        """
+        category, description, cost = self.difficulty()
+        return {
+            "method": self.method,
+            "monster_power": int(self.monster_party.power(self.party.tier())),
+            "xp": int(self.monster_party.xp()),
+            "difficulty": [category, description, float(cost)],
+        }
+
+    @timed("render.encounter")
     def __str__(self):
         return (
             "Encounter\n"
@@ -190,6 +436,7 @@ class AdventuringDay():
         self.party = party
         self.encounters = []
         self.consumables = 0
+        self.consumable_items = []
 
     def add(self, encounter):
         """Add encounter to the party"""
@@ -211,7 +458,9 @@ class AdventuringDay():
             self.party.tier(),
             f"{rarity}_{consumable_category}"
         ]
+        self.consumable_items.append((rarity, consumable_category))
 
+    @timed("adventuring_day.fatigue")
     def fatigue(self):
         """Compute the fatigue level for the adventuring day."""
 
@@ -234,12 +483,31 @@ class AdventuringDay():
         consumable_savings = self.consumables / self.party.count()
 
         # Get the fatigue for the day
-        fatigue = FATIGUE[
-            (FATIGUE["cost"] + consumable_savings) <= total_cost
-        ].iloc[-1]
+        return fatigue_level(total_cost, consumable_savings)
 
-        return fatigue["category"], fatigue["description"], total_cost
+    def to_dict(self):
+        """
+        Structured results for the adventuring day
 
+        Returns
+        -------
+        results : dict
+            Party summary, results of each encounter, consumables, and fatigue
+        """
+        category, description, total_cost = self.fatigue()
+        return {
+            "party": {
+                "count": self.party.count(),
+                "level": float(self.party.level()),
+                "tier": self.party.tier(),
+                "power": int(self.party.power()),
+            },
+            "encounters": [encounter.to_dict() for encounter in self.encounters],
+            "consumables": float(self.consumables),
+            "fatigue": [category, description, float(total_cost)],
+        }
+
+    @timed("render.adventuring_day")
     def __str__(self):
         return (
             self.party.__str__()
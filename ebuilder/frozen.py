@@ -0,0 +1,123 @@
+"""
+
+=========
+frozen.py
+=========
+
+Read-only data tables that can be shared between threads
+
+The data tables are loaded once on import and then only read, so threads can score
+encounters concurrently without locks. Freezing the tables turns an accidental write
+into an error instead of a race.
+
+"""
+
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+MASKED_ARRAYS = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+"""
+Nullable column types backed by a data array and a mask of missing values
+"""
+
+
+def freeze_array(values):
+    """
+    Read-only copy of an array
+
+    Parameters
+    ----------
+    values : array_like
+
+    Returns
+    -------
+    array : numpy.ndarray
+        Copy of values that cannot be modified in place. Arrays over read-only memory
+        (e.g. memory-mapped files) are returned without a copy
+    """
+    if isinstance(values, np.ndarray) and _read_only_memory(values):
+        return values
+    array = np.array(values, copy=True)
+    array.setflags(write=False)
+    return array
+
+
+def _read_only_memory(array):
+    """Check if the memory an array views cannot be written through any array"""
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return not array.flags.writeable
+
+
+def freeze_mapping(mapping):
+    """
+    Read-only view of a lookup table
+
+    Parameters
+    ----------
+    mapping : dict
+
+    Returns
+    -------
+    view : types.MappingProxyType
+    """
+    return MappingProxyType(dict(mapping))
+
+
+def _freeze_strings(values):
+    """Copy of a string column over a read-only object array"""
+    # Arrow-backed columns replace their buffers on assignment instead of writing to
+    # them, so every string column is stored as Python strings that numpy can freeze
+    return pd.arrays.StringArray(
+        freeze_array(values.to_numpy(dtype=object, na_value=values.dtype.na_value)),
+        dtype=pd.StringDtype("python", na_value=values.dtype.na_value),
+    )
+
+
+def _freeze_column(values):
+    """Copy of a column backed by read-only arrays"""
+    if isinstance(values.dtype, np.dtype):
+        return freeze_array(values.to_numpy())
+    if isinstance(values.array, MASKED_ARRAYS):
+        # Nullable integers, floats, and booleans keep their missing values
+        return type(values.array)(
+            freeze_array(values.to_numpy(values.dtype.numpy_dtype, na_value=0)),
+            freeze_array(values.isna().to_numpy()),
+        )
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(
+            freeze_array(values.array.codes), dtype=values.dtype, validate=False
+        )
+    if isinstance(values.dtype, pd.StringDtype):
+        return _freeze_strings(values)
+    # Other extension types are left as they are
+    return values.array
+
+
+def freeze_frame(df):
+    """
+    Copy of a data frame whose values cannot be modified in place
+
+    Setting values of numeric, boolean, categorical, string, and object columns (e.g.
+    with loc, iloc, iat, or through Series.array) raises a ValueError. String columns
+    are stored with the "python" string storage, so Arrow-backed strings are copied.
+    Columns of other extension types are not frozen. Frames derived from a frozen frame
+    (e.g. by filtering or with copy) can be modified as usual.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+
+    Returns
+    -------
+    frozen : pandas.DataFrame
+    """
+    frozen = pd.DataFrame(
+        {index: _freeze_column(df.iloc[:, index]) for index in range(df.shape[1])},
+        index=df.index,
+        copy=False,
+    )
+    frozen.columns = df.columns
+    return frozen
@@ -0,0 +1,298 @@
+"""
+
+=======
+grid.py
+=======
+
+Tools for building difficulty cheat sheets for a party
+
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from .encounter import (
+    difficulty_2024_from_xp,
+    difficulty_cr2_from_ratio,
+    thresholds_2024,
+)
+from .monsters import MONSTER_POWER, XP_BY_CR, cr_num_to_str, cr_str_to_num
+
+GRID_VALUES = ["power_ratio", "cr2_category", "cr2_cost", "xp", "category_2024", "nx_high"]
+"""
+Values computed for every cell of a difficulty grid
+"""
+
+
+def score_grid(power, xp, party_power, thresholds):
+    """
+    Score many encounters at once
+
+    Parameters
+    ----------
+    power : array_like
+        Total monster power of each encounter
+    xp : array_like
+        Total monster XP of each encounter
+    party_power : float
+        Power of the party
+    thresholds : numpy.ndarray
+        XP thresholds for the party (see ebuilder.encounter.thresholds_2024)
+
+    Returns
+    -------
+    scores : dict of numpy.ndarray
+        GRID_VALUES with the shape of power. Matches
+        ebuilder.Encounter.difficulty_cr2 and ebuilder.Encounter.difficulty_2024
+    """
+    power = np.asarray(power, dtype=float)
+    xp = np.asarray(xp, dtype=float)
+
+    ratio = power / party_power
+    cr2_category, _, cr2_cost = difficulty_cr2_from_ratio(ratio)
+    category_2024, _, nx_high = difficulty_2024_from_xp(xp, thresholds)
+
+    return {
+        "power_ratio": ratio,
+        "cr2_category": cr2_category,
+        "cr2_cost": cr2_cost,
+        "xp": xp,
+        "category_2024": category_2024,
+        "nx_high": nx_high,
+    }
+
+
+class DifficultyGrid():
+    """Class for the difficulty of a grid of encounters for one party"""
+
+    def __init__(self, party, rows, columns, power, xp, row_name, column_name):
+        """
+        Constructor for the difficulty grid
+
+        Parameters
+        ----------
+        party : ebuilder.Party
+        rows : list
+            Labels of the rows
+        columns : list
+            Labels of the columns
+        power : array_like
+            Total monster power of each cell with shape (rows, columns)
+        xp : array_like
+            Total monster XP of each cell with shape (rows, columns)
+        row_name : str
+            Name of the row labels
+        column_name : str
+            Name of the column labels
+        """
+        self.party = party
+        self.rows = list(rows)
+        self.columns = list(columns)
+        self.row_name = row_name
+        self.column_name = column_name
+        self.values = score_grid(
+            power,
+            xp,
+            party.power(),
+            thresholds_2024(party.level(), len(party))
+        )
+
+    @classmethod
+    def by_cr(cls, party, crs=None, counts=range(1, 21)):
+        """
+        Grid of encounters of several monsters of a single CR
+
+        Parameters
+        ----------
+        party : ebuilder.Party
+        crs : list of float, optional
+            Challenge ratings of the rows. Defaults to every CR in monster_power.csv
+        counts : list of int, optional
+            Number of monsters of the columns. Defaults to 1 through 20
+
+        Returns
+        -------
+        grid : ebuilder.DifficultyGrid
+        """
+        if crs is None:
+            crs = MONSTER_POWER.index
+        crs = np.asarray(crs, dtype=float)
+        counts = np.asarray(counts, dtype=int)
+
+        power = MONSTER_POWER[f"tier{party.tier()}"].reindex(crs).to_numpy(float)
+        xp_by_cr = XP_BY_CR["xp"].set_axis([cr_str_to_num(cr) for cr in XP_BY_CR.index])
+        xp = xp_by_cr.reindex(crs).to_numpy(float)
+        if np.isnan(power).any() or np.isnan(xp).any():
+            raise ValueError(f"Invalid CRs: {crs[np.isnan(power) | np.isnan(xp)]}")
+
+        return cls(
+            party,
+            [cr_num_to_str(cr) for cr in crs],
+            counts.tolist(),
+            power[:, None] * counts[None, :],
+            xp[:, None] * counts[None, :],
+            "cr",
+            "count",
+        )
+
+    @classmethod
+    def mixed(cls, party, monster_a, monster_b, counts_a=range(0, 11), counts_b=range(0, 11)):
+        """
+        Grid of encounters mixing two types of monsters
+
+        Parameters
+        ----------
+        party : ebuilder.Party
+        monster_a : ebuilder.Monster
+            Monster counted along the rows
+        monster_b : ebuilder.Monster
+            Monster counted along the columns
+        counts_a : list of int, optional
+            Number of monster_a of the rows. Defaults to 0 through 10
+        counts_b : list of int, optional
+            Number of monster_b of the columns. Defaults to 0 through 10
+
+        Returns
+        -------
+        grid : ebuilder.DifficultyGrid
+        """
+        counts_a = np.asarray(counts_a, dtype=int)
+        counts_b = np.asarray(counts_b, dtype=int)
+        tier = party.tier()
+
+        return cls(
+            party,
+            counts_a.tolist(),
+            counts_b.tolist(),
+            counts_a[:, None] * monster_a.power(tier) + counts_b[None, :] * monster_b.power(tier),
+            counts_a[:, None] * monster_a.xp() + counts_b[None, :] * monster_b.xp(),
+            monster_a.name,
+            monster_b.name,
+        )
+
+    def frame(self, value="cr2_category"):
+        """
+        Get one value of the grid as a matrix
+
+        Parameters
+        ----------
+        value : str, optional
+            One of GRID_VALUES. Defaults to "cr2_category"
+
+        Returns
+        -------
+        frame : pandas.DataFrame
+        """
+        return pd.DataFrame(
+            self.values[value],
+            index=pd.Index(self.rows, name=self.row_name),
+            columns=pd.Index(self.columns, name=self.column_name),
+        )
+
+    def to_frame(self):
+        """
+        Get the grid as a long table
+
+        Returns
+        -------
+        frame : pandas.DataFrame
+            One row per cell with the row and column labels and GRID_VALUES
+        """
+        rows, columns = np.meshgrid(
+            np.arange(len(self.rows)), np.arange(len(self.columns)), indexing="ij"
+        )
+        frame = pd.DataFrame({
+            self.row_name: np.array(self.rows, dtype=object)[rows.ravel()],
+            self.column_name: np.array(self.columns, dtype=object)[columns.ravel()],
+        })
+        for value in GRID_VALUES:
+            frame[value] = self.values[value].ravel()
+        return frame
+
+    def to_csv(self, path=None):
+        """
+        Export the grid as a long CSV table
+
+        Parameters
+        ----------
+        path : str, optional
+            Output file. Defaults to returning the CSV as a string
+
+        Returns
+        -------
+        csv : str or None
+        """
+        return self.to_frame().to_csv(path, index=False)
+
+    def to_json(self, path=None):
+        """
+        Export the grid as JSON
+
+        Parameters
+        ----------
+        path : str, optional
+            Output file. Defaults to returning the JSON as a string
+
+        Returns
+        -------
+        json : str or None
+            Party summary, row and column labels, and a matrix for each of GRID_VALUES
+        """
+        results = {
+            "party": {
+                "count": self.party.count(),
+                "level": float(self.party.level()),
+                "tier": self.party.tier(),
+                "power": int(self.party.power()),
+            },
+            "row_name": self.row_name,
+            "column_name": self.column_name,
+            "rows": self.rows,
+            "columns": self.columns,
+        }
+        for value in GRID_VALUES:
+            results[value] = self.values[value].tolist()
+
+        if path is None:
+            return json.dumps(results)
+        with open(path, "w") as json_file:
+            json.dump(results, json_file, indent=4)
+        return None
+
+    def to_markdown(self, path=None):
+        """
+        Export the grid as a printable Markdown table
+
+        Each cell shows the CR2.0 category and cost and the DMG 2024 category.
+
+        Parameters
+        ----------
+        path : str, optional
+            Output file. Defaults to returning the Markdown as a string
+
+        Returns
+        -------
+        markdown : str or None
+        """
+        cells = np.char.add(
+            np.char.add(self.values["cr2_category"].astype(str), " ("),
+            np.char.mod("%.1f", self.values["cr2_cost"]),
+        )
+        cells = np.char.add(np.char.add(cells, ") / "), self.values["category_2024"].astype(str))
+
+        lines = [
+            f"| {self.row_name} \\ {self.column_name} | "
+            + " | ".join([str(column) for column in self.columns]) + " |",
+            "|" + "---|" * (len(self.columns) + 1),
+        ]
+        for row, row_cells in zip(self.rows, cells):
+            lines.append(f"| {row} | " + " | ".join(row_cells) + " |")
+        markdown = "\n".join(lines) + "\n"
+
+        if path is None:
+            return markdown
+        with open(path, "w") as markdown_file:
+            markdown_file.write(markdown)
+        return None
@@ -0,0 +1,298 @@
+"""
+
+==============
+incremental.py
+==============
+
+Tools for re-scoring encounters and adventuring days as they are edited
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .encounter import (
+    CONSUMABLES,
+    Encounter,
+    difficulty_2024_from_xp,
+    difficulty_cr2_from_ratio,
+    fatigue_level,
+    thresholds_2024,
+)
+from .monsters import MonsterParty
+
+ChangeEvent = namedtuple("ChangeEvent", ["source", "action", "difficulty", "fatigue"])
+ChangeEvent.__doc__ = """
+Event emitted after each edit
+
+Attributes
+----------
+source : IncrementalEncounter or IncrementalAdventuringDay
+    Object that was edited
+action : str
+    Edit that was made ("add", "remove", "quantity", "add_encounter",
+    "remove_encounter", or "consumable")
+difficulty : tuple or None
+    New difficulty of the edited encounter (None for day-level edits)
+fatigue : tuple or None
+    New fatigue of the adventuring day (None for encounters not in a day)
+"""
+
+
+class IncrementalEncounter():
+    """Class for an encounter that keeps its difficulty up to date as it is edited"""
+
+    def __init__(self, party, method=None):
+        """
+        Constructor for the incremental encounter
+
+        The party's power, tier, and level are computed once, so the party must not
+        change while the encounter is edited.
+
+        Parameters
+        ----------
+        party : ebuilder.Party
+            Player character party
+        method : str, optional
+            Method for computing difficulty. Defaults to "cr2"
+        """
+        if method is None:
+            method = "cr2"
+        if method not in ["cr2", "2024"]:
+            raise RuntimeError(f"Unexpected difficulty method: {method}")
+
+        self.party = party
+        self.method = method
+        self.party_power = party.power()
+        self.tier = party.tier()
+        self.thresholds = thresholds_2024(party.level(), len(party))
+
+        self.groups = {}
+        self.monster_power = 0
+        self.xp = 0
+        self.listeners = []
+        self._next_handle = 0
+
+    def subscribe(self, callback):
+        """
+        Register a callback for change events
+
+        Parameters
+        ----------
+        callback : callable
+            Called with an ebuilder.incremental.ChangeEvent after each edit
+        """
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a callback registered with subscribe"""
+        self.listeners.remove(callback)
+
+    def _changed(self, action):
+        """Notify the listeners of an edit"""
+        event = ChangeEvent(self, action, self.difficulty(), None)
+        for callback in list(self.listeners):
+            callback(event)
+
+    def add(self, monster, quantity=1):
+        """
+        Add monsters to the encounter
+
+        Parameters
+        ----------
+        monster : ebuilder.Monster
+        quantity : int, optional
+            Number of this monster. Defaults to 1
+
+        Returns
+        -------
+        handle : int
+            Handle of the monster group for later edits
+        """
+        handle = self._next_handle
+        self._next_handle += 1
+
+        power = monster.power(self.tier)
+        xp = monster.xp()
+        self.groups[handle] = [monster, 0, power, xp]
+        self.set_quantity(handle, quantity, action="add")
+        return handle
+
+    def remove(self, handle):
+        """
+        Remove a monster group from the encounter
+
+        Parameters
+        ----------
+        handle : int
+            Handle returned by add
+        """
+        self.set_quantity(handle, 0, action="remove")
+        del self.groups[handle]
+
+    def set_quantity(self, handle, quantity, action="quantity"):
+        """
+        Change the number of monsters in a group
+
+        Parameters
+        ----------
+        handle : int
+            Handle returned by add
+        quantity : int
+            New number of monsters
+        action : str, optional
+            Action reported in the change event. Defaults to "quantity"
+        """
+        group = self.groups[handle]
+        _, old_quantity, power, xp = group
+        group[1] = quantity
+
+        self.monster_power += (quantity - old_quantity) * power
+        self.xp += (quantity - old_quantity) * xp
+        self._changed(action)
+
+    def difficulty(self):
+        """
+        Difficulty of the encounter from the running totals
+
+        Returns
+        -------
+        difficulty : tuple
+            Same as ebuilder.Encounter.difficulty
+        """
+        if self.method == "cr2":
+            return difficulty_cr2_from_ratio(self.monster_power / self.party_power)
+        return difficulty_2024_from_xp(self.xp, self.thresholds)
+
+    def monster_party(self):
+        """Get the monsters as an ebuilder.MonsterParty"""
+        monster_party = MonsterParty()
+        for monster, quantity, _, _ in self.groups.values():
+            monster_party.add(monster, quantity)
+        return monster_party
+
+    def to_encounter(self):
+        """Get the encounter as an ebuilder.Encounter"""
+        return Encounter(self.party, self.monster_party(), method=self.method)
+
+
+class IncrementalAdventuringDay():
+    """Class for an adventuring day that keeps its fatigue up to date as it is edited"""
+
+    def __init__(self, party):
+        """
+        Constructor for the incremental adventuring day
+
+        Parameters
+        ----------
+        party : ebuilder.Party
+        """
+        self.party = party
+        self.tier = party.tier()
+        self.count = party.count()
+        self.encounters = []
+        self.consumables = 0
+
+        self.costs = {}
+        self.total_cost = 0
+        self.num_not_cr2 = 0
+        self.listeners = []
+
+    def subscribe(self, callback):
+        """
+        Register a callback for change events
+
+        Parameters
+        ----------
+        callback : callable
+            Called with an ebuilder.incremental.ChangeEvent after each edit of the day
+            or any of its encounters
+        """
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a callback registered with subscribe"""
+        self.listeners.remove(callback)
+
+    def _changed(self, action, difficulty=None):
+        """Notify the listeners of an edit"""
+        event = ChangeEvent(self, action, difficulty, self.fatigue())
+        for callback in list(self.listeners):
+            callback(event)
+
+    def _encounter_changed(self, event):
+        """Update the total cost after an encounter was edited"""
+        encounter = event.source
+        cost = event.difficulty[2]
+        self.total_cost += cost - self.costs[id(encounter)]
+        self.costs[id(encounter)] = cost
+        self._changed(event.action, event.difficulty)
+
+    def add(self, encounter):
+        """
+        Add an encounter to the day
+
+        Parameters
+        ----------
+        encounter : ebuilder.incremental.IncrementalEncounter
+
+        Raises
+        ------
+        ValueError if the encounter is already in the day
+        """
+        # Costs are keyed by id, which is unique while self.encounters holds the
+        # encounter. Adding it twice would subscribe it twice and count it twice
+        if id(encounter) in self.costs:
+            raise ValueError("The encounter is already in the adventuring day")
+        difficulty = encounter.difficulty()
+        self.encounters.append(encounter)
+        self.costs[id(encounter)] = difficulty[2]
+        self.total_cost += difficulty[2]
+        self.num_not_cr2 += encounter.method != "cr2"
+        encounter.subscribe(self._encounter_changed)
+        self._changed("add_encounter", difficulty)
+
+    def remove(self, encounter):
+        """
+        Remove an encounter from the day
+
+        Parameters
+        ----------
+        encounter : ebuilder.incremental.IncrementalEncounter
+        """
+        self.encounters.remove(encounter)
+        self.total_cost -= self.costs.pop(id(encounter))
+        self.num_not_cr2 -= encounter.method != "cr2"
+        encounter.unsubscribe(self._encounter_changed)
+        self._changed("remove_encounter")
+
+    def add_consumable(self, rarity, consumable_category):
+        """
+        Add consumable categories to party
+
+        Parameters
+        ----------
+        rarity : str
+            Rarity category for consumable magic item. Must be UNCOMMON, RARE, VERYRARE,
+            or LEGENDARY
+        consumable_category : str
+            Category of consumable. Must be CHARGE or CONSUMABLE
+        """
+        self.consumables += CONSUMABLES.loc[self.tier, f"{rarity}_{consumable_category}"]
+        self._changed("consumable")
+
+    def fatigue(self):
+        """
+        Fatigue of the adventuring day from the running totals
+
+        Returns
+        -------
+        fatigue : tuple
+            Same as ebuilder.AdventuringDay.fatigue
+        """
+        # If any encounters aren't using the CR2.0 method, this
+        # calculation isn't valid.
+        if self.num_not_cr2:
+            return "N/A", "N/A", np.nan
+        return fatigue_level(self.total_cost, self.consumables / self.count)
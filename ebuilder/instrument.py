@@ -0,0 +1,224 @@
+"""
+
+=============
+instrument.py
+=============
+
+Named timers and counters for the hot paths of the encounter builder
+
+Instrumentation is disabled by default, leaving a single flag check on each
+instrumented call. Set the EBUILDER_STATS environment variable to 1 before importing
+ebuilder to also time the data tables loaded on import. Timers and counters can be
+updated from several threads.
+
+"""
+
+import os
+
+import io
+
+import time
+
+import threading
+
+import cProfile
+
+import pstats
+
+from contextlib import nullcontext
+
+from functools import wraps
+
+ENABLED = os.environ.get("EBUILDER_STATS", "0") not in ["", "0"]
+
+TIMERS = {}
+"""
+Number of calls and total seconds of each named timer
+"""
+
+COUNTERS = {}
+"""
+Total of each named counter
+"""
+
+_DISABLED_TIMER = nullcontext()
+
+_LOCK = threading.Lock()
+
+
+def enable_stats():
+    """Start recording timers and counters"""
+    global ENABLED
+    ENABLED = True
+
+
+def disable_stats():
+    """Stop recording timers and counters"""
+    global ENABLED
+    ENABLED = False
+
+
+def reset_stats():
+    """Clear all the recorded timers and counters"""
+    with _LOCK:
+        TIMERS.clear()
+        COUNTERS.clear()
+
+
+def stats():
+    """
+    Snapshot of the recorded timers and counters
+
+    Returns
+    -------
+    snapshot : dict
+        "timers" with the calls, total seconds, and mean seconds of each timer, and
+        "counters" with the total of each counter
+    """
+    with _LOCK:
+        timers = sorted(TIMERS.items())
+        counters = sorted(COUNTERS.items())
+    return {
+        "timers": {
+            name: {"calls": calls, "total": total, "mean": total / calls}
+            for name, (calls, total) in timers
+        },
+        "counters": dict(counters),
+    }
+
+
+class _Timer():
+    """Context manager adding the elapsed time to a named timer"""
+
+    __slots__ = ["name", "start"]
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        with _LOCK:
+            calls, total = TIMERS.get(self.name, (0, 0.0))
+            TIMERS[self.name] = (calls + 1, total + elapsed)
+        return False
+
+
+def timer(name):
+    """
+    Time a block of code
+
+    Parameters
+    ----------
+    name : str
+        Name of the timer, e.g. "encounter.difficulty_cr2"
+
+    Returns
+    -------
+    context : context manager
+    """
+    if not ENABLED:
+        return _DISABLED_TIMER
+    return _Timer(name)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function
+
+    Parameters
+    ----------
+    name : str
+        Name of the timer
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _Timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """
+    Add to a named counter
+
+    Parameters
+    ----------
+    name : str
+        Name of the counter, e.g. "cache.hits"
+    value : int, optional
+        Amount to add. Defaults to 1
+    """
+    if ENABLED:
+        with _LOCK:
+            COUNTERS[name] = COUNTERS.get(name, 0) + value
+
+
+def format_stats(snapshot=None):
+    """
+    Per-stage breakdown of the timers and counters
+
+    Parameters
+    ----------
+    snapshot : dict, optional
+        Result of stats. Defaults to the current stats
+
+    Returns
+    -------
+    breakdown : str
+    """
+    if snapshot is None:
+        snapshot = stats()
+
+    lines = [f"{'stage':<36} {'calls':>8} {'total (ms)':>12} {'mean (ms)':>12}"]
+    timers = sorted(snapshot["timers"].items(), key=lambda item: -item[1]["total"])
+    for name, timing in timers:
+        lines.append(
+            f"{name:<36} {timing['calls']:>8} {timing['total'] * 1e3:>12.3f} "
+            f"{timing['mean'] * 1e3:>12.3f}"
+        )
+    for name, value in snapshot["counters"].items():
+        lines.append(f"{name:<36} {value:>8}")
+    return "\n".join(lines)
+
+
+def profile(func, *args, pstats_file=None, num_lines=20, **kwargs):
+    """
+    Run a function with the stats enabled and under cProfile
+
+    Parameters
+    ----------
+    func : callable
+    *args
+        Positional arguments of func
+    pstats_file : str, optional
+        File to dump the pstats output to. Defaults to not dumping it
+    num_lines : int, optional
+        Number of functions with the highest cumulative time to include in the
+        report. Defaults to 20
+    **kwargs
+        Keyword arguments of func
+
+    Returns
+    -------
+    result
+        Return value of func
+    report : str
+        Per-stage breakdown followed by the cProfile summary
+    """
+    enable_stats()
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    if pstats_file is not None:
+        profiler.dump_stats(pstats_file)
+
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(num_lines)
+    return result, format_stats() + "\n" + summary.getvalue()
@@ -0,0 +1,123 @@
+"""
+
+==========
+library.py
+==========
+
+Libraries of owned sourcebooks for filtering the compendium at query time
+
+The book of each compendium row is stored as a categorical code, so a library becomes
+a table with one owned flag per book of the compendium, and the owned rows are found by
+indexing that table with the codes. Libraries are small and immutable, so each table
+(or request) can have its own without rebuilding or copying the compendium.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_book(book):
+    """
+    Normalize the name of a sourcebook
+
+    Parameters
+    ----------
+    book : str
+        Name of the book, possibly as parsed from a source (e.g. "Monster Manual,"
+        from "Monster Manual, p. 12")
+
+    Returns
+    -------
+    name : str
+    """
+    return book.strip().rstrip(",").strip()
+
+
+class Library():
+    """Class for a collection of owned sourcebooks"""
+
+    __slots__ = ["books"]
+
+    def __init__(self, books):
+        """
+        Constructor for the library
+
+        Parameters
+        ----------
+        books : iterable of str
+            Names of the owned sourcebooks
+        """
+        self.books = frozenset(normalize_book(book) for book in books)
+
+    @staticmethod
+    def from_books(books):
+        """
+        Library of a list of books, or the library itself
+
+        Parameters
+        ----------
+        books : ebuilder.library.Library or iterable of str
+
+        Returns
+        -------
+        library : ebuilder.library.Library
+        """
+        if isinstance(books, Library):
+            return books
+        if isinstance(books, str):
+            raise TypeError("Provide a list of books, not a single book name")
+        return Library(books)
+
+    def __contains__(self, book):
+        return isinstance(book, str) and normalize_book(book) in self.books
+
+    def __iter__(self):
+        return iter(sorted(self.books))
+
+    def __len__(self):
+        return len(self.books)
+
+    def __eq__(self, other):
+        return isinstance(other, Library) and self.books == other.books
+
+    def __hash__(self):
+        return hash(self.books)
+
+    def __repr__(self):
+        return f"Library({sorted(self.books)})"
+
+    def book_flags(self, books):
+        """
+        Owned flag of each book
+
+        Parameters
+        ----------
+        books : iterable of str
+            Names of books, e.g. the categories of a compendium's book column
+
+        Returns
+        -------
+        flags : numpy.ndarray
+            Flag of each book, followed by False for missing books
+        """
+        return np.array([book in self for book in books] + [False], dtype=bool)
+
+    def owned(self, books):
+        """
+        Check which rows of a compendium are from an owned book
+
+        Parameters
+        ----------
+        books : pandas.Series
+            Book column of a compendium
+
+        Returns
+        -------
+        owned : numpy.ndarray
+            Owned flag of each row
+        """
+        if isinstance(books.dtype, pd.CategoricalDtype):
+            # Missing books have code -1, the last flag
+            return self.book_flags(books.cat.categories)[books.array.codes]
+        return np.fromiter((book in self for book in books), dtype=bool, count=len(books))
@@ -0,0 +1,256 @@
+"""
+
+=======
+loot.py
+=======
+
+Non-repeating loot across the sessions of a campaign
+
+A LootSampler keeps the compendium rows it has issued as a bitset (one bit per row), so
+an item is not drawn again until every other candidate of the draw has been issued. The
+candidates of each combination of filters are found once and shuffled, and draws walk
+that order past the issued rows, so a draw costs about as much as its result instead of
+filtering the compendium again. Only the bitset and the random state are saved, which
+keeps a campaign's state to a few kilobytes.
+
+"""
+
+import os
+
+import json
+
+import hashlib
+
+import numpy as np
+
+from .instrument import timed
+from .library import Library
+from .randomizer import Randomizer
+
+
+class _Pool():
+    """Shuffled candidates of one combination of filters"""
+
+    __slots__ = ["df", "rows", "order", "cursor", "repeats"]
+
+    def __init__(self, df, rows):
+        self.df = df
+        self.rows = rows
+        self.order = None
+        self.cursor = 0
+        # Number of times every candidate has been issued
+        self.repeats = 0
+
+
+class LootSampler():
+    """Class for drawing random items without repeats across a campaign"""
+
+    def __init__(self, category="item", randomizer=None, seed=None):
+        """
+        Constructor for the loot sampler
+
+        Parameters
+        ----------
+        category : str, optional
+            Category of compendium. Defaults to "item"
+        randomizer : ebuilder.Randomizer, optional
+            Randomizer to load the compendium with. Defaults to a new randomizer
+        seed : int, optional
+            Seed of the random draws
+        """
+        self.category = category
+        self.randomizer = Randomizer() if randomizer is None else randomizer
+        self.rng = np.random.default_rng(seed)
+
+        names = self.randomizer.get_compendium(category, columns=["name"])["name"]
+        self.num_rows = len(names)
+        self.fingerprint = self._fingerprint(names)
+        self.issued = np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+        self.pools = {}
+
+    @staticmethod
+    def _fingerprint(names):
+        """Hash of the compendium rows that issued row numbers refer to"""
+        return hashlib.sha256(
+            "\n".join(names.fillna("").astype(str)).encode("utf-8")
+        ).hexdigest()
+
+    def __len__(self):
+        """Number of issued items"""
+        return int(np.unpackbits(self.issued).sum())
+
+    def is_issued(self, rows):
+        """
+        Check if rows have been issued
+
+        Parameters
+        ----------
+        rows : numpy.ndarray
+            Row numbers of the compendium
+
+        Returns
+        -------
+        issued : numpy.ndarray
+            Issued flag of each row
+        """
+        return ((self.issued[rows >> 3] >> (rows & 7).astype(np.uint8)) & 1).astype(bool)
+
+    def issue(self, rows):
+        """
+        Mark rows as issued (e.g. items given out without the sampler)
+
+        Parameters
+        ----------
+        rows : array_like of int
+            Row numbers of the compendium
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        np.bitwise_or.at(self.issued, rows >> 3, (1 << (rows & 7)).astype(np.uint8))
+
+    def issued_rows(self):
+        """Row numbers of the issued items"""
+        return np.flatnonzero(
+            np.unpackbits(self.issued, count=self.num_rows, bitorder="little")
+        )
+
+    def reset(self):
+        """Forget the issued items"""
+        self.issued[:] = 0
+        self.pools = {}
+
+    def _pool(self, search, library, kwargs):
+        """Candidates of a combination of filters (found once)"""
+        if library is not None:
+            library = Library.from_books(library)
+        key = (
+            search,
+            library,
+            tuple(sorted(
+                (name, None if values is None else tuple(values))
+                for name, values in kwargs.items()
+            )),
+        )
+        pool = self.pools.get(key)
+        if pool is None:
+            df, rows = self.randomizer.candidates(
+                self.category, search, library, **kwargs
+            )
+            pool = _Pool(df, rows)
+            self.pools[key] = pool
+        return pool
+
+    def _take(self, pool, num):
+        """Take up to num candidates of the pool that have not been issued"""
+        taken = []
+        while (len(taken) < num) and (pool.cursor < len(pool.order)):
+            # Check a window of the shuffled candidates at a time
+            window = pool.order[pool.cursor:pool.cursor + 2 * (num - len(taken))]
+            if pool.repeats == 0:
+                fresh = window[~self.is_issued(window)]
+            else:
+                fresh = window
+            fresh = fresh[:num - len(taken)]
+            taken.extend(fresh)
+            if len(fresh) and (len(taken) == num):
+                # Only the candidates up to the last one taken have been passed
+                pool.cursor += int(np.flatnonzero(window == fresh[-1])[0]) + 1
+            else:
+                pool.cursor += len(window)
+        return taken
+
+    @timed("loot.draw")
+    def draw(self, num=1, search=None, library=None, **kwargs):
+        """
+        Draw random items that have not been issued yet
+
+        Once every candidate of the filters has been issued, the candidates are
+        shuffled again and issued once more (so a repeat only comes after every other
+        candidate).
+
+        Parameters
+        ----------
+        num : int, optional
+            Number of items. Defaults to 1
+        search, library, **kwargs
+            Keyword query, library, and column filters (see
+            ebuilder.Randomizer.random_item)
+
+        Returns
+        -------
+        items : pandas.DataFrame
+            Random items
+        """
+        pool = self._pool(search, library, kwargs)
+        if len(pool.rows) == 0:
+            raise RuntimeError("No remaining items after filtering.")
+        if num > len(pool.rows):
+            raise ValueError(
+                f"Cannot draw {num} items from {len(pool.rows)} candidates without repeats"
+            )
+
+        if pool.order is None:
+            pool.order = self.rng.permutation(pool.rows)
+        taken = self._take(pool, num)
+        if len(taken) < num:
+            # Every candidate has been issued: start over, with the candidates just
+            # taken last so this draw has no repeats
+            pool.order = np.concatenate([
+                self.rng.permutation(np.setdiff1d(pool.rows, taken)),
+                self.rng.permutation(np.array(taken, dtype=pool.rows.dtype)),
+            ])
+            pool.cursor = 0
+            pool.repeats += 1
+            taken.extend(self._take(pool, num - len(taken)))
+
+        rows = np.array(taken, dtype=np.int64)
+        self.issue(rows)
+        return self.randomizer.items(self.category, pool.df, rows, library)
+
+    def save(self, filename):
+        """
+        Save the issued items and random state
+
+        Parameters
+        ----------
+        filename : str
+            Path of the state file (NumPy .npz)
+        """
+        with open(filename + ".tmp", "wb") as state_file:
+            np.savez(
+                state_file,
+                issued=self.issued,
+                category=self.category,
+                num_rows=self.num_rows,
+                fingerprint=self.fingerprint,
+                rng=json.dumps(self.rng.bit_generator.state),
+            )
+        os.replace(filename + ".tmp", filename)
+
+    @staticmethod
+    def load(filename, randomizer=None):
+        """
+        Restore a sampler saved with LootSampler.save
+
+        Parameters
+        ----------
+        filename : str
+            Path of the state file
+        randomizer : ebuilder.Randomizer, optional
+            Randomizer to load the compendium with. Defaults to a new randomizer
+
+        Returns
+        -------
+        sampler : ebuilder.LootSampler
+        """
+        with np.load(filename) as state:
+            sampler = LootSampler(str(state["category"]), randomizer)
+            if (
+                int(state["num_rows"]) != sampler.num_rows
+                or str(state["fingerprint"]) != sampler.fingerprint
+            ):
+                raise ValueError(
+                    f"The {sampler.category} compendium changed since {filename} was saved"
+                )
+            sampler.issued[:] = state["issued"]
+            sampler.rng.bit_generator.state = json.loads(str(state["rng"]))
+        return sampler
@@ -10,17 +10,51 @@ Main script for running encounters
 
 import os
 
+import json
+
+from .cache import ResultCache
 from .encounter import AdventuringDay, Encounter
 from .monsters import MonsterParty, Monster, cr_str_to_num
 from .party import Party
 
 
+def monster_party_from_names(names, library=None):
+    """
+    Create a monster party from monster names and CRs
+
+    Parameters
+    ----------
+    names : list
+        Monster names in the compendium, or CRs as numbers or strings (e.g. "1/4")
+    library : ebuilder.library.Library or list of str, optional
+        Only allow named monsters from these books. Defaults to all books
+
+    Returns
+    -------
+    monster_party : ebuilder.MonsterParty
+    """
+    monster_party = MonsterParty()
+    for name in names:
+        if isinstance(name, int) or isinstance(name, float):
+            monster_party.add(Monster.from_cr(name))
+        elif name.isnumeric():
+            monster_party.add(Monster.from_cr(cr_str_to_num(name)))
+        else:
+            try:
+                cr_str_to_num(name)
+                monster_party.add(Monster.from_cr(cr_str_to_num(name)))
+            except ValueError:
+                monster_party.add(Monster.from_name(name, library=library))
+    return monster_party
+
+
 def main(
         party_json,
         monsters,
         charge_consumables=None,
         onetime_consumables=None,
-        difficulty_method="cr2"
+        difficulty_method="cr2",
+        cache_file=None
     ):
     """
     Main script for encounter builing
@@ -39,6 +73,15 @@ def main(
         that are one-time use only
     difficulty_method : str, optional
         Method for computing difficulty. Defaults to "cr2"
+    cache_file : str, optional
+        Path to a result cache. When provided, the structured results are looked up in
+        (or stored to) the cache, printed as JSON, and returned. Defaults to None
+
+    Returns
+    -------
+    results : dict or None
+        Structured results when a cache file is provided. See
+        ebuilder.AdventuringDay.to_dict
     """
 
     # Build party
@@ -53,18 +96,7 @@ def main(
                 Encounter(party, monster_party, method=difficulty_method)
             )
     else:
-        monster_party = MonsterParty()
-        for name in monsters:
-            if isinstance(name, int) or isinstance(name, float):
-                monster_party.add(Monster.from_cr(name))
-            elif name.isnumeric():
-                monster_party.add(Monster.from_cr(cr_str_to_num(name)))
-            else:
-                try:
-                    cr_str_to_num(name)
-                    monster_party.add(Monster.from_cr(cr_str_to_num(name)))
-                except ValueError:
-                    monster_party.add(Monster.from_name(name))
+        monster_party = monster_party_from_names(monsters)
         adventuring_day.add(Encounter(party, monster_party, method=difficulty_method))
 
     # Add consumables
@@ -76,4 +108,12 @@ def main(
             adventuring_day.add_consumable(consumable, "CONSUMABLE")
 
     # Print results
-    print(adventuring_day)
+    if cache_file is None:
+        print(adventuring_day)
+        return None
+
+    cache = ResultCache(cache_file)
+    results = cache.score(adventuring_day)
+    cache.close()
+    print(json.dumps(results, indent=4))
+    return results
@@ -13,25 +13,123 @@ import os
 
 import json
 
+import threading
+
+import numpy as np
 import pandas as pd
 
+from .challenge import recalculate_cr
+from .frozen import freeze_frame, freeze_mapping
+from .instrument import timed, timer
+from .library import Library, normalize_book
 from .randomizer import Randomizer
 
-MONSTERS = Randomizer().get_compendium("monster").set_index("name")
-MONSTERS.index = MONSTERS.index.str.lower()
+RANDOMIZER = Randomizer()
+"""
+Randomizer the monster compendium and its search index are loaded with
+"""
+
+with timer("load.compendium"):
+    # Monsters by unique lowercase name, so each lookup finds one row (see
+    # ebuilder.Randomizer.entities). The long text columns are not needed
+    MONSTER_KEYS, MONSTER_ALIASES = RANDOMIZER.entities("monster")
+    MONSTERS = freeze_frame(
+        RANDOMIZER.get_compendium("monster", text=False).set_axis(MONSTER_KEYS)
+    )
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
-MONSTER_POWER = pd.read_csv(os.path.join(
+MONSTER_POWER = freeze_frame(pd.read_csv(os.path.join(
     DATA_DIR,
     "monster_power.csv"
-)).set_index("cr")
+)).set_index("cr"))
 
 XP_BY_CR = pd.read_csv(os.path.join(
     DATA_DIR,
     "xp_by_cr.csv"
 )).set_index("cr")
 XP_BY_CR.index = XP_BY_CR.index.astype(str)
+XP_BY_CR = freeze_frame(XP_BY_CR)
+
+POWER_BY_TIER = freeze_mapping({
+    tier: freeze_mapping(MONSTER_POWER[f"tier{tier}"].to_dict()) for tier in range(1, 5)
+})
+"""
+Monster power by effective CR for each tier of play
+"""
+
+XP_BY_CR_STR = freeze_mapping(XP_BY_CR["xp"].to_dict())
+"""
+Monster XP by CR string
+"""
+
+CALCULATED_CR = None
+"""
+Challenge ratings recalculated from the compendium stat blocks (computed when first
+needed)
+"""
+
+_CALCULATED_CR_LOCK = threading.Lock()
+
+
+def calculated_cr():
+    """
+    Get the challenge ratings recalculated from the monster compendium
+
+    Returns
+    -------
+    crs : pandas.DataFrame
+        Listed and recalculated CRs indexed by lowercase monster name. See
+        ebuilder.challenge.recalculate_cr.
+    """
+    global CALCULATED_CR
+    if CALCULATED_CR is None:
+        # Only one thread recalculates, the others wait for its result
+        with _CALCULATED_CR_LOCK:
+            if CALCULATED_CR is None:
+                CALCULATED_CR = freeze_frame(recalculate_cr(MONSTERS))
+    return CALCULATED_CR
+
+
+def monster_key(name, library=None):
+    """
+    Find the key of a monster in MONSTERS
+
+    Parameters
+    ----------
+    name : str
+        Name of the monster (the canonical entry of the name), or an alias such as
+        "Goblin (Monster Manual 2024)"
+    library : ebuilder.library.Library or list of str, optional
+        Only find monsters from these books. When the entry of the name is from
+        another book, the entry of the same name from a book of the library (or the
+        entry it was merged into) is found instead. Defaults to all books
+
+    Returns
+    -------
+    key : str or None
+        None when the name is not in the compendium (or the library)
+    """
+    key = name.lower()
+    if key not in MONSTERS.index:
+        key = MONSTER_ALIASES.get(key)
+    if (key is None) or (library is None):
+        return key
+
+    library = Library.from_books(library)
+    if MONSTERS.at[key, "book"] in library:
+        return key
+
+    # Copies of the monster in the books of the library, preferred books first
+    ranks = {normalize_book(book): rank for rank, book in enumerate(RANDOMIZER.precedence)}
+    base = str(MONSTERS.at[key, "name"]).lower()
+    for book in sorted(library, key=lambda book: (ranks.get(book, len(ranks)), book)):
+        alias = f"{base} ({book.lower()})"
+        copy = alias if alias in MONSTERS.index else MONSTER_ALIASES.get(alias)
+        if copy is not None:
+            return copy
+    return None
+
 
 def cr_num_to_str(cr_num):
     """
@@ -91,6 +189,8 @@ class Monster():
         """
         self.name = name
         self.cr = cr
+        self.bypass_resistance = bypass_resistance
+        self.ohko = ohko
 
         # Effective CR
         self.cr_eff = cr
@@ -113,13 +213,13 @@ class Monster():
         monster_power : int
             Power of monsters in the party
         """
-        return MONSTER_POWER[f"tier{tier}"][self.cr_eff]
+        return POWER_BY_TIER[tier][self.cr_eff]
 
     def xp(self):
         """
         Compute the monster xp
         """
-        return XP_BY_CR.loc[cr_num_to_str(self.cr), "xp"]
+        return XP_BY_CR_STR[cr_num_to_str(self.cr)]
 
     def __str__(self):
         return (
@@ -128,14 +228,94 @@ class Monster():
         )
 
     @staticmethod
-    def from_name(name):
-        """Create a Monster from the Name"""
-        monster = MONSTERS.loc[name.lower()]
+    @timed("monster.from_name")
+    def from_name(name, recalculate_cr=False, library=None):
+        """
+        Create a Monster from the Name
 
-        cr = monster["cr"]
-        cr = cr_str_to_num(cr)
+        Parameters
+        ----------
+        name : str
+            Name of the monster in the compendium
+        recalculate_cr : bool, optional
+            Flag to use the CR recalculated from the monster's stat block as the
+            effective CR. Defaults to False
+        library : ebuilder.library.Library or list of str, optional
+            Only allow monsters from these books. When the entry of the name is from
+            another book, its copy from a book of the library is used (see
+            monster_key). Defaults to all books
 
-        return Monster(name, cr)
+        Returns
+        -------
+        monster : ebuilder.Monster
+        """
+        key = monster_key(name)
+        if key is None:
+            raise KeyError(f"Monster {name} is not in the compendium")
+        if library is not None:
+            in_library = monster_key(name, library)
+            if in_library is None:
+                raise KeyError(
+                    f"Monster {name} is not in the library ({MONSTERS.at[key, 'book']})"
+                )
+            key = in_library
+
+        return Monster.from_key(key, recalculate_cr, name)
+
+    @staticmethod
+    def from_key(key, recalculate_cr=False, name=None):
+        """
+        Create a Monster from its key in MONSTERS
+
+        Parameters
+        ----------
+        key : str
+            Unique key of the monster (see monster_key)
+        recalculate_cr : bool, optional
+            Flag to use the CR recalculated from the monster's stat block as the
+            effective CR. Defaults to False
+        name : str, optional
+            Name of the monster. Defaults to its name in the compendium
+
+        Returns
+        -------
+        monster : ebuilder.Monster
+        """
+        entry = MONSTERS.loc[key]
+        if name is None:
+            name = entry["name"]
+        monster = Monster(name, cr_str_to_num(entry["cr"]))
+        if recalculate_cr:
+            cr_calc = calculated_cr().loc[key, "cr_calc"]
+            if not np.isnan(cr_calc):
+                monster.cr_eff = cr_calc
+
+        return monster
+
+    @staticmethod
+    def from_search(query, recalculate_cr=False, **kwargs):
+        """
+        Create a Monster from the best match of a keyword query
+
+        Parameters
+        ----------
+        query : str
+            Query of the monster names and stat blocks (see
+            ebuilder.search.SearchIndex.search), e.g. '"pack tactics"'
+        recalculate_cr : bool, optional
+            Flag to use the CR recalculated from the monster's stat block as the
+            effective CR. Defaults to False
+        **kwargs
+            Column filters, e.g. cr=["1/2", "1"] (see ebuilder.Randomizer.random_item)
+
+        Returns
+        -------
+        monster : ebuilder.Monster
+        """
+        monsters = search_monsters(query, num=1, recalculate_cr=recalculate_cr, **kwargs)
+        if not monsters:
+            raise KeyError(f"No monster matches {query!r}")
+        return monsters[0]
 
     @staticmethod
     def from_cr(cr):
@@ -144,6 +324,38 @@ class Monster():
 
         return Monster(name, cr)
 
+@timed("monster.search")
+def search_monsters(query, num=None, recalculate_cr=False, library=None, **kwargs):
+    """
+    Find the monsters matching a keyword query, best match first
+
+    Parameters
+    ----------
+    query : str
+        Query of the monster names and stat blocks (see
+        ebuilder.search.SearchIndex.search), e.g. "legendary resistance"
+    num : int, optional
+        Maximum number of monsters. Defaults to every match
+    recalculate_cr : bool, optional
+        Flag to use the CRs recalculated from the monsters' stat blocks as their
+        effective CRs. Defaults to False
+    library : ebuilder.library.Library or list of str, optional
+        Only find monsters from these books. Defaults to all books
+    **kwargs
+        Column filters, e.g. cr=["1/2", "1"] (see ebuilder.Randomizer.random_item)
+
+    Returns
+    -------
+    monsters : list of ebuilder.Monster
+    """
+    # The rows of the matches are resolved by their keys, so each monster is the entry
+    # that matched (and not the canonical entry of its name from another book)
+    rows, _ = RANDOMIZER.search_rows("monster", query, num=num, library=library, **kwargs)
+    return [
+        Monster.from_key(MONSTERS.index[row], recalculate_cr=recalculate_cr) for row in rows
+    ]
+
+
 class MonsterParty():
     """Class for modeling a party of monsters"""
 
@@ -158,7 +370,11 @@ class MonsterParty():
         """Create a monster party from a JSON file"""
         with open(json_file, "r") as json_data:
             monster_list = json.load(json_data)
+        return MonsterParty.from_list(monster_list)
 
+    @staticmethod
+    def from_list(monster_list):
+        """Create a monster party from a list of monsters in the JSON file format"""
         # Loop through each member in the party and add them in
         party = MonsterParty()
         for monster_dict in monster_list:
@@ -173,11 +389,11 @@ class MonsterParty():
         return party
 
     @staticmethod
-    def from_names(names):
-        """Create a monster party from a list of monster names"""
+    def from_names(names, library=None):
+        """Create a monster party from a list of monster names (in a library if given)"""
         party = MonsterParty()
         for name in names:
-            party.add(Monster.from_name(name))
+            party.add(Monster.from_name(name, library=library))
         return party
 
     @staticmethod
@@ -12,6 +12,7 @@ import json
 
 import numpy as np
 
+from .instrument import timed
 from .pc import PlayerCharacter
 
 
@@ -30,11 +31,16 @@ class Party():
         return len(self.pcs)
 
     @classmethod
+    @timed("party.from_json")
     def from_json(cls, json_file):
         """Create a party from a JSON file"""
         with open(json_file, "r") as json_data:
             party_list = json.load(json_data)
+        return cls.from_list(party_list)
 
+    @classmethod
+    def from_list(cls, party_list):
+        """Create a party from a list of player characters in the JSON file format"""
         # Loop through each member in the party and add them in
         party = Party()
         for pc_dict in party_list:
@@ -87,6 +93,7 @@ class Party():
 
         raise ValueError(f"Invalid party level: {level}")
 
+    @timed("render.party")
     def __str__(self):
         return (
             "Party\n"
@@ -0,0 +1,303 @@
+"""
+
+==============
+party_frame.py
+==============
+
+Tools for modeling many characters and parties at once
+
+"""
+
+import json
+
+import numpy as np
+
+from .party import Party
+from .pc import ADVANTAGE_FLAGS, CLASS_CATEGORIES, MAX_LEVEL, PlayerCharacter
+
+CLASS_NAMES = list(CLASS_CATEGORIES)
+"""
+Class names in the order of the columns of the class level arrays
+"""
+
+CATEGORY_NAMES = ["CASTER", "MARTIAL", "HALF-CASTER"]
+
+CLASS_CATEGORY_CODES = np.array([
+    CATEGORY_NAMES.index(CLASS_CATEGORIES[class_name]) for class_name in CLASS_NAMES
+])
+
+TIER_MAX_LEVELS = np.array([4, 10, 16, 20])
+"""
+Maximum average party level of each tier
+"""
+
+
+def extract_levels(class_levels, primary_class=None):
+    """
+    Extract levels into primary, auxiliary, and junk levels for many characters
+
+    Vectorized version of ebuilder.PlayerCharacter.extract_levels
+
+    Parameters
+    ----------
+    class_levels : array_like
+        Levels in each class of CLASS_NAMES with shape (characters, classes)
+    primary_class : array_like, optional
+        Column of the primary class of each character. Defaults to the class with the
+        most levels (the first in CLASS_NAMES for ties)
+
+    Returns
+    -------
+    primary_levels : numpy.ndarray
+    aux_levels : numpy.ndarray
+    junk_levels : numpy.ndarray
+    """
+    class_levels = np.asarray(class_levels, dtype=int)
+    if primary_class is None:
+        primary_class = class_levels.argmax(axis=1)
+    primary_class = np.asarray(primary_class, dtype=int)
+
+    caster, martial, half = [
+        class_levels[:, CLASS_CATEGORY_CODES == code].sum(axis=1)
+        for code in range(len(CATEGORY_NAMES))
+    ]
+    primary = class_levels[np.arange(len(class_levels)), primary_class]
+    category = CLASS_CATEGORY_CODES[primary_class]
+
+    is_caster = category == CATEGORY_NAMES.index("CASTER")
+    is_martial = category == CATEGORY_NAMES.index("MARTIAL")
+    aux = np.select(
+        [is_caster, is_martial],
+        [half, martial - primary + half],
+        caster + martial + half - primary
+    )
+    junk = np.select(
+        [is_caster, is_martial],
+        [caster - primary + martial, caster],
+        0
+    )
+    return primary, aux, junk
+
+
+class PartyFrame():
+    """
+    Class to represent many characters grouped into parties as arrays
+    """
+
+    def __init__(
+        self,
+        primary_levels,
+        aux_levels,
+        junk_levels,
+        item_totals,
+        advantages,
+        party_ids,
+        names=None
+    ):
+        """
+        Constructor for the party frame
+
+        Parameters
+        ----------
+        primary_levels : array_like
+            Number of primary levels of each character
+        aux_levels : array_like
+            Number of auxiliary levels of each character
+        junk_levels : array_like
+            Number of junk levels of each character
+        item_totals : array_like
+            Total item bonuses of each character
+        advantages : array_like
+            Boolean ADVANTAGE_FLAGS of each character with shape (characters, 3)
+        party_ids : array_like
+            Party of each character (integers from 0)
+        names : list of str, optional
+            Name of each character. Defaults to None
+        """
+        self.primary_levels = np.asarray(primary_levels, dtype=int)
+        self.aux_levels = np.asarray(aux_levels, dtype=int)
+        self.junk_levels = np.asarray(junk_levels, dtype=int)
+        self.item_totals = np.asarray(item_totals, dtype=int)
+        self.advantages = np.asarray(advantages, dtype=bool).reshape(-1, len(ADVANTAGE_FLAGS))
+        self.party_ids = np.asarray(party_ids, dtype=int)
+        if names is None:
+            names = [f"PC{index + 1}" for index in range(len(self.party_ids))]
+        self.names = list(names)
+
+    def __len__(self):
+        return len(self.party_ids)
+
+    @classmethod
+    def from_class_levels(
+        cls,
+        class_levels,
+        item_totals,
+        advantages,
+        party_ids,
+        names=None,
+        primary_class=None
+    ):
+        """
+        Create a party frame from levels in each class
+
+        Parameters
+        ----------
+        class_levels : array_like
+            Levels in each class of CLASS_NAMES with shape (characters, classes)
+        item_totals : array_like
+            Total item bonuses of each character
+        advantages : array_like
+            Boolean ADVANTAGE_FLAGS of each character with shape (characters, 3)
+        party_ids : array_like
+            Party of each character (integers from 0)
+        names : list of str, optional
+            Name of each character. Defaults to None
+        primary_class : array_like, optional
+            Column of the primary class of each character. Defaults to the class with
+            the most levels
+
+        Returns
+        -------
+        frame : ebuilder.PartyFrame
+        """
+        primary, aux, junk = extract_levels(class_levels, primary_class)
+        return cls(primary, aux, junk, item_totals, advantages, party_ids, names)
+
+    @classmethod
+    def from_records(cls, records, party_ids):
+        """
+        Create a party frame from player character dictionaries
+
+        Parameters
+        ----------
+        records : list of dict
+            Player characters in the format of the party JSON file
+        party_ids : array_like
+            Party of each character (integers from 0)
+
+        Returns
+        -------
+        frame : ebuilder.PartyFrame
+        """
+        class_levels = np.zeros((len(records), len(CLASS_NAMES)), dtype=int)
+        primary_class = np.zeros(len(records), dtype=int)
+        item_totals = np.zeros(len(records), dtype=int)
+        advantages = np.zeros((len(records), len(ADVANTAGE_FLAGS)), dtype=bool)
+        for row, record in enumerate(records):
+            levels = record["LEVELS"]
+            for class_name, num_levels in levels.items():
+                class_levels[row, CLASS_NAMES.index(class_name.upper())] = num_levels
+            primary_class[row] = CLASS_NAMES.index(max(levels, key=levels.get).upper())
+            item_totals[row] = sum(record.get("ITEMS", {}).values())
+            advantage = record.get("ADVANTAGE") or {}
+            advantages[row] = [advantage.get(flag, False) for flag in ADVANTAGE_FLAGS]
+
+        return cls.from_class_levels(
+            class_levels,
+            item_totals,
+            advantages,
+            party_ids,
+            [record["NAME"] for record in records],
+            primary_class
+        )
+
+    @classmethod
+    def from_json(cls, json_files):
+        """Create a party frame from party JSON files (one party per file)"""
+        records = []
+        party_ids = []
+        for party_id, json_file in enumerate(json_files):
+            with open(json_file, "r") as json_data:
+                party_list = json.load(json_data)
+            records.extend(party_list)
+            party_ids.extend([party_id] * len(party_list))
+        return cls.from_records(records, party_ids)
+
+    @classmethod
+    def from_parties(cls, parties):
+        """
+        Create a party frame from parties
+
+        Parameters
+        ----------
+        parties : list of ebuilder.Party
+
+        Returns
+        -------
+        frame : ebuilder.PartyFrame
+        """
+        pcs = [pc for party in parties for pc in party.pcs]
+        return cls(
+            [pc.primary_levels for pc in pcs],
+            [pc.aux_levels for pc in pcs],
+            [pc.junk_levels for pc in pcs],
+            [sum(pc.items.values()) for pc in pcs],
+            [[pc.advantages.get(flag, False) for flag in ADVANTAGE_FLAGS] for pc in pcs],
+            [party_id for party_id, party in enumerate(parties) for _ in party.pcs],
+            [pc.name for pc in pcs],
+        )
+
+    def level(self):
+        """Total level of each character"""
+        return self.primary_levels + self.aux_levels + self.junk_levels
+
+    def power(self):
+        """Power of each character"""
+        return PlayerCharacter.batch_power(
+            self.primary_levels,
+            self.aux_levels,
+            self.junk_levels,
+            self.item_totals,
+            *self.advantages.T
+        )
+
+    def party_count(self):
+        """Number of characters in each party"""
+        return np.bincount(self.party_ids)
+
+    def party_power(self):
+        """Total power of each party"""
+        return np.bincount(self.party_ids, weights=self.power()).astype(int)
+
+    def party_level(self):
+        """Average level of each party"""
+        return np.bincount(self.party_ids, weights=self.level()) / self.party_count()
+
+    def party_tier(self):
+        """
+        Tier of each party
+
+        Raises
+        ------
+        ValueError if any party's average level is above 20
+        """
+        level = self.party_level()
+        if (level > MAX_LEVEL).any():
+            raise ValueError(f"Invalid party level: {level.max()}")
+        return np.searchsorted(TIER_MAX_LEVELS, level, side="left") + 1
+
+    def party(self, party_id):
+        """
+        Get one party as an ebuilder.Party
+
+        Parameters
+        ----------
+        party_id : int
+
+        Returns
+        -------
+        party : ebuilder.Party
+        """
+        party = Party()
+        for row in np.flatnonzero(self.party_ids == party_id):
+            party.add(PlayerCharacter(
+                self.names[row],
+                (self.primary_levels[row], self.aux_levels[row], self.junk_levels[row]),
+                {"ITEMS": int(self.item_totals[row])},
+                dict(zip(ADVANTAGE_FLAGS, self.advantages[row].tolist()))
+            ))
+        return party
+
+    def to_parties(self):
+        """Get all the parties as a list of ebuilder.Party"""
+        return [self.party(party_id) for party_id in range(self.party_ids.max() + 1)]
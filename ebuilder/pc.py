@@ -12,38 +12,126 @@ import os
 
 import json
 
+import numpy as np
 import pandas as pd
 
+from .frozen import freeze_array, freeze_mapping
+from .instrument import timer
+from .shared import attach_array
+
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
-PRI_LEVEL_POINTS = pd.read_csv(os.path.join(
+PRI_LEVEL_POINTS = freeze_mapping(pd.read_csv(os.path.join(
     DATA_DIR,
     "pc_primary_level_points.csv"
-)).set_index("level").to_dict()["level_points"]
+)).set_index("level").to_dict()["level_points"])
 
-AUX_LEVEL_POINTS = pd.read_csv(os.path.join(
+AUX_LEVEL_POINTS = freeze_mapping(pd.read_csv(os.path.join(
     DATA_DIR,
     "pc_aux_level_points.csv"
-)).set_index("level").to_dict()["level_points"]
+)).set_index("level").to_dict()["level_points"])
 
-ITEM_BONUSES = pd.read_csv(os.path.join(
+ITEM_BONUSES = freeze_mapping(pd.read_csv(os.path.join(
     DATA_DIR,
     "item_bonuses.csv"
-)).set_index("items").to_dict()["level_points"]
+)).set_index("items").to_dict()["level_points"])
 
-POWER = pd.read_csv(os.path.join(
+POWER = freeze_mapping(pd.read_csv(os.path.join(
     DATA_DIR,
     "pc_power.csv"
-)).set_index("level_points").to_dict()["power"]
+)).set_index("level_points").to_dict()["power"])
 
 
 with open(os.path.join(DATA_DIR, "class_categories.json"), "r") as CATEGORIES:
-    CLASS_CATEGORIES = json.load(CATEGORIES)
+    CLASS_CATEGORIES = freeze_mapping(json.load(CATEGORIES))
 """
 Load in relevant data.
 """
 
+MAX_LEVEL = 20
+
+ADVANTAGE_FLAGS = ["PC_ADVANTAGE", "MONSTER_ADVANTAGE", "MONSTER_DISADVANTAGE"]
+
+
+def _table_array(table, size):
+    """Convert a lookup table to an array indexed by key with -1 for missing keys"""
+    array = np.full(size, -1, dtype=int)
+    for key, value in table.items():
+        if 0 <= key < size:
+            array[key] = value
+    return array
+
+
+def advantage_index(pc_advantage, monster_advantage, monster_disadvantage):
+    """
+    Index of a combination of advantage flags in the power cube
+
+    Parameters
+    ----------
+    pc_advantage : bool or array_like
+    monster_advantage : bool or array_like
+    monster_disadvantage : bool or array_like
+
+    Returns
+    -------
+    index : int or numpy.ndarray
+    """
+    return (
+        4 * np.asarray(pc_advantage, dtype=int)
+        + 2 * np.asarray(monster_advantage, dtype=int)
+        + np.asarray(monster_disadvantage, dtype=int)
+    )
+
+
+def build_power_cube():
+    """
+    Precompute the power of every possible player character
+
+    Returns
+    -------
+    cube : numpy.ndarray
+        Power indexed by [primary levels, aux levels, junk levels, item total,
+        advantage index] (see advantage_index). Combinations that are not in the
+        level point tables are -1.
+    """
+    size = MAX_LEVEL + 1
+    primary = _table_array(PRI_LEVEL_POINTS, size)
+    aux = _table_array(AUX_LEVEL_POINTS, size)
+    junk = np.arange(size)
+    items = _table_array(ITEM_BONUSES, max(ITEM_BONUSES) + 1)
+
+    flags = np.array([[(index >> bit) & 1 for bit in (2, 1, 0)] for index in range(8)])
+    other = 2 * (flags[:, 0] & ~flags[:, 1] & 1) + 3 * flags[:, 2]
+
+    level_points = (
+        primary[:, None, None, None, None]
+        + aux[None, :, None, None, None]
+        + junk[None, None, :, None, None]
+        + items[None, None, None, :, None]
+        + other[None, None, None, None, :]
+    )
+    valid = (
+        (primary >= 0)[:, None, None, None, None]
+        & (aux >= 0)[None, :, None, None, None]
+        & (items >= 0)[None, None, None, :, None]
+    )
+
+    power = _table_array(POWER, max(POWER) + 1)
+    valid = valid & (level_points < len(power))
+    cube = np.where(valid, power[np.clip(level_points, 0, len(power) - 1)], -1)
+    return cube.astype(np.int16)
+
+
+with timer("load.power_cube"):
+    # Power cube exported by a parent process (see ebuilder.shared)
+    POWER_CUBE = attach_array("power_cube")
+    if POWER_CUBE is None:
+        POWER_CUBE = freeze_array(build_power_cube())
+"""
+Power of every player character, see build_power_cube
+"""
+
 
 class PlayerCharacter():
     """
@@ -63,8 +151,9 @@ class PlayerCharacter():
         Parameters
         ----------
         name : str
-        levels : dict
-            Class names and number of levels in each class
+        levels : dict or tuple
+            Class names and number of levels in each class, or the number of primary,
+            auxiliary, and junk levels
         items : dict
             Dictionary of items and their corresponding numerical bonuses
         advantages : dict
@@ -75,9 +164,11 @@ class PlayerCharacter():
             the players
         """
         self.name = name
-        self.primary_levels, self.aux_levels, self.junk_levels = self.extract_levels(
-            levels
-        )
+        if isinstance(levels, dict):
+            levels = self.extract_levels(levels)
+        self.primary_levels, self.aux_levels, self.junk_levels = [
+            int(num_levels) for num_levels in levels
+        ]
         self.level = self.primary_levels + self.aux_levels + self.junk_levels
         self.items = items
         self.advantages = advantages
@@ -247,6 +338,87 @@ class PlayerCharacter():
         """
         return POWER[self.total_level_points()]
 
+    @staticmethod
+    def batch_power(
+        primary_levels,
+        aux_levels,
+        junk_levels,
+        item_totals,
+        pc_advantage=False,
+        monster_advantage=False,
+        monster_disadvantage=False
+    ):
+        """
+        Compute the power of many player characters at once
+
+        Parameters
+        ----------
+        primary_levels : array_like
+            Number of primary levels of each character
+        aux_levels : array_like
+            Number of auxiliary levels of each character
+        junk_levels : array_like
+            Number of junk levels of each character
+        item_totals : array_like
+            Total item bonuses of each character
+        pc_advantage : bool or array_like, optional
+            PC_ADVANTAGE flags. Defaults to False
+        monster_advantage : bool or array_like, optional
+            MONSTER_ADVANTAGE flags. Defaults to False
+        monster_disadvantage : bool or array_like, optional
+            MONSTER_DISADVANTAGE flags. Defaults to False
+
+        Returns
+        -------
+        power : numpy.ndarray
+            Power of each player character
+
+        Raises
+        ------
+        ValueError if any character is outside of the level point tables
+        """
+        index = np.broadcast_arrays(
+            np.asarray(primary_levels, dtype=int),
+            np.asarray(aux_levels, dtype=int),
+            np.asarray(junk_levels, dtype=int),
+            np.asarray(item_totals, dtype=int),
+            advantage_index(pc_advantage, monster_advantage, monster_disadvantage),
+        )
+        in_range = np.ones(index[0].shape, dtype=bool)
+        for axis, values in enumerate(index):
+            in_range &= (values >= 0) & (values < POWER_CUBE.shape[axis])
+
+        power = np.full(index[0].shape, -1, dtype=POWER_CUBE.dtype)
+        power[in_range] = POWER_CUBE[tuple(values[in_range] for values in index)]
+        if (power < 0).any():
+            raise ValueError(
+                f"Player characters outside of the level point tables: "
+                f"{np.flatnonzero(power < 0).tolist()}"
+            )
+        return power
+
+    @staticmethod
+    def powers(pcs):
+        """
+        Compute the power of a list of player characters at once
+
+        Parameters
+        ----------
+        pcs : list of ebuilder.PlayerCharacter
+
+        Returns
+        -------
+        power : numpy.ndarray
+            Power of each player character
+        """
+        return PlayerCharacter.batch_power(
+            [pc.primary_levels for pc in pcs],
+            [pc.aux_levels for pc in pcs],
+            [pc.junk_levels for pc in pcs],
+            [sum(pc.items.values()) for pc in pcs],
+            *[[pc.advantages.get(flag, False) for pc in pcs] for flag in ADVANTAGE_FLAGS]
+        )
+
     def __str__(self):
         return (
             f"{self.name}, "
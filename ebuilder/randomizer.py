@@ -10,18 +10,59 @@ Tools for randomizing loot
 
 import os
 
+import json
+
+import shutil
+
+import hashlib
+
+import threading
+
 import pandas as pd
 
 import numpy as np
 
 import xmltodict
 
+from .dice import damage_index
+from .frozen import freeze_frame, freeze_mapping
+from .instrument import count, timed, timer
+from .library import Library, normalize_book
+from .search import SEARCH_COLUMNS, SEARCH_VERSION, SearchIndex
+from .shared import attach_frame
+from .textstore import SOURCE_PATTERN, TextStore, encode_text, paragraphs, parse_text
+
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
-COMPENDIUM_FILES = [
-    os.path.join(DATA_DIR, f) for f in os.listdir(DATA_DIR) if f.endswith(".xml")
-]
+SHARD_DIR = os.path.join(DATA_DIR, "shards")
+"""
+Directory of the per-file compendium shards (see Randomizer.update_shards)
+"""
+
+SHARD_MANIFEST = "manifest.json"
+
+SHARD_VERSION = 2
+"""
+Version of the shard contents (shards of another version are rebuilt)
+"""
+
+SHARD_COLUMNS = {"item": ["magic", "detail"], "monster": ["description", "trait"]}
+"""
+Columns each shard of a category needs to find the item rarities and monster sources
+"""
+
+
+def compendium_files(data_dir=None):
+    """Compendium XML files in a data directory (DATA_DIR by default)"""
+    if data_dir is None:
+        data_dir = DATA_DIR
+    return sorted(
+        os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith(".xml")
+    )
+
+
+COMPENDIUM_FILES = compendium_files()
 
 TYPE_MAP = {
     "$": "monetary",
@@ -51,8 +92,8 @@ SOURCEBOOKS_OWNED = [
     "Explorer's Guide to Wildemount",
     "Fizban's Treasury of Dragons",
     "Ghosts of Saltmarsh",
-    "Lost Mines of Phandelver" "Monster Manual",
-    "Monster Manual,",
+    "Lost Mines of Phandelver",
+    "Monster Manual",
     "Monster Manual 2024",
     "Mordenkainen Presents: Monsters of the Multiverse",
     "Phandelver and Below: The Shattered Obelisk",
@@ -62,31 +103,639 @@ SOURCEBOOKS_OWNED = [
     "The Book of Many Things",
     "The Wild Beyond the Witchlight",
     "Xanathar's Guide to Everything",
-    "Xanathar's Guide to Everything,",
 ]
 
+SOURCE_PRECEDENCE = [
+    "Monster Manual 2024",
+    "Player's Handbook 2024",
+    "Dungeon Master's Guide 2024",
+    "Monster Manual",
+    "Player's Handbook",
+    "Dungeon Master's Guide",
+    "Mordenkainen Presents: Monsters of the Multiverse",
+    "Xanathar's Guide to Everything",
+    "Tasha's Cauldron of Everything",
+]
+"""
+Books whose entry is canonical when entries of several books share a name (earlier
+books first, then the other books in the order of the compendium files)
+"""
+
+DEFAULT_LIBRARY = Library(SOURCEBOOKS_OWNED)
+"""
+Library of the owned column and of queries that do not provide one
+"""
+
+CR_ORDER = ["0", "1/8", "1/4", "1/2"] + [str(cr) for cr in range(1, 31)]
+"""
+Challenge ratings from lowest to highest
+"""
+
+COMPENDIUM_SCHEMA = {
+    "book": "category",
+    "classes": "category",
+    "detail": "category",
+    "rarity": "category",
+    "resist": "category",
+    "school": "category",
+    "size": "category",
+    "type": "category",
+    "owned": "bool",
+    "canonical": "bool",
+    "cr": "cr",
+    "level": "integer",
+    "magic": "integer",
+    "save_dc": "integer",
+    "to_hit": "integer",
+}
+"""
+Compact dtype of each compendium column by name. "cr" is an ordered categorical of
+CR_ORDER and "integer" is the smallest nullable integer that fits the values. Other
+numeric columns are nullable integers when possible and other text columns are strings
+(Arrow-backed when pyarrow is installed).
+"""
+
+
+TEXT_COLUMNS = ["action", "description", "legendary", "reaction", "spells", "text", "trait"]
+"""
+Long text columns of the compendiums, which can be left out of a loaded compendium and
+read for selected rows from an offset-indexed store instead (see
+ebuilder.textstore.TextStore)
+"""
+
+DAMAGE_COLUMNS = ["dpr_mean", "dpr_var", "to_hit", "save_dc"]
+"""
+Columns of the monster damage index (see ebuilder.dice.damage_index)
+"""
+
+
+def _smallest_integer(values):
+    """Convert to the smallest nullable integer dtype that fits the values"""
+    values = values.astype(pd.Int64Dtype())
+    low, high = values.min(), values.max()
+    for dtype in [pd.Int8Dtype(), pd.Int16Dtype(), pd.Int32Dtype()]:
+        info = np.iinfo(dtype.numpy_dtype)
+        if pd.isna(low) or (info.min <= low and high <= info.max):
+            return values.astype(dtype)
+    return values
+
+
+def _cr_categorical(values):
+    """Convert challenge ratings to an ordered categorical"""
+    values = values.astype("str").str.strip()
+    # Keep unexpected values after the known challenge ratings
+    unknown = sorted(set(values.dropna()) - set(CR_ORDER))
+    return values.astype(pd.CategoricalDtype(CR_ORDER + unknown, ordered=True))
+
+
+def compact_compendium(df):
+    """
+    Convert a compendium to the compact dtypes of COMPENDIUM_SCHEMA
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Compendium as created by Randomizer.create_csv or read from its CSV
+
+    Returns
+    -------
+    compact : pandas.DataFrame
+    """
+    columns = {}
+    for column in df:
+        values = df[column]
+        kind = COMPENDIUM_SCHEMA.get(column)
+        if kind == "category":
+            values = values.astype("category")
+        elif kind == "bool":
+            if values.dtype != bool:
+                values = values.astype("str").isin(["True", "1"])
+        elif kind == "cr":
+            values = _cr_categorical(values)
+        elif kind == "integer" or (
+            pd.api.types.is_numeric_dtype(values.dtype)
+            and not pd.api.types.is_bool_dtype(values.dtype)
+        ):
+            try:
+                values = _smallest_integer(values)
+            except (TypeError, ValueError):
+                # Columns with text (or fractions) are kept as they are. Arrow parse
+                # errors are ValueErrors
+                pass
+        elif kind is None:
+            values = values.astype("str")
+        columns[column] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _isin(values, choices, value_type=None):
+    """
+    Mask of the values in choices
+
+    Categorical columns compare their categories instead of every row.
+
+    Parameters
+    ----------
+    values : pandas.Series
+    choices : list
+    value_type : type, optional
+        Type to convert the values to before comparing. Defaults to no conversion
+
+    Returns
+    -------
+    mask : numpy.ndarray
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories.to_series()
+        if value_type is not None:
+            categories = categories.astype(value_type)
+        # Missing values (code -1) look up the appended False
+        matches = np.append(categories.isin(choices).to_numpy(), False)
+        return matches[values.array.codes]
+    if value_type is not None:
+        values = values.astype(value_type)
+    return values.isin(choices).to_numpy()
+
+
+def _contains_any(values, substrings):
+    """Mask of the values that contain any of the substrings (ignoring case)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories.to_series()
+        matches = np.append(_contains_any(categories, substrings), False)
+        return matches[values.array.codes]
+    lowered = values.str.lower()
+    mask = np.zeros(len(values), dtype=bool)
+    for substring in substrings:
+        contains = lowered.str.contains(substring.lower(), regex=False)
+        mask |= contains.fillna(False).to_numpy(bool)
+    return mask
+
+
+def _category_frame(category, entries):
+    """
+    Build the compendium rows of a category from parsed XML entries
+
+    Parameters
+    ----------
+    category : str
+        Category of compendium
+    entries : list of dict
+        Entries of the category parsed from one or more compendium files
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        Compendium rows with their sources, books, and (for monsters) damage index
+    """
+    # Get all the common keys for this category (in order of appearance)
+    keys = list(dict.fromkeys(key for item in entries for key in item))
+    df = pd.DataFrame([{key: item.get(key, None) for key in keys} for item in entries])
+
+    # The entries of a single file may not have every column used below
+    for column in SHARD_COLUMNS.get(category, []):
+        if column not in df.columns:
+            df[column] = None
+
+    # Add any special categories
+    if category == "item":
+        df["rarity"] = None
+        magic = pd.notnull(df["magic"]) & pd.notnull(df["detail"])
+
+        df.loc[magic, "rarity"] = (
+            df.loc[magic, "detail"]
+            .str.split(" ")
+            .apply(
+                lambda x: "".join(filter(str.isalnum, next(iter(x), "").lower()))
+            )
+        )
+
+    # Add sources
+    has_source = True
+    if category in ["monster"]:
+        # Add monster sources
+        sources = []
+        for irow, row in df.iterrows():
+            if row["description"] is None or isinstance(row["description"], float):
+                row["description"] = ""
+            if "Source" in row["description"]:
+                # 2024 monster manual has the Source in description
+                sources.append(row["description"].split("\t")[-1])
+            else:
+                # The source is the last text of the first trait
+                trait = row["trait"]
+                entry = (trait if isinstance(trait, dict) else trait[0])["text"]
+                if isinstance(entry, list):
+                    sources.append(entry[-1])
+                else:
+                    sources.append(entry)
+        df["source"] = sources
+    elif "text" in df.columns:  # "text" in df.columns:
+        # All other sources are in a similar spot
+        sources = []
+        for irow, row in df.iterrows():
+            if row["text"] is None:
+                sources.append(None)
+            elif isinstance(row["text"], float):
+                sources.append(None)
+            else:
+                sources.append(row["text"][-1])
+        df["source"] = sources
+    else:
+        has_source = False
+
+    # Remove page number
+    df["book"] = "None"
+    if has_source:
+        books = []
+        for _source in df["source"]:
+            if _source is not None and not isinstance(_source, float):
+                books.append(_source.split(" p.")[0])
+            else:
+                books.append("None")
+        df["book"] = books
+    df["book"] = df["book"].str.replace("Source: ", "")
+    df["book"] = df["book"].str.replace("Source:\t", "")
+    # Owned in the default library (queries can provide their own, see _filter)
+    df["owned"] = df["book"].apply(lambda x: x in DEFAULT_LIBRARY).astype(str)
+
+    # Index the damage per round so it does not need to be parsed from text again
+    if category == "monster":
+        df = df.join(damage_index(df))
+
+    # Store the paragraphs and blocks of the text as JSON (see ebuilder.textstore)
+    for column in TEXT_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].map(encode_text).astype(object)
+
+    return df
+
+
+def records(df):
+    """
+    Convert compendium rows to dictionaries
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Compendium rows
+
+    Yields
+    ------
+    record : dict
+        Values of a row by column, with the long text columns parsed into paragraphs
+        and blocks (see ebuilder.textstore.parse_text) and None for missing values
+    """
+    columns = list(df.columns)
+    text = [column in TEXT_COLUMNS for column in columns]
+    for values in df.astype(object).itertuples(index=False, name=None):
+        yield {
+            column: (
+                parse_text(value) if is_text
+                else None if pd.isna(value)
+                else value.item() if isinstance(value, np.generic)
+                else value
+            )
+            for column, value, is_text in zip(columns, values, text)
+        }
+
+
+SOURCE_COLUMNS = ["source", "book", "owned", "entity_id", "canonical"]
+"""
+Columns that are not part of the content of an entity (see deduplicate)
+"""
+
+def _normalize_content(value):
+    """Content of an entry without its source, case, or spacing"""
+    if isinstance(value, float) and np.isnan(value):
+        return ""
+    parts = [SOURCE_PATTERN.sub("", str(value))]
+    if isinstance(value, str) and value.startswith(("[", "{")):
+        parts = paragraphs(value, sources=False)
+    parts = [" ".join(part.lower().split()) for part in parts]
+    # Source-only paragraphs (e.g. "Source: Monster Manual p. 12") are dropped
+    parts = [part.rstrip(".") for part in parts if part.rstrip(".")]
+    return "\n".join(parts)
+
+
+def entity_ids(df):
+    """
+    Hash the content of compendium entries
+
+    Entries with the same content in different books (e.g. reprints) get the same id:
+    the source columns, the citations in the text, case, and spacing are ignored.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Compendium
+
+    Returns
+    -------
+    ids : pandas.Series
+        16 hexadecimal digits per entry
+    """
+    columns = sorted(column for column in df.columns if column not in SOURCE_COLUMNS)
+    return pd.Series(
+        [
+            hashlib.blake2b(
+                json.dumps([_normalize_content(value) for value in values]).encode("utf-8"),
+                digest_size=8,
+            ).hexdigest()
+            for values in df[columns].itertuples(index=False, name=None)
+        ],
+        index=df.index,
+        dtype=object,
+    )
+
+
+def _alias(names, books):
+    """Lowercase "name (book)" aliases"""
+    return (
+        names.astype(str).str.lower() + " ("
+        + books.fillna("None").astype(str).map(normalize_book).str.lower() + ")"
+    )
+
+
+def deduplicate(df, precedence=None):
+    """
+    Merge the entries of a compendium with the same content
+
+    Entries are hashed with entity_ids. Of the entries with the same id, the one from
+    the book earliest in the precedence is kept and the others become aliases. Of the
+    kept entries with the same name, the one from the book earliest in the precedence
+    is canonical: looking up the name finds it (see Randomizer.entities).
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Compendium
+    precedence : list of str, optional
+        Books in order of preference. Defaults to SOURCE_PRECEDENCE
+
+    Returns
+    -------
+    deduplicated : pandas.DataFrame
+        Kept entries (in their original order) with "entity_id" and "canonical"
+        columns
+    aliases : pandas.DataFrame
+        "alias" ("name (book)" of each merged entry, lowercase) and "entity_id" of the
+        entry it was merged into
+    """
+    if precedence is None:
+        precedence = SOURCE_PRECEDENCE
+    ranks = {normalize_book(book): rank for rank, book in enumerate(precedence)}
+
+    df = df.assign(entity_id=entity_ids(df))
+    books = df["book"] if "book" in df.columns else pd.Series("None", index=df.index)
+    rank = books.map(
+        lambda book: ranks.get(normalize_book(book), len(ranks))
+        if isinstance(book, str) else len(ranks)
+    )
+    ordered = df.loc[rank.sort_values(kind="stable").index]
+
+    merged = ordered["entity_id"].duplicated()
+    aliases = pd.DataFrame({
+        "alias": _alias(ordered.loc[merged, "name"], books.loc[ordered.index[merged]]),
+        "entity_id": ordered.loc[merged, "entity_id"],
+    }).drop_duplicates("alias").reset_index(drop=True)
+
+    kept = ordered.loc[~merged]
+    kept = kept.assign(canonical=~kept["name"].astype(str).str.lower().duplicated())
+    count("compendium.duplicates", int(merged.sum()))
+    return kept.sort_index().reset_index(drop=True), aliases
+
 
 class Randomizer:
-    """Class for randomizing the compendium."""
+    """
+    Class for randomizing the compendium.
+
+    A randomizer can be shared between threads: each XML file is parsed into its shard
+    once, each compendium CSV is read once, and the loaded compendiums are frozen (see
+    ebuilder.frozen.freeze_frame).
 
-    def __init__(self):
+    Compendiums can be loaded with only some of their columns. random_item loads the
+    short columns to filter on and reads the long text of the selected rows only.
+
+    Keyword queries of the text use a full-text index built with each compendium CSV
+    (see ebuilder.search.SearchIndex) and combine with the column filters.
+    """
+
+    def __init__(self, precedence=None, data_dir=None):
         """
         Constructor for randomizer
+
+        Parameters
+        ----------
+        precedence : list of str, optional
+            Books in order of preference for the entries that several books share (see
+            deduplicate). Defaults to SOURCE_PRECEDENCE
+        data_dir : str, optional
+            Directory of the compendium XML files and of the CSVs, shards, and indexes
+            built from them. Defaults to DATA_DIR
         """
-        # Initialize an empty compendium (only loaded if needed)
-        self.compendium = None
+        self.precedence = SOURCE_PRECEDENCE if precedence is None else list(precedence)
+        self.data_dir = DATA_DIR if data_dir is None else data_dir
+        self.shard_dir = (
+            SHARD_DIR if data_dir is None else os.path.join(self.data_dir, "shards")
+        )
 
-        # Initialize empty compendium dataframes
+        # Initialize empty compendium dataframes, keyed by category, projected columns,
+        # and whether the long text columns are included
         self.compendium_dfs = {}
 
+        # Columns, text stores, search indexes, and entity lookups of each category
+        # (only loaded if needed)
+        self.headers = {}
+        self.text_stores = {}
+        self.search_indexes = {}
+        self.entity_indexes = {}
+
+        self._init_locks()
+
+    def _init_locks(self):
+        """Locks for building the shards and loading the compendium once"""
+        self.xml_lock = threading.Lock()
+        self.csv_lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled (e.g. when sent to a worker process)
+        state = self.__dict__.copy()
+        del state["xml_lock"]
+        del state["csv_lock"]
+        # The memory-mapped text stores, search indexes, and entity lookups are
+        # reopened when needed
+        state["text_stores"] = {}
+        state["search_indexes"] = {}
+        state["entity_indexes"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_locks()
+
     def csv_filename(self, category):
         """Get the filename for a CSV for a given category."""
-        return os.path.join(DATA_DIR, f"compendium_{category}.csv")
+        return os.path.join(self.data_dir, f"compendium_{category}.csv")
 
+    def text_filename(self, category):
+        """Get the filename (without extension) of the text store for a given category."""
+        return os.path.join(self.data_dir, f"compendium_{category}_text")
+
+    def aliases_filename(self, category):
+        """Get the filename of the aliases of merged entries for a given category."""
+        return os.path.join(self.data_dir, f"compendium_{category}_aliases.csv")
+
+    def search_filename(self, category):
+        """Get the filename of the search index for a given category."""
+        return os.path.join(self.data_dir, f"compendium_{category}_search.sqlite")
+
+    def shard_directory(self, compendium_file):
+        """Get the shard directory for a compendium XML file."""
+        name = os.path.splitext(os.path.basename(compendium_file))[0]
+        return os.path.join(self.shard_dir, name)
+
+    def read_shard(self, compendium_file):
+        """
+        Read the manifest of the shard of a compendium XML file
+
+        Parameters
+        ----------
+        compendium_file : str
+
+        Returns
+        -------
+        manifest : dict or None
+            Hash, size, and modification time of the file the shard was built from and
+            the number of rows of each category, or None when there is no shard
+        """
+        filename = os.path.join(self.shard_directory(compendium_file), SHARD_MANIFEST)
+        if not os.path.isfile(filename):
+            return None
+        with open(filename, "r") as manifest_file:
+            return json.load(manifest_file)
+
+    def _write_manifest(self, compendium_file, manifest):
+        """Write the manifest of a shard (last, so a partial shard has none)"""
+        filename = os.path.join(self.shard_directory(compendium_file), SHARD_MANIFEST)
+        with open(filename + ".tmp", "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+        os.replace(filename + ".tmp", filename)
+
+    @staticmethod
+    def parse_file(data):
+        """
+        Parse the entries of a compendium XML file
+
+        Parameters
+        ----------
+        data : bytes
+            Contents of the file
+
+        Returns
+        -------
+        compendium : dict
+            Entries of the file by category
+        """
+        with timer("compendium.parse_xml"):
+            compendium = xmltodict.parse(data)["compendium"]
+        entries = {}
+        for key, value in compendium.items():
+            # A category with a single entry is not parsed as a list
+            if isinstance(value, dict):
+                value = [value]
+            # Attributes of the compendium (e.g. its version) are strings
+            if isinstance(value, list):
+                entries[key] = value
+        return entries
+
+    def build_shard(self, compendium_file, data):
+        """
+        Parse a compendium XML file and write one CSV per category to its shard
+
+        Parameters
+        ----------
+        compendium_file : str
+        data : bytes
+            Contents of the file
+
+        Returns
+        -------
+        manifest : dict
+            Number of rows of each category in the shard
+        """
+        directory = self.shard_directory(compendium_file)
+        # Invalidate the old shard before overwriting it
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+
+        categories = {}
+        for category, entries in self.parse_file(data).items():
+            df = _category_frame(category, entries)
+            df.to_csv(os.path.join(directory, f"{category}.csv"), index=False)
+            categories[category] = len(df)
+        return {
+            "source": os.path.basename(compendium_file),
+            "version": SHARD_VERSION,
+            "categories": categories,
+        }
+
+    @timed("compendium.update_shards")
+    def update_shards(self):
+        """
+        Rebuild the shards of the compendium XML files that changed
+
+        Every compendium file has a shard with one CSV per category and a manifest with
+        the SHA-256 hash of the file. A file is parsed again (once for all categories)
+        only when its hash changed, and is not even hashed when its size and
+        modification time did not change. Shards of removed files are deleted.
+
+        Returns
+        -------
+        rebuilt : list of str
+            Compendium files that were parsed
+        """
+        files = compendium_files(self.data_dir)
+        rebuilt = []
+        with self.xml_lock:
+            for compendium_file in files:
+                status = os.stat(compendium_file)
+                stamp = {"size": status.st_size, "mtime_ns": status.st_mtime_ns}
+                manifest = self.read_shard(compendium_file)
+                if (manifest is not None) and (manifest.get("version") != SHARD_VERSION):
+                    manifest = None
+                if manifest is not None and all(
+                    manifest.get(key) == value for key, value in stamp.items()
+                ):
+                    continue
+
+                with open(compendium_file, "rb") as fd:
+                    data = fd.read()
+                digest = hashlib.sha256(data).hexdigest()
+                if manifest is None or manifest["sha256"] != digest:
+                    manifest = self.build_shard(compendium_file, data)
+                    rebuilt.append(compendium_file)
+                manifest.update(stamp, sha256=digest)
+                self._write_manifest(compendium_file, manifest)
+
+            # Remove the shards of compendium files that no longer exist
+            names = {os.path.basename(self.shard_directory(f)) for f in files}
+            if os.path.isdir(self.shard_dir):
+                for name in set(os.listdir(self.shard_dir)) - names:
+                    shutil.rmtree(os.path.join(self.shard_dir, name))
+        count("compendium.shards_rebuilt", len(rebuilt))
+        return rebuilt
+
+    @timed("compendium.create_csv")
     def create_csv(self, category):
         """
         Create a CSV file for a given category
 
+        The CSV is assembled from the shards of the compendium XML files, which are
+        rebuilt first for the files that changed (see update_shards). Entries with the
+        same content in several books are merged (see deduplicate), and the aliases of
+        the merged entries are written next to the CSV.
+
         Parameters
         ----------
         category : str
@@ -97,101 +746,94 @@ class Randomizer:
         df : pandas.DataFrame
             Data frame with the compendium loaded
         """
+        self.update_shards()
+        files = compendium_files(self.data_dir)
+        manifests = [self.read_shard(compendium_file) for compendium_file in files]
+        if any(manifest is None for manifest in manifests):
+            # A file was added (or a shard removed) since the shards were updated
+            self.update_shards()
+            manifests = [self.read_shard(compendium_file) for compendium_file in files]
+        missing = [f for f, manifest in zip(files, manifests) if manifest is None]
+        if missing:
+            raise RuntimeError(f"Compendium files without a complete shard: {missing}")
 
-        if self.compendium is None:
-            self.compendium = {}
-            for compentium_file in COMPENDIUM_FILES:
-                with open(compentium_file, "rb") as fd:
-                    compendium = xmltodict.parse(fd.read())["compendium"]
-                    for key, value in compendium.items():
-                        if key in self.compendium:
-                            if isinstance(self.compendium[key], str):
-                                pass
-                            elif isinstance(self.compendium[key], list):
-                                self.compendium[key].extend(compendium[key])
-                            else:
-                                raise RuntimeError(
-                                    f"Unexpected compendium type: {type(self.compendium[key])}"
-                                )
-                        else:
-                            self.compendium[key] = compendium[key]
-
-        # Get all the common keys for this category
-        keys = list(
-            set().union(*[list(item.keys()) for item in self.compendium[category]])
-        )
-        entries = [
-            {key: item.get(key, None) for key in keys}
-            for item in self.compendium[category]
-        ]
-        df = pd.DataFrame(entries)
-
-        # Add any special categories
-        if category == "item":
-            df["rarity"] = None
-            magic = pd.notnull(df["magic"]) & pd.notnull(df["detail"])
-
-            df.loc[magic, "rarity"] = (
-                df.loc[magic, "detail"]
-                .str.split(" ")
-                .apply(
-                    lambda x: "".join(filter(str.isalnum, next(iter(x), "").lower()))
-                )
+        frames = []
+        for compendium_file, manifest in zip(files, manifests):
+            if category not in manifest["categories"]:
+                continue
+            filename = os.path.join(
+                self.shard_directory(compendium_file), f"{category}.csv"
             )
+            # Read as text so the entries are written back unchanged
+            frames.append(
+                pd.read_csv(filename, dtype=str, keep_default_na=False, na_values=[""])
+            )
+        if not frames:
+            raise KeyError(f"No compendium entries for category {category}")
+        df, aliases = deduplicate(
+            pd.concat(frames, ignore_index=True), self.precedence
+        )
 
-        # Add sources
-        has_source = True
-        if category in ["monster"]:
-            # Add monster sources
-            sources = []
-            for irow, row in df.iterrows():
-                if row["description"] is None or isinstance(row["description"], float):
-                    row["description"] = ""
-                if "Source" in row["description"]:
-                    # 2024 monster manual has the Source in description
-                    sources.append(row["description"].split("\t")[-1])
-                elif isinstance(row["trait"], dict):
-                    sources.append(row["trait"]["text"])
-                else:
-                    entry = row["trait"][0]["text"]
-                    if isinstance(entry, list):
-                        sources.append(entry[-1])
-                    else:
-                        sources.append(entry)
-            df["source"] = sources
-        elif "text" in df.columns:  # "text" in df.columns:
-            # All other sources are in a similar spot
-            sources = []
-            for irow, row in df.iterrows():
-                if row["text"] is None:
-                    sources.append(None)
-                elif isinstance(row["text"], float):
-                    sources.append(None)
-                else:
-                    sources.append(row["text"][-1])
-            df["source"] = sources
-        else:
-            has_source = False
-
-        # Remove page number
-        df["book"] = "None"
-        if has_source:
-            books = []
-            for _source in df["source"]:
-                if _source is not None and not isinstance(_source, float):
-                    books.append(_source.split(" p.")[0])
-                else:
-                    books.append("None")
-            df["book"] = books
-        df["book"] = df["book"].str.replace("Source: ", "")
-        df["book"] = df["book"].str.replace("Source:\t", "")
-        df["owned"] = df["book"].apply(lambda x: x in SOURCEBOOKS_OWNED).astype(str)
-
-        df.to_csv(self.csv_filename(category), index=False)
+        with self.csv_lock:
+            df.to_csv(self.csv_filename(category), index=False)
+            aliases.to_csv(self.aliases_filename(category), index=False)
+            with timer("compendium.write_search"):
+                SearchIndex.write(self.search_filename(category), df)
+            # The loaded compendium is out of date
+            for key in list(self.compendium_dfs):
+                if key[0] == category:
+                    del self.compendium_dfs[key]
+            self.headers.pop(category, None)
+            self.text_stores.pop(category, None)
+            self.search_indexes.pop(category, None)
+            self.entity_indexes.pop(category, None)
 
         return df
 
-    def get_compendium(self, category):
+    def columns(self, category):
+        """
+        Get all the columns of a compendium without loading it
+
+        Parameters
+        ----------
+        category : str
+            Category of compendium
+
+        Returns
+        -------
+        columns : list of str
+        """
+        header = self.headers.get(category)
+        if header is not None:
+            return header
+
+        full = self.compendium_dfs.get((category, None, True))
+        if full is not None:
+            header = list(full.columns)
+        else:
+            header = list(pd.read_csv(self.csv_filename(category), nrows=0).columns)
+            # Compendiums built before the damage index existed get it when loaded
+            if category == "monster":
+                header += [column for column in DAMAGE_COLUMNS if column not in header]
+        self.headers[category] = header
+        return header
+
+    def _projection(self, category, columns, text):
+        """Columns to load for a projection"""
+        available = self.columns(category)
+        if columns is None:
+            columns = available
+        unknown = [column for column in columns if column not in available]
+        if unknown:
+            raise KeyError(
+                f"Requested columns {unknown} not in available columns: {available}"
+            )
+        if not text:
+            columns = [column for column in columns if column not in TEXT_COLUMNS]
+        return list(columns)
+
+    @timed("compendium.get")
+    def get_compendium(self, category, columns=None, text=True):
         """
         Get the proper compendium CSV
 
@@ -199,69 +841,302 @@ class Randomizer:
         ----------
         category : str
             Category of compendium
+        columns : list of str, optional
+            Columns to load. Only these columns are parsed from the CSV. Defaults to
+            every column
+        text : bool, optional
+            Flag to include the long text columns (see TEXT_COLUMNS). Their entries can
+            be read for selected rows with get_text instead. Defaults to True
 
         Returns
         -------
         compendium : pandas.DataFrame
-            Corresponding compendium
+            Corresponding compendium (frozen and shared by all callers; copy it before
+            modifying it)
         """
+        key = (category, None if columns is None else tuple(columns), text)
+        df = self.compendium_dfs.get(key)
+        if df is not None:
+            return df
 
-        if category not in self.compendium_dfs.keys():
-            df = pd.read_csv(self.csv_filename(category))
+        with self.csv_lock:
+            # Another thread may have loaded it while this one waited
+            if key in self.compendium_dfs:
+                return self.compendium_dfs[key]
 
-        # Convert numeric columns to be ints
-        for col in df:
-            if pd.api.types.is_numeric_dtype(df[col].dtype):
-                try:
-                    df[col] = df[col].astype(pd.Int64Dtype())
-                except TypeError:
-                    pass
+            # Compendium exported by a parent process (see ebuilder.shared)
+            full = self.compendium_dfs.get((category, None, True))
+            if (full is None) and (self.data_dir == DATA_DIR):
+                with timer("compendium.attach"):
+                    full = attach_frame(f"compendium_{category}")
+                if full is not None:
+                    self.compendium_dfs[(category, None, True)] = full
 
-        self.compendium_dfs["category"] = df
+            names = self._projection(category, columns, text)
+            if full is not None:
+                # Projections of a loaded compendium share its memory
+                df = freeze_frame(full[names])
+            else:
+                df = self._read_csv(category, names)
+            self.compendium_dfs[key] = df
         return df
 
-    def random_item(self, category, num=1, **kwargs):
+    def _read_csv(self, category, names):
+        """Read and compact the projected columns of a compendium CSV"""
+        damage = [column for column in DAMAGE_COLUMNS if column in names]
+        header = pd.read_csv(self.csv_filename(category), nrows=0).columns
+        usecols = [column for column in names if column in header]
+        # Compendiums built before the damage index existed
+        legacy = (category == "monster") and damage and ("dpr_mean" not in header)
+        if legacy and ("action" not in usecols):
+            usecols.append("action")
+
+        with timer("compendium.read_csv"):
+            df = pd.read_csv(self.csv_filename(category), usecols=usecols)
+        count("compendium.rows", len(df))
+
+        if legacy:
+            df = df.join(damage_index(df))
+
+        return freeze_frame(compact_compendium(df[names]))
+
+    def text_store(self, category):
         """
-        Get a random item
+        Get the offset-indexed store of the long text columns of a compendium
+
+        The store is written next to the CSV the first time it is needed and whenever
+        the CSV is newer.
 
         Parameters
         ----------
         category : str
             Category of compendium
-        rarities : list, optional
-            List of rarities to filter by
-        rarities : list, optional
-            List of types to filter by
-        num : int
-            Number of random items. Defaults to 1
 
         Returns
         -------
-        items : pandas.DataFrame
-            Random items
+        store : ebuilder.textstore.TextStore
+        """
+        store = self.text_stores.get(category)
+        if store is not None:
+            return store
+
+        with self.csv_lock:
+            if category in self.text_stores:
+                return self.text_stores[category]
+
+            filename = self.text_filename(category)
+            csv_filename = self.csv_filename(category)
+            if (
+                not os.path.isfile(filename + ".npz")
+                or os.path.getmtime(filename + ".npz") < os.path.getmtime(csv_filename)
+            ):
+                columns = [
+                    column for column in self.columns(category) if column in TEXT_COLUMNS
+                ]
+                with timer("compendium.write_text"):
+                    TextStore.write(
+                        filename, pd.read_csv(csv_filename, usecols=columns)[columns]
+                    )
+
+            store = TextStore(filename)
+            self.text_stores[category] = store
+        return store
+
+    def search_index(self, category):
+        """
+        Get the full-text search index of a compendium
+
+        The index is written with the CSV, and again whenever the CSV is newer (e.g.
+        when the CSV was copied in) or the index is of another SEARCH_VERSION.
+
+        Parameters
+        ----------
+        category : str
+            Category of compendium
+
+        Returns
+        -------
+        index : ebuilder.search.SearchIndex
         """
-        df = self.get_compendium(category)
+        index = self.search_indexes.get(category)
+        if index is not None:
+            return index
+
+        with self.csv_lock:
+            if category in self.search_indexes:
+                return self.search_indexes[category]
+
+            filename = self.search_filename(category)
+            csv_filename = self.csv_filename(category)
+            if (
+                not os.path.isfile(filename)
+                or os.path.getmtime(filename) < os.path.getmtime(csv_filename)
+                or SearchIndex.version(filename) != SEARCH_VERSION
+            ):
+                columns = [
+                    column for column in self.columns(category) if column in SEARCH_COLUMNS
+                ]
+                with timer("compendium.write_search"):
+                    SearchIndex.write(
+                        filename, pd.read_csv(csv_filename, usecols=columns, dtype=str)
+                    )
+
+            index = SearchIndex(filename)
+            self.search_indexes[category] = index
+        return index
+
+    def entities(self, category):
+        """
+        Get the unique lookup keys and the aliases of a compendium's entries
+
+        The key of a canonical entry (see deduplicate) is its lowercase name, and the
+        key of another entry with the same name is "name (book)". The aliases are the
+        "name (book)" of every entry and of the entries merged into it. Compendiums
+        built before the entries were merged take the first entry of each name as
+        canonical.
+
+        Parameters
+        ----------
+        category : str
+            Category of compendium
+
+        Returns
+        -------
+        keys : pandas.Index
+            Unique key of each row
+        aliases : types.MappingProxyType
+            Key of each alias that is not a key itself
+        """
+        entities = self.entity_indexes.get(category)
+        if entities is not None:
+            return entities
+
+        df = self.get_compendium(category, columns=[
+            column for column in ["name", "book", "entity_id", "canonical"]
+            if column in self.columns(category)
+        ])
+        with self.csv_lock:
+            if category in self.entity_indexes:
+                return self.entity_indexes[category]
+            merged = None
+            if os.path.isfile(self.aliases_filename(category)):
+                merged = pd.read_csv(self.aliases_filename(category), dtype=str)
+            entities = self._entities(df, merged)
+            self.entity_indexes[category] = entities
+        return entities
+
+    @staticmethod
+    def _entities(df, merged=None):
+        """Build the lookup keys and aliases of a compendium (and its merged entries)"""
+        names = df["name"].astype(str).str.lower()
+        books = df["book"] if "book" in df.columns else pd.Series("None", index=df.index)
+        canonical = (
+            df["canonical"].to_numpy(bool) if "canonical" in df.columns
+            else ~names.duplicated().to_numpy()
+        )
+        own_aliases = _alias(df["name"], books.astype(object))
+        keys = names.where(canonical, own_aliases)
+        # Entries with the same name in the same book are told apart by their row
+        repeated = keys.duplicated(keep="first")
+        keys[repeated] = keys[repeated] + " #" + keys.index[repeated].astype(str)
+        keys = pd.Index(keys.to_numpy(), dtype=object)
+
+        aliases = {
+            alias: row_key for alias, row_key in zip(own_aliases, keys) if alias != row_key
+        }
+        if (merged is not None) and ("entity_id" in df.columns):
+            key_by_id = dict(zip(df["entity_id"].astype(str), keys))
+            for alias, entity_id in zip(merged["alias"], merged["entity_id"]):
+                if entity_id in key_by_id:
+                    aliases.setdefault(alias, key_by_id[entity_id])
+        for row_key in keys:
+            aliases.pop(row_key, None)
+        return keys, freeze_mapping(aliases)
+
+    def get_text(self, category, rows, columns=None):
+        """
+        Read the long text columns of selected rows of a compendium
+
+        Parameters
+        ----------
+        category : str
+            Category of compendium
+        rows : array_like of int
+            Row numbers in the compendium
+        columns : list of str, optional
+            Columns to read. Defaults to every long text column of the compendium
+
+        Returns
+        -------
+        text : pandas.DataFrame
+            One row per entry of rows
+        """
+        if columns is None:
+            columns = [column for column in self.columns(category) if column in TEXT_COLUMNS]
+
+        # Use the text of a loaded compendium
+        full = self.compendium_dfs.get((category, None, True))
+        if full is not None:
+            return full[columns].iloc[rows].reset_index(drop=True)
+
+        with timer("compendium.read_text"):
+            return self.text_store(category).frame(rows, columns)
+
+    def _filter(self, category, kwargs, library=None):
+        """
+        Load the columns to filter a compendium on and combine the filters
+
+        A library keeps only the rows of its books. The owned filter is evaluated
+        against the library of the query (DEFAULT_LIBRARY without one), so the owned
+        column of the compendium is not used.
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            Compendium without the long text columns that are not filtered on
+        keep : numpy.ndarray
+            Mask of the rows that pass every filter
+        """
+        kwargs = dict(kwargs)
+
+        # Only load the long text columns that are filtered on
+        all_columns = self.columns(category)
+        df = self.get_compendium(
+            category,
+            columns=[
+                column for column in all_columns
+                if (column not in TEXT_COLUMNS) or (kwargs.get(column) is not None)
+            ],
+        )
+
+        # Combine the filters into one mask and select the items once
+        keep = np.ones(len(df), dtype=bool)
 
         # Filter special cases
-        filtered = df
         if (category == "item") and (kwargs.get("type", None) is not None):
             # The types of items are non-intuitive abbreviations
             # Map them to something more sensible for humans to remember
             types = kwargs.pop("type")
             types_r = [TYPE_MAP_REVERSED[type] for type in types]
-            filtered = filtered[filtered["type"].isin(types_r)].reset_index(drop=True)
+            keep &= _isin(df["type"], types_r)
+
+        # Owned books depend on the library of the query. The library always restricts
+        # the rows, and the owned filter is an extra filter on top of it
+        owned = None
+        if library is not None:
+            owned = Library.from_books(library).owned(df["book"])
+            keep &= owned
+        wanted = kwargs.pop("owned", None)
+        if wanted is not None:
+            if owned is None:
+                owned = Library.from_books(DEFAULT_LIBRARY).owned(df["book"])
+            keep &= np.isin(owned, [str(value) == "True" for value in wanted])
 
         if (category == "spell") and (kwargs.get("classes", None) is not None):
             # Classes appear as a string of class names separated by columns
             # Just check if any of the class names are a subset of the string
             classes = kwargs.pop("classes")
-            has_any = []
-            for _class in classes:
-                lowered = filtered["classes"].str.lower()
-                has_class = lowered.str.contains(classes[0].lower())
-                has_any.append(has_class.to_numpy())
-            has_any = np.array(has_any).sum(axis=0).astype(bool)
-            filtered = filtered[has_any].reset_index(drop=True)
+            keep &= _contains_any(df["classes"], classes)
 
         # Filter non-special cases
         for key, values in kwargs.items():
@@ -270,21 +1145,202 @@ class Randomizer:
                 continue
 
             # Let the user know if they provided a bad key
-            if key not in filtered.columns:
+            if key not in df.columns:
                 raise KeyError(
                     f"Requested filter {key} not in available columns: "
-                    f"{list(filtered.columns)}"
+                    f"{all_columns}"
                 )
 
             # Match data types
-            filtered = filtered[
-                filtered[key].astype(type(values[0])).isin(values)
-            ].reset_index(drop=True)
+            keep &= _isin(df[key], values, type(values[0]))
+
+        return df, keep
+
+    def items(self, category, df, rows, library=None):
+        """
+        Get rows of a loaded compendium with all of their columns
+
+        Parameters
+        ----------
+        category : str
+            Category of compendium
+        df : pandas.DataFrame
+            Compendium loaded for the filters (see candidates)
+        rows : array_like of int
+            Row numbers
+        library : ebuilder.library.Library or list of str, optional
+            Library of the owned column, as for random_item
+
+        Returns
+        -------
+        items : pandas.DataFrame
+        """
+        items = df.iloc[rows].reset_index(drop=True)
+        if "owned" in items.columns:
+            items["owned"] = Library.from_books(
+                DEFAULT_LIBRARY if library is None else library
+            ).owned(items["book"])
+
+        # Read the text of the selected items only
+        all_columns = self.columns(category)
+        missing = [column for column in all_columns if column not in items.columns]
+        if missing:
+            items = pd.concat(
+                [items, self.get_text(category, rows, missing)], axis=1
+            )[all_columns]
+        return items
+
+    @timed("randomizer.search")
+    def search(self, category, query, num=None, library=None, **kwargs):
+        """
+        Find the items matching a keyword query, best match first
+
+        Parameters
+        ----------
+        category : str
+            Category of compendium
+        query : str
+            Query of the name and text (see ebuilder.search.SearchIndex.search), e.g.
+            "fire damage" or '"pack tactics"'
+        num : int, optional
+            Maximum number of items. Defaults to every match
+        library : ebuilder.library.Library or list of str, optional
+            Only find items from these books, as for random_item
+        **kwargs
+            Column filters, as for random_item
+
+        Returns
+        -------
+        items : pandas.DataFrame
+            Matching items with their relevance in a "score" column
+        """
+        df, rows, scores = self._search(category, query, num, library, kwargs)
+        items = self.items(category, df, rows, library)
+        items["score"] = scores
+        return items
+
+    def search_rows(self, category, query, num=None, library=None, **kwargs):
+        """
+        Find the rows of the items matching a keyword query, best match first
+
+        Parameters
+        ----------
+        category, query, num, library, **kwargs
+            As for search
+
+        Returns
+        -------
+        rows : numpy.ndarray
+            Row numbers of the matches in the compendium
+        scores : numpy.ndarray
+            Relevance of each match (higher is better)
+        """
+        _, rows, scores = self._search(category, query, num, library, kwargs)
+        return rows, scores
+
+    def _search(self, category, query, num, library, kwargs):
+        """Filter a compendium and find the rows matching a keyword query"""
+        df, keep = self._filter(category, kwargs, library)
+        rows, scores = self.search_index(category).search(query)
+        matched = keep[rows]
+        return df, rows[matched][:num], scores[matched][:num]
+
+    def candidates(self, category, search=None, library=None, **kwargs):
+        """
+        Find the rows of a compendium that pass the filters of random_item
+
+        Parameters
+        ----------
+        category : str
+            Category of compendium
+        search, library, **kwargs
+            Keyword query, library, and column filters, as for random_item
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            Compendium loaded for the filters (without the long text columns that are
+            not filtered on)
+        rows : numpy.ndarray
+            Row numbers of the candidates
+        """
+        df, keep = self._filter(category, kwargs, library)
 
-        if filtered.empty:
+        if search is not None:
+            matches = np.zeros(len(df), dtype=bool)
+            matches[self.search_index(category).search(search)[0]] = True
+            keep &= matches
+
+        return df, np.flatnonzero(keep)
+
+    @timed("randomizer.random_item")
+    def random_item(self, category, num=1, search=None, library=None, **kwargs):
+        """
+        Get a random item
+
+        Parameters
+        ----------
+        category : str
+            Category of compendium
+        num : int
+            Number of random items. Defaults to 1
+        search : str, optional
+            Only pick items matching a keyword query of the name and text (see
+            ebuilder.search.SearchIndex.search), e.g. "fire damage"
+        library : ebuilder.library.Library or list of str, optional
+            Only pick items from these books. The owned filter (an extra filter, so
+            owned=["False"] leaves no items) and the owned column of the items also use
+            this library. Defaults to all books (and to DEFAULT_LIBRARY for the owned
+            filter and column)
+        **kwargs
+            Column filters, e.g. rarity=["rare", "very"] or type=["wand"]
+
+        Returns
+        -------
+        items : pandas.DataFrame
+            Random items
+        """
+        df, numbers = self._sample(category, num, search, library, kwargs)
+        return self.items(category, df, numbers, library)
+
+    def _sample(self, category, num, search, library, kwargs):
+        """Filter a compendium and pick random rows"""
+        df, rows = self.candidates(category, search, library, **kwargs)
+        if len(rows) == 0:
             raise RuntimeError("No remaining items after filtering.")
 
         # Return random values
         rng = np.random.default_rng()
-        numbers = rng.choice(len(filtered), size=num, replace=False)
-        return filtered.loc[numbers].reset_index(drop=True)
+        return df, rng.choice(rows, size=num, replace=False)
+
+    def iter_random_items(
+            self, category, num=1, search=None, library=None, chunk_size=100, **kwargs
+        ):
+        """
+        Generate random items one at a time
+
+        The items are read in chunks, so rendering them (see ebuilder.render) can start
+        before all of them are read.
+
+        Parameters
+        ----------
+        category : str
+            Category of compendium
+        num : int
+            Number of random items. Defaults to 1
+        search, library, **kwargs
+            Keyword query, library, and column filters, as for random_item
+        chunk_size : int, optional
+            Number of items read at a time. Defaults to 100
+
+        Yields
+        ------
+        item : dict
+            Values of the item by column, with the long text columns parsed into
+            paragraphs and blocks (see ebuilder.textstore.parse_text) and None for
+            missing values
+        """
+        df, numbers = self._sample(category, num, search, library, kwargs)
+        for start in range(0, len(numbers), chunk_size):
+            items = self.items(category, df, numbers[start:start + chunk_size], library)
+            yield from records(items)
@@ -0,0 +1,188 @@
+"""
+
+=========
+render.py
+=========
+
+Streaming renderers for compendium entries
+
+A renderer writes each entry as soon as it is produced, so long lists of random items
+(see ebuilder.Randomizer.iter_random_items) are printed without first building a data
+frame of all of them. Entries are dictionaries with the long text columns parsed into
+paragraphs and blocks (see ebuilder.textstore.parse_text).
+
+"""
+
+import sys
+
+import csv
+
+import abc
+
+import json
+
+import textwrap
+
+from .textstore import paragraphs
+
+
+class Renderer(abc.ABC):
+    """Base class for writing compendium entries to a stream"""
+
+    def __init__(self, stream=None, width=100):
+        """
+        Constructor for the renderer
+
+        Parameters
+        ----------
+        stream : file-like, optional
+            Text stream to write to. Defaults to sys.stdout
+        width : int, optional
+            Line width of the wrapped text. Defaults to 100
+        """
+        self.stream = sys.stdout if stream is None else stream
+        self.width = width
+
+    @abc.abstractmethod
+    def write(self, entry):
+        """
+        Write one entry
+
+        Parameters
+        ----------
+        entry : dict
+            Values of the entry by column, None for missing values
+        """
+
+    def write_all(self, entries):
+        """
+        Write entries as they are produced
+
+        Parameters
+        ----------
+        entries : iterable of dict
+
+        Returns
+        -------
+        count : int
+            Number of entries written
+        """
+        count = 0
+        for entry in entries:
+            self.write(entry)
+            count += 1
+        self.stream.flush()
+        return count
+
+
+def _is_text(value):
+    """Check if a value holds paragraphs or blocks"""
+    return isinstance(value, (list, dict))
+
+
+class TextRenderer(Renderer):
+    """Class for writing entries as wrapped plain text"""
+
+    def __init__(self, stream=None, width=100):
+        super().__init__(stream, width)
+        self.wrapper = textwrap.TextWrapper(width=width, replace_whitespace=False)
+
+    def write(self, entry):
+        name = str(entry.get("name") or "")
+        lines = ["", name, "_" * len(name)]
+        for key, value in entry.items():
+            if (key == "name") or (value is None) or _is_text(value):
+                continue
+            lines.append(f"{key:12s}: {value}")
+
+        # The paragraphs are wrapped with their indent
+        for key, value in entry.items():
+            if not _is_text(value):
+                continue
+            self.wrapper.initial_indent = f"{key:12s}: "
+            self.wrapper.subsequent_indent = " " * 14
+            for paragraph in paragraphs(value):
+                lines.extend(self.wrapper.wrap(paragraph))
+                self.wrapper.initial_indent = self.wrapper.subsequent_indent
+        self.stream.write("\n".join(lines) + "\n")
+
+
+class MarkdownRenderer(Renderer):
+    """Class for writing entries as Markdown sections"""
+
+    def write(self, entry):
+        lines = [f"## {entry.get('name') or ''}", ""]
+        for key, value in entry.items():
+            if (key == "name") or (value is None) or _is_text(value):
+                continue
+            lines.append(f"- **{key}**: {value}")
+        for key, value in entry.items():
+            if not _is_text(value):
+                continue
+            lines.extend(["", f"**{key}**"])
+            for paragraph in paragraphs(value):
+                lines.extend(["", paragraph])
+        self.stream.write("\n".join(lines) + "\n\n")
+
+
+class JsonlRenderer(Renderer):
+    """Class for writing entries as JSON lines"""
+
+    def write(self, entry):
+        self.stream.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class CsvRenderer(Renderer):
+    """Class for writing entries as CSV rows (with the text as JSON)"""
+
+    def __init__(self, stream=None, width=100):
+        super().__init__(stream, width)
+        self.writer = None
+
+    def write(self, entry):
+        if self.writer is None:
+            # The first entry sets the columns
+            self.writer = csv.DictWriter(self.stream, fieldnames=list(entry))
+            self.writer.writeheader()
+        self.writer.writerow({
+            key: json.dumps(value, ensure_ascii=False) if _is_text(value) else value
+            for key, value in entry.items()
+        })
+
+
+RENDERERS = {
+    "text": TextRenderer,
+    "markdown": MarkdownRenderer,
+    "jsonl": JsonlRenderer,
+    "csv": CsvRenderer,
+}
+"""
+Renderer of each output format
+"""
+
+
+def render_items(entries, output_format="text", stream=None, width=100):
+    """
+    Write compendium entries as they are produced
+
+    Parameters
+    ----------
+    entries : iterable of dict
+        Entries, e.g. from ebuilder.Randomizer.iter_random_items
+    output_format : str, optional
+        "text", "markdown", "jsonl", or "csv". Defaults to "text"
+    stream : file-like, optional
+        Text stream to write to. Defaults to sys.stdout
+    width : int, optional
+        Line width of the wrapped text. Defaults to 100
+
+    Returns
+    -------
+    count : int
+        Number of entries written
+    """
+    if output_format not in RENDERERS:
+        raise ValueError(
+            f"Unknown output format {output_format}, expected one of {list(RENDERERS)}"
+        )
+    return RENDERERS[output_format](stream, width).write_all(entries)
@@ -0,0 +1,195 @@
+"""
+
+=========
+search.py
+=========
+
+Full-text search index over the compendium text
+
+The index is an SQLite FTS5 table with one document per compendium row (the row number
+is the document id), so a keyword query finds its rows without scanning the text. Only
+the index is stored: the text itself stays in the compendium. Matches are ranked with
+BM25, with the name weighted above the rest of the text.
+
+The structured text columns are indexed as their paragraphs without source citations
+(see ebuilder.textstore.paragraphs), so the JSON keys of the blocks and the citations
+do not match every entry.
+
+"""
+
+import os
+
+import sqlite3
+
+import threading
+
+import numpy as np
+
+from .textstore import paragraphs
+
+SEARCH_COLUMNS = [
+    "name", "text", "trait", "action", "legendary", "reaction", "spells", "description"
+]
+"""
+Compendium columns included in the search index
+"""
+
+SEARCH_VERSION = 2
+"""
+Version of the indexed documents (indexes of another version are rebuilt)
+"""
+
+NAME_WEIGHT = 10.0
+"""
+Weight of a match in the name relative to a match in the text
+"""
+
+
+def _document(value):
+    """Plain text of a compendium entry to index (None for missing entries)"""
+    if value is None:
+        return None
+    return " ".join(paragraphs(value, sources=False)) or None
+
+
+class SearchIndex():
+    """Class for ranked keyword queries of a compendium"""
+
+    def __init__(self, filename):
+        """
+        Constructor for the search index
+
+        Parameters
+        ----------
+        filename : str
+            Path of the SQLite database (see SearchIndex.write)
+        """
+        self.filename = filename
+        # SQLite connections cannot be shared between threads
+        self.local = threading.local()
+
+        connection = self.connection()
+        self.columns = [
+            row[1] for row in connection.execute("PRAGMA table_info(entries)")
+        ]
+        self.weights = [NAME_WEIGHT if column == "name" else 1.0 for column in self.columns]
+
+    @staticmethod
+    def version(filename):
+        """
+        Version of the documents of an index file
+
+        Parameters
+        ----------
+        filename : str
+            Path of the SQLite database
+
+        Returns
+        -------
+        version : int
+            SEARCH_VERSION of the index when it was written (0 for older indexes)
+        """
+        connection = sqlite3.connect(f"file:{filename}?mode=ro", uri=True)
+        try:
+            return connection.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            connection.close()
+
+    def connection(self):
+        """Read-only connection of the calling thread"""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.filename}?mode=ro", uri=True)
+            self.local.connection = connection
+        return connection
+
+    def __getstate__(self):
+        # Connections cannot be pickled (e.g. when sent to a worker process)
+        return {"filename": self.filename}
+
+    def __setstate__(self, state):
+        self.__init__(state["filename"])
+
+    @staticmethod
+    def write(filename, df):
+        """
+        Index the text columns of a data frame
+
+        The database is written under a temporary name and then moved into place, so
+        readers never see a partial index.
+
+        Parameters
+        ----------
+        filename : str
+            Path of the SQLite database
+        df : pandas.DataFrame
+            Text columns to index, one document per row
+        """
+        columns = [column for column in SEARCH_COLUMNS if column in df.columns]
+        if os.path.exists(filename + ".tmp"):
+            os.remove(filename + ".tmp")
+
+        connection = sqlite3.connect(filename + ".tmp")
+        try:
+            # Contentless, since the text is read from the compendium
+            connection.execute(
+                f"CREATE VIRTUAL TABLE entries USING fts5({', '.join(columns)}, "
+                "content='', tokenize='porter unicode61')"
+            )
+            connection.executemany(
+                f"INSERT INTO entries (rowid, {', '.join(columns)}) "
+                f"VALUES (?{', ?' * len(columns)})",
+                (
+                    (row, *[_document(value) for value in values])
+                    for row, values in enumerate(
+                        df[columns].astype(object).where(df[columns].notna(), None)
+                        .itertuples(index=False, name=None)
+                    )
+                ),
+            )
+            connection.execute("INSERT INTO entries (entries) VALUES ('optimize')")
+            connection.execute(f"PRAGMA user_version = {SEARCH_VERSION}")
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(filename + ".tmp", filename)
+
+    def search(self, query, limit=None):
+        """
+        Find the rows matching a query, best match first
+
+        Parameters
+        ----------
+        query : str
+            FTS5 query. Words must all match (in any column, ignoring case and word
+            endings); quote a phrase to match the words together, e.g.
+            '"pack tactics"', and use OR, NOT, or a trailing * for prefixes
+        limit : int, optional
+            Maximum number of rows. Defaults to every match
+
+        Returns
+        -------
+        rows : numpy.ndarray
+            Row numbers of the matches
+        scores : numpy.ndarray
+            Relevance of each match (higher is better)
+        """
+        weights = ", ".join(str(weight) for weight in self.weights)
+        sql = (
+            f"SELECT rowid, bm25(entries, {weights}) AS score FROM entries "
+            "WHERE entries MATCH ? ORDER BY score"
+        )
+        parameters = [query]
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(int(limit))
+
+        try:
+            matches = self.connection().execute(sql, parameters).fetchall()
+        except sqlite3.OperationalError as error:
+            raise ValueError(f"Invalid search query {query!r}: {error}") from error
+
+        rows = np.array([row for row, _ in matches], dtype=np.int64)
+        # BM25 scores are negative, lower is better
+        scores = -np.array([score for _, score in matches], dtype=np.float64)
+        return rows, scores
@@ -0,0 +1,289 @@
+"""
+
+=========
+shared.py
+=========
+
+Compendium and tables memory-mapped from files shared between worker processes
+
+A parent process exports the loaded compendiums and the power cube once with
+export_shared and points the workers at the directory with use_shared (or the
+EBUILDER_SHARED_DIR environment variable, which must be set before the workers import
+ebuilder). Workers then attach to the files instead of parsing their own copies: the
+numeric columns and the power cube are read-only views of the memory-mapped files, so
+the operating system keeps one copy of the pages for all of the workers. String columns
+are decoded in each worker, since frozen string columns are read-only object arrays (see
+ebuilder.frozen.freeze_frame); pyarrow speeds up the decoding when it is installed. A
+directory on a memory file system (e.g. /dev/shm) avoids disk reads.
+
+"""
+
+import os
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from .frozen import MASKED_ARRAYS, freeze_frame
+
+SHARED_DIR = os.environ.get("EBUILDER_SHARED_DIR") or None
+"""
+Directory of the exported compendium and tables (None to load them in each process)
+"""
+
+MANIFEST_FILE = "manifest.json"
+
+ALIGNMENT = 64
+"""
+Byte alignment of the arrays in a frame file
+"""
+
+
+def use_shared(directory):
+    """
+    Attach to an exported directory in this process and in the processes it starts
+
+    Only compendiums and tables that are not loaded yet are attached, so call this
+    before importing ebuilder in the workers (or set EBUILDER_SHARED_DIR).
+
+    Parameters
+    ----------
+    directory : str or None
+        Directory written by export_shared. None stops attaching
+    """
+    global SHARED_DIR
+    SHARED_DIR = directory
+    if directory is None:
+        os.environ.pop("EBUILDER_SHARED_DIR", None)
+    else:
+        os.environ["EBUILDER_SHARED_DIR"] = directory
+
+
+def _string_arrays(values):
+    """UTF-8 bytes, offsets, and packed validity bitmap of a string column"""
+    valid = values.notna().to_numpy()
+    encoded = [
+        str(value).encode("utf-8") if is_valid else b""
+        for value, is_valid in zip(values, valid)
+    ]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return {"data": data, "offsets": offsets, "valid": np.packbits(valid, bitorder="little")}
+
+
+def _write_column(frame_file, values):
+    """Append the arrays of a column to a frame file and get its manifest entry"""
+    if isinstance(values.dtype, np.dtype) and values.dtype != object:
+        kind = "numpy"
+        arrays = {"data": values.to_numpy()}
+    elif isinstance(values.dtype, pd.CategoricalDtype):
+        kind = "categorical"
+        arrays = {"codes": values.array.codes}
+    elif isinstance(values.array, MASKED_ARRAYS):
+        kind = "masked"
+        arrays = {
+            "data": values.to_numpy(values.dtype.numpy_dtype, na_value=0),
+            "mask": values.isna().to_numpy(),
+        }
+    else:
+        kind = "string"
+        arrays = _string_arrays(values)
+
+    parts = {}
+    for part, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        frame_file.write(b"\0" * (-frame_file.tell() % ALIGNMENT))
+        parts[part] = {
+            "dtype": array.dtype.str, "offset": frame_file.tell(), "count": array.size
+        }
+        frame_file.write(array.tobytes())
+    entry = {"name": values.name, "kind": kind, "dtype": str(values.dtype), "parts": parts}
+    if kind == "categorical":
+        entry["categories"] = values.cat.categories.tolist()
+        entry["ordered"] = bool(values.cat.ordered)
+    return entry
+
+
+def _string_column(arrays, length):
+    """String column over the UTF-8 bytes, decoded with pyarrow when it is installed"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        pa = None
+
+    if pa is not None:
+        strings = pa.LargeStringArray.from_buffers(
+            length,
+            pa.py_buffer(arrays["offsets"]),
+            pa.py_buffer(arrays["data"]),
+            pa.py_buffer(arrays["valid"]),
+        )
+        return pd.array(strings, dtype=pd.StringDtype("pyarrow", na_value=np.nan))
+
+    data = arrays["data"].tobytes()
+    offsets = arrays["offsets"]
+    valid = np.unpackbits(arrays["valid"], count=length, bitorder="little").astype(bool)
+    return pd.array(
+        [
+            data[start:stop].decode("utf-8") if is_valid else None
+            for start, stop, is_valid in zip(offsets[:-1], offsets[1:], valid)
+        ],
+        dtype="str",
+    )
+
+
+def _read_column(buffer, column, length):
+    """Read-only column over the memory-mapped frame file of a manifest entry"""
+    arrays = {
+        part: np.frombuffer(
+            buffer, dtype=spec["dtype"], count=spec["count"], offset=spec["offset"]
+        )
+        for part, spec in column["parts"].items()
+    }
+    if column["kind"] == "numpy":
+        return arrays["data"]
+    if column["kind"] == "categorical":
+        return pd.Categorical.from_codes(
+            arrays["codes"],
+            dtype=pd.CategoricalDtype(column["categories"], ordered=column["ordered"]),
+            validate=False,
+        )
+    if column["kind"] == "masked":
+        array_type = pd.api.types.pandas_dtype(column["dtype"]).construct_array_type()
+        return array_type(arrays["data"], arrays["mask"])
+    return _string_column(arrays, length)
+
+
+def export_shared(directory, categories=None, randomizer=None):
+    """
+    Export the compendiums and the power cube for workers to attach to
+
+    Parameters
+    ----------
+    directory : str
+        Output directory (created if needed)
+    categories : list of str, optional
+        Compendium categories to export. Defaults to every category with a CSV
+    randomizer : ebuilder.Randomizer, optional
+        Randomizer to load the compendiums with. Defaults to a new randomizer
+
+    Returns
+    -------
+    manifest : dict
+        Arrays and frames in the directory
+    """
+    # Imported here since these modules attach to the shared directory on import
+    from .pc import POWER_CUBE
+    from .randomizer import Randomizer
+
+    if randomizer is None:
+        randomizer = Randomizer()
+    if categories is None:
+        categories = [
+            category for category in [
+                "background", "class", "feat", "item", "monster", "race", "spell"
+            ]
+            if os.path.isfile(randomizer.csv_filename(category))
+        ]
+
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "power_cube.npy"), POWER_CUBE)
+    manifest = {"arrays": {"power_cube": "power_cube.npy"}, "frames": {}}
+    for category in categories:
+        name = f"compendium_{category}"
+        df = randomizer.get_compendium(category)
+        with open(os.path.join(directory, f"{name}.bin"), "wb") as frame_file:
+            columns = [
+                _write_column(frame_file, df.iloc[:, index]) for index in range(df.shape[1])
+            ]
+        manifest["frames"][name] = {
+            "file": f"{name}.bin", "length": len(df), "columns": columns
+        }
+
+    # Written last so workers never see a partial export
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+    return manifest
+
+
+def read_manifest(directory=None):
+    """
+    Read the manifest of an exported directory
+
+    Parameters
+    ----------
+    directory : str, optional
+        Defaults to SHARED_DIR
+
+    Returns
+    -------
+    manifest : dict or None
+        None when there is no exported directory
+    """
+    directory = directory or SHARED_DIR
+    if directory is None:
+        return None
+    with open(os.path.join(directory, MANIFEST_FILE), "r") as manifest_file:
+        return json.load(manifest_file)
+
+
+def attach_array(name, directory=None):
+    """
+    Attach to an exported array
+
+    Parameters
+    ----------
+    name : str
+        Name of the array, e.g. "power_cube"
+    directory : str, optional
+        Defaults to SHARED_DIR
+
+    Returns
+    -------
+    array : numpy.memmap or None
+        Read-only array, or None when the array is not exported
+    """
+    directory = directory or SHARED_DIR
+    manifest = read_manifest(directory)
+    if manifest is None or name not in manifest["arrays"]:
+        return None
+    return np.load(os.path.join(directory, manifest["arrays"][name]), mmap_mode="r")
+
+
+def attach_frame(name, directory=None):
+    """
+    Attach to an exported data frame
+
+    Parameters
+    ----------
+    name : str
+        Name of the frame, e.g. "compendium_monster"
+    directory : str, optional
+        Defaults to SHARED_DIR
+
+    Returns
+    -------
+    df : pandas.DataFrame or None
+        Frozen data frame over the memory-mapped files (see
+        ebuilder.frozen.freeze_frame), or None when the frame is not exported
+    """
+    directory = directory or SHARED_DIR
+    manifest = read_manifest(directory)
+    if manifest is None or name not in manifest["frames"]:
+        return None
+
+    frame = manifest["frames"][name]
+    columns = frame["columns"]
+    buffer = np.memmap(os.path.join(directory, frame["file"]), dtype=np.uint8, mode="r")
+    df = pd.DataFrame(
+        {
+            index: _read_column(buffer, column, frame["length"])
+            for index, column in enumerate(columns)
+        },
+        index=pd.RangeIndex(frame["length"]),
+        copy=False,
+    )
+    df.columns = [column["name"] for column in columns]
+    return freeze_frame(df)
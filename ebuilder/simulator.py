@@ -0,0 +1,380 @@
+"""
+
+============
+simulator.py
+============
+
+Monte Carlo combat simulation for validating encounter difficulty
+
+"""
+
+import os
+
+import re
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .challenge import MONSTER_STATISTICS
+from .frozen import freeze_frame
+from .monsters import MONSTERS, monster_key
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+PC_STATISTICS = freeze_frame(pd.read_csv(os.path.join(
+    DATA_DIR,
+    "pc_statistics.csv"
+)).set_index("level"))
+
+STAT_KEYS = [
+    "hp",
+    "ac",
+    "attack_bonus",
+    "attacks",
+    "dice_num",
+    "dice_sides",
+    "dice_bonus",
+    "advantage",
+    "foe_advantage",
+    "foe_disadvantage",
+]
+"""
+Per-combatant statistics used by the simulation
+"""
+
+
+def _leading_int(value):
+    """
+    Parse the leading integer of a compendium entry such as "45 (6d10+12)"
+
+    Parameters
+    ----------
+    value : str
+
+    Returns
+    -------
+    number : int or None
+        Leading integer or None if the entry has no number
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    match = re.match(r"\s*(\d+)", str(value))
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
+def _cr_statistics(cr):
+    """Get the row of the monster statistics table for a CR (floored to the table)"""
+    cr = min(max(cr, 0), MONSTER_STATISTICS.index[-1])
+    return MONSTER_STATISTICS[MONSTER_STATISTICS.index <= cr].iloc[-1]
+
+
+def pc_statistics(pc):
+    """
+    Combat statistics for a player character
+
+    Statistics are based on the PC's total level. Advantages are taken from the
+    PC_ADVANTAGE, MONSTER_ADVANTAGE, and MONSTER_DISADVANTAGE flags.
+
+    Parameters
+    ----------
+    pc : ebuilder.PlayerCharacter
+
+    Returns
+    -------
+    stats : dict
+        Combat statistics keyed by STAT_KEYS
+    """
+    row = PC_STATISTICS.loc[min(max(pc.level, 1), PC_STATISTICS.index[-1])]
+    stats = {key: int(row[key]) for key in STAT_KEYS[:7]}
+    stats["advantage"] = bool(pc.advantages.get("PC_ADVANTAGE", False))
+    stats["foe_advantage"] = bool(pc.advantages.get("MONSTER_ADVANTAGE", False))
+    stats["foe_disadvantage"] = bool(pc.advantages.get("MONSTER_DISADVANTAGE", False))
+    return stats
+
+
+def monster_statistics(monster):
+    """
+    Combat statistics for a monster
+
+    Statistics are taken from the compendium when the monster is found there and
+    otherwise from the statistics table by CR. Offense is one attack per round whose
+    average damage is the monster's damage per round, from the compendium's damage
+    index or the middle of the table's damage-per-round range. Monsters that PCs can
+    bypass the resistances of defend at 2 CR lower and one-round-knockout monsters
+    attack at 4 CR higher, mirroring the effective CR.
+
+    Parameters
+    ----------
+    monster : ebuilder.Monster
+
+    Returns
+    -------
+    stats : dict
+        Combat statistics keyed by STAT_KEYS
+    """
+    defense = _cr_statistics(monster.cr - 2 * monster.bypass_resistance)
+    offense = _cr_statistics(monster.cr + 4 * monster.ohko)
+
+    hp = (defense["hp_min"] + defense["hp_max"]) / 2
+    ac = defense["ac"]
+    attack_bonus = offense["attack_bonus"]
+    dpr = (offense["dpr_min"] + offense["dpr_max"]) / 2
+    for name in [monster.name, monster.name.replace("_", " ")]:
+        key = monster_key(name)
+        if key is not None:
+            entry = MONSTERS.loc[key]
+            hp = _leading_int(entry.get("hp")) or hp
+            ac = _leading_int(entry.get("ac")) or ac
+            if not monster.ohko and pd.notna(entry.get("to_hit")):
+                attack_bonus = entry["to_hit"]
+            if not monster.ohko and entry.get("dpr_mean", 0) > 0:
+                dpr = entry["dpr_mean"]
+            break
+
+    # Express the damage per round as a number of d6 plus a flat bonus
+    dice_num = max(1, int(round(dpr / 7)))
+
+    return {
+        "hp": int(max(hp, 1)),
+        "ac": int(ac),
+        "attack_bonus": int(attack_bonus),
+        "attacks": 1,
+        "dice_num": dice_num,
+        "dice_sides": 6,
+        "dice_bonus": int(round(dpr - 3.5 * dice_num)),
+        "advantage": False,
+        "foe_advantage": False,
+        "foe_disadvantage": False,
+    }
+
+
+def _stack(stats):
+    """Stack a list of statistics dictionaries into arrays"""
+    return {key: np.array([stat[key] for stat in stats]) for key in STAT_KEYS}
+
+
+def _roll_d20(rng, shape, advantage, disadvantage):
+    """
+    Roll d20s, taking the higher (lower) of two rolls with (dis)advantage
+
+    Advantage and disadvantage on the same roll cancel out to a single roll.
+    """
+    first = rng.integers(1, 21, size=shape)
+    second = rng.integers(1, 21, size=shape)
+    both = advantage & disadvantage
+    advantage = advantage & ~both
+    disadvantage = disadvantage & ~both
+    return np.where(
+        advantage,
+        np.maximum(first, second),
+        np.where(disadvantage, np.minimum(first, second), first)
+    )
+
+
+def _damage(rng, shape, d20, attack_bonus, target_ac, dice_num, dice_sides, dice_bonus):
+    """
+    Roll the damage for a batch of attacks
+
+    All statistics must broadcast to shape. Natural 20s always hit and roll the damage
+    dice twice, natural 1s always miss.
+    """
+    max_dice = int(np.max(dice_num))
+    dice_mask = np.arange(max_dice) < dice_num[..., None]
+    rolls = rng.integers(1, dice_sides[..., None, None] + 1, size=shape + (2, max_dice))
+    rolls = rolls * dice_mask[..., None, :]
+
+    crit = d20 == 20
+    hit = crit | ((d20 != 1) & (d20 + attack_bonus >= target_ac))
+    damage = rolls[..., 0, :].sum(axis=-1) + crit * rolls[..., 1, :].sum(axis=-1)
+    return np.maximum(damage + dice_bonus, 0) * hit
+
+
+def simulate_fights(pcs, monsters, num_fights, rng, max_rounds=20):
+    """
+    Simulate a batch of fights at once
+
+    All fights are simulated together as arrays of shape (num_fights, combatants), so
+    the only Python loop is over combat rounds. Each round the PCs act first and focus
+    their attacks on the first monster still standing, with overkill damage carrying
+    over to the next monster. Each surviving monster attack then targets a random
+    standing PC.
+
+    Parameters
+    ----------
+    pcs : dict
+        Arrays of PC statistics keyed by STAT_KEYS
+    monsters : dict
+        Arrays of monster statistics keyed by STAT_KEYS
+    num_fights : int
+        Number of fights to simulate
+    rng : numpy.random.Generator
+        Random number generator
+    max_rounds : int, optional
+        Maximum number of rounds per fight. Defaults to 20
+
+    Returns
+    -------
+    results : dict
+        Arrays of per-fight results: "win", "pcs_down", "hp_lost", and "rounds"
+    """
+    num_pcs = len(pcs["hp"])
+    pc_hp = np.tile(pcs["hp"].astype(float), (num_fights, 1))
+    monster_hp = np.tile(monsters["hp"].astype(float), (num_fights, 1))
+    rounds = np.zeros(num_fights, dtype=int)
+    fights = np.arange(num_fights)
+
+    pc_attacks = np.arange(np.max(pcs["attacks"])) < pcs["attacks"][:, None]
+    monster_attacks = np.arange(np.max(monsters["attacks"])) < monsters["attacks"][:, None]
+
+    for _ in range(max_rounds):
+        pc_alive = pc_hp > 0
+        monster_alive = monster_hp > 0
+        active = pc_alive.any(axis=1) & monster_alive.any(axis=1)
+        if not active.any():
+            break
+        rounds += active
+
+        # PCs attack the first standing monster
+        target_ac = monsters["ac"][np.argmax(monster_alive, axis=1)]
+        shape = (num_fights,) + pc_attacks.shape
+        d20 = _roll_d20(
+            rng, shape, pcs["advantage"][:, None], np.zeros_like(pc_attacks)
+        )
+        damage = _damage(
+            rng,
+            shape,
+            d20,
+            pcs["attack_bonus"][:, None],
+            target_ac[:, None, None],
+            pcs["dice_num"][:, None],
+            pcs["dice_sides"][:, None],
+            pcs["dice_bonus"][:, None],
+        )
+        valid = pc_attacks & pc_alive[:, :, None] & active[:, None, None]
+        total = (damage * valid).sum(axis=(1, 2))
+
+        # Carry damage through the monsters in order
+        remaining = np.maximum(np.cumsum(np.maximum(monster_hp, 0), axis=1) - total[:, None], 0)
+        monster_hp = np.where(
+            monster_alive, np.diff(remaining, axis=1, prepend=0), monster_hp
+        )
+        monster_alive = monster_hp > 0
+
+        # Standing monsters attack random standing PCs
+        shape = (num_fights,) + monster_attacks.shape
+        num_alive = pc_alive.sum(axis=1)
+        pick = np.floor(rng.random(shape) * num_alive[:, None, None])
+        cumulative = np.cumsum(pc_alive, axis=1)
+        target = np.argmax(cumulative[:, None, None, :] > pick[..., None], axis=-1)
+
+        d20 = _roll_d20(
+            rng, shape, pcs["foe_advantage"][target], pcs["foe_disadvantage"][target]
+        )
+        damage = _damage(
+            rng,
+            shape,
+            d20,
+            monsters["attack_bonus"][:, None],
+            pcs["ac"][target],
+            monsters["dice_num"][:, None],
+            monsters["dice_sides"][:, None],
+            monsters["dice_bonus"][:, None],
+        )
+        valid = monster_attacks & monster_alive[:, :, None] & active[:, None, None]
+        pc_hp -= np.bincount(
+            (fights[:, None, None] * num_pcs + target).ravel(),
+            weights=(damage * valid).ravel(),
+            minlength=num_fights * num_pcs
+        ).reshape(num_fights, num_pcs)
+
+    pc_max_hp = pcs["hp"].sum()
+    return {
+        "win": ~(monster_hp > 0).any(axis=1) & (pc_hp > 0).any(axis=1),
+        "pcs_down": (pc_hp <= 0).sum(axis=1),
+        "hp_lost": 1 - np.maximum(pc_hp, 0).sum(axis=1) / pc_max_hp,
+        "rounds": rounds,
+    }
+
+
+def _simulate_chunk(args):
+    """Simulate a chunk of fights in a worker process"""
+    pcs, monsters, num_fights, seed, max_rounds = args
+    return simulate_fights(
+        pcs, monsters, num_fights, np.random.default_rng(seed), max_rounds
+    )
+
+
+class CombatSimulator():
+    """Class for simulating the combat of an encounter"""
+
+    def __init__(self, encounter, max_rounds=20):
+        """
+        Constructor for the combat simulator
+
+        Parameters
+        ----------
+        encounter : ebuilder.Encounter
+            Encounter to simulate
+        max_rounds : int, optional
+            Maximum number of rounds per fight. Defaults to 20
+        """
+        self.encounter = encounter
+        self.max_rounds = max_rounds
+
+        self.pcs = _stack([pc_statistics(pc) for pc in encounter.party.pcs])
+        self.monsters = _stack([
+            monster_statistics(monster)
+            for monster, quantity in encounter.monster_party.monsters
+            for _ in range(quantity)
+        ])
+
+    def run(self, num_fights=10000, jobs=1, seed=None):
+        """
+        Run the simulation
+
+        Parameters
+        ----------
+        num_fights : int, optional
+            Number of fights to simulate. Defaults to 10000
+        jobs : int, optional
+            Number of worker processes to split the fights across. Defaults to 1
+        seed : int, optional
+            Seed for the random number generator. Defaults to None
+
+        Returns
+        -------
+        results : dict
+            Win rate, average number of PCs downed, fraction of fights with any PC
+            downed, average fraction of party hit points lost, average number of
+            rounds, and the CR2.0 difficulty of the encounter
+        """
+        seeds = np.random.SeedSequence(seed).spawn(jobs)
+        sizes = [len(chunk) for chunk in np.array_split(np.arange(num_fights), jobs)]
+        chunks = [
+            (self.pcs, self.monsters, size, chunk_seed, self.max_rounds)
+            for size, chunk_seed in zip(sizes, seeds)
+        ]
+
+        if jobs == 1:
+            outcomes = [_simulate_chunk(chunks[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                outcomes = list(executor.map(_simulate_chunk, chunks))
+        outcome = {
+            key: np.concatenate([chunk[key] for chunk in outcomes])
+            for key in outcomes[0]
+        }
+
+        return {
+            "fights": num_fights,
+            "win_rate": float(outcome["win"].mean()),
+            "pcs_down": float(outcome["pcs_down"].mean()),
+            "any_pc_down": float((outcome["pcs_down"] > 0).mean()),
+            "hp_lost": float(outcome["hp_lost"].mean()),
+            "rounds": float(outcome["rounds"].mean()),
+            "difficulty": self.encounter.difficulty(method="cr2"),
+        }
@@ -0,0 +1,242 @@
+"""
+
+============
+textstore.py
+============
+
+Structured text and an offset-indexed store for the long text columns of a compendium
+
+The long text columns hold paragraphs (a list of strings) or named blocks such as
+traits and actions (a list of dictionaries with a "name" and a "text"), encoded as JSON
+when the compendium is built. The text of every entry is kept as UTF-8 bytes in one file
+and the index holds the offset of each entry, so the text of a few selected rows is read
+without parsing (or keeping in memory) the text of the rest of the compendium.
+
+"""
+
+import os
+
+import re
+
+import ast
+
+import json
+
+import numpy as np
+import pandas as pd
+
+
+SOURCE_PATTERN = re.compile(r"source:[^\n]*", flags=re.IGNORECASE)
+"""
+Source citation in a paragraph, e.g. "Source: Monster Manual p. 12"
+"""
+
+
+def encode_text(value):
+    """
+    Encode a structured text entry for a compendium CSV
+
+    Parameters
+    ----------
+    value : str, list, dict, or None
+        Entry as parsed from the XML
+
+    Returns
+    -------
+    encoded : str or None
+        JSON of lists and dictionaries (without missing paragraphs), other entries as
+        they are
+    """
+    if isinstance(value, dict):
+        value = [value]
+    if isinstance(value, list):
+        return json.dumps(
+            [entry for entry in value if entry is not None], ensure_ascii=False
+        )
+    return value
+
+
+def parse_text(value):
+    """
+    Parse a structured text entry of a compendium
+
+    Parameters
+    ----------
+    value : str or None
+        Entry as stored in the compendium. Compendiums built before the text was
+        encoded as JSON hold the Python representation of the lists instead
+
+    Returns
+    -------
+    text : list, str, or None
+        Paragraphs or blocks, or the entry itself when it is plain text
+    """
+    if not isinstance(value, str):
+        return None if (value is None or pd.isna(value)) else value
+    if not value.startswith(("[", "{")):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def paragraphs(value, sources=True):
+    """
+    Paragraphs of a structured text entry
+
+    Parameters
+    ----------
+    value : str, list, dict, or None
+        Entry as stored in the compendium or as parsed with parse_text
+    sources : bool, optional
+        Flag to keep the source citations. Otherwise citations are removed from the
+        paragraphs and source-only paragraphs are dropped. Defaults to True
+
+    Returns
+    -------
+    paragraphs : list of str
+        One paragraph per string, and one per named block (starting with its name)
+    """
+    if isinstance(value, str):
+        value = parse_text(value)
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+
+    result = []
+    for entry in value:
+        if isinstance(entry, dict):
+            text = entry.get("text")
+            if isinstance(text, list):
+                text = " ".join(str(line) for line in text if line is not None)
+            name = entry.get("name")
+            result.append(f"{name}. {text or ''}".strip() if name else str(text or ""))
+        elif entry is not None:
+            result.append(str(entry))
+
+    if not sources:
+        result = [SOURCE_PATTERN.sub("", paragraph).strip() for paragraph in result]
+        result = [paragraph for paragraph in result if paragraph.rstrip(".")]
+    return result
+
+
+class TextStore():
+    """Class for reading text entries by row from an offset-indexed store"""
+
+    def __init__(self, filename):
+        """
+        Constructor for the text store
+
+        Parameters
+        ----------
+        filename : str
+            Path of the store without extension. The text is in filename + ".bin" and
+            the index in filename + ".npz" (see TextStore.write)
+        """
+        self.filename = filename
+        with np.load(filename + ".npz") as index:
+            self.columns = [str(column) for column in index["columns"]]
+            self.offsets = index["offsets"]
+            self.missing = index["missing"]
+
+        # The text is memory-mapped, so only the pages of the rows read are loaded
+        if self.offsets[-1, -1] > 0:
+            self.data = np.memmap(filename + ".bin", dtype=np.uint8, mode="r")
+        else:
+            self.data = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return self.offsets.shape[1] - 1
+
+    @staticmethod
+    def write(filename, df):
+        """
+        Write the columns of a data frame to a store
+
+        The files are written under temporary names and then moved into place, so
+        readers never see a partial store.
+
+        Parameters
+        ----------
+        filename : str
+            Path of the store without extension
+        df : pandas.DataFrame
+            Text columns to store, one entry per row
+        """
+        offsets = np.zeros((df.shape[1], len(df) + 1), dtype=np.int64)
+        missing = df.isna().to_numpy().T
+        position = 0
+        with open(filename + ".bin.tmp", "wb") as data_file:
+            for index, column in enumerate(df):
+                encoded = [
+                    b"" if is_missing else str(value).encode("utf-8")
+                    for value, is_missing in zip(df[column], missing[index])
+                ]
+                offsets[index] = position + np.concatenate(
+                    [[0], np.cumsum([len(value) for value in encoded])]
+                )
+                position = offsets[index, -1]
+                data_file.write(b"".join(encoded))
+
+        with open(filename + ".npz.tmp", "wb") as index_file:
+            np.savez(
+                index_file,
+                columns=np.array(list(df.columns), dtype=str),
+                offsets=offsets,
+                missing=missing,
+            )
+        os.replace(filename + ".bin.tmp", filename + ".bin")
+        os.replace(filename + ".npz.tmp", filename + ".npz")
+
+    def get(self, column, rows):
+        """
+        Read the entries of a column
+
+        Parameters
+        ----------
+        column : str
+        rows : array_like of int
+            Row numbers
+
+        Returns
+        -------
+        values : list
+            Text of each row (None for missing entries)
+        """
+        index = self.columns.index(column)
+        starts = self.offsets[index, :-1]
+        stops = self.offsets[index, 1:]
+        missing = self.missing[index]
+        return [
+            None if missing[row]
+            else self.data[starts[row]:stops[row]].tobytes().decode("utf-8")
+            for row in rows
+        ]
+
+    def frame(self, rows, columns=None):
+        """
+        Read the entries of selected rows
+
+        Parameters
+        ----------
+        rows : array_like of int
+            Row numbers
+        columns : list of str, optional
+            Columns to read. Defaults to every column in the store
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            One row per entry of rows
+        """
+        if columns is None:
+            columns = self.columns
+        return pd.DataFrame(
+            {column: pd.array(self.get(column, rows), dtype="str") for column in columns}
+        )
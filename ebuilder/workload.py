@@ -0,0 +1,453 @@
+"""
+
+===========
+workload.py
+===========
+
+Tools for generating synthetic parties, encounters, and compendiums
+
+All the generators are seeded and write their output as they go, so files with
+millions of entries can be generated with bounded memory.
+
+"""
+
+import json
+
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from .challenge import MONSTER_STATISTICS
+from .monsters import MONSTER_POWER, cr_num_to_str
+from .pc import CLASS_CATEGORIES, MAX_LEVEL
+from .randomizer import TYPE_MAP
+
+CHUNK_SIZE = 10000
+"""
+Number of entries drawn from the random number generator at a time
+"""
+
+MULTICLASS_CHANCE = 0.3
+"""
+Chance that a synthetic character has a second class
+"""
+
+LEVEL_WEIGHTS = np.linspace(2, 1, MAX_LEVEL) / np.linspace(2, 1, MAX_LEVEL).sum()
+"""
+Chance of each party level (lower levels are played more often)
+"""
+
+SOURCEBOOKS = [
+    "Dungeon Master's Guide",
+    "Monster Manual",
+    "Monster Manual 2024",
+    "Player's Handbook",
+    "Player's Handbook 2024",
+    "Tasha's Cauldron of Everything",
+    "Xanathar's Guide to Everything",
+    "Curse of Strahd",
+    "Volo's Guide to Monsters",
+]
+"""
+Sourcebooks of synthetic compendium entries (the last two are not owned)
+"""
+
+COMPENDIUM_CATEGORIES = ["item", "spell", "monster", "race", "class", "feat", "background"]
+
+RARITIES = ["Common", "Uncommon", "Rare", "Very Rare", "Legendary"]
+
+RARITY_WEIGHTS = [0.3, 0.3, 0.2, 0.15, 0.05]
+
+SPELL_SCHOOLS = ["A", "C", "D", "EN", "EV", "I", "N", "T"]
+
+DAMAGE_TYPES = ["acid", "cold", "fire", "lightning", "necrotic", "poison", "radiant"]
+
+NUMBER_NAMES = ["one", "two", "three", "four"]
+
+
+def _chunks(size):
+    """Sizes of the chunks of entries to draw at a time"""
+    for start in range(0, size, CHUNK_SIZE):
+        yield min(CHUNK_SIZE, size - start)
+
+
+def cr_weights(level=None):
+    """
+    Chance of drawing each CR in monster_power.csv
+
+    Parameters
+    ----------
+    level : float, optional
+        Party level to center the CRs on. Defaults to uniform CRs
+
+    Returns
+    -------
+    weights : numpy.ndarray
+    """
+    crs = MONSTER_POWER.index.to_numpy(float)
+    if level is None:
+        weights = np.ones(len(crs))
+    else:
+        weights = np.exp(-0.5 * ((crs - level) / max(level / 3, 1)) ** 2)
+    return weights / weights.sum()
+
+
+def party_records(num_pcs, rng, level=None):
+    """
+    Generate synthetic player characters
+
+    Characters are within one level of the party level. Multiclass characters keep
+    at least half their levels in their primary class.
+
+    Parameters
+    ----------
+    num_pcs : int
+        Number of characters
+    rng : numpy.random.Generator
+        Random number generator
+    level : int, optional
+        Party level. Defaults to a random level favoring lower levels
+
+    Yields
+    ------
+    pc : dict
+        Player character in the format of the party JSON file
+    """
+    if level is None:
+        level = int(rng.choice(np.arange(1, MAX_LEVEL + 1), p=LEVEL_WEIGHTS))
+    class_names = np.array(list(CLASS_CATEGORIES))
+
+    index = 0
+    for size in _chunks(num_pcs):
+        levels = np.clip(level + rng.integers(-1, 2, size), 1, MAX_LEVEL)
+        primary = rng.integers(len(class_names), size=size)
+        classes = np.stack([
+            primary, (primary + rng.integers(1, len(class_names), size)) % len(class_names)
+        ], axis=1)
+        multiclass = (rng.random(size) < MULTICLASS_CHANCE) & (levels > 1)
+        secondary = np.where(
+            multiclass, rng.integers(1, np.maximum(levels // 2, 1) + 1), 0
+        )
+        items = rng.integers(0, 4, (size, 2))
+        advantage = rng.random((size, 2)) < [0.25, 0.1]
+
+        for row in range(size):
+            index += 1
+            pc_levels = {class_names[classes[row, 0]]: int(levels[row] - secondary[row])}
+            if secondary[row]:
+                pc_levels[class_names[classes[row, 1]]] = int(secondary[row])
+            pc = {
+                "NAME": f"PC{index}",
+                "LEVELS": pc_levels,
+                "ITEMS": {"WEAPON": int(items[row, 0]), "ARMOR": int(items[row, 1])},
+            }
+            if advantage[row].any():
+                pc["ADVANTAGE"] = {
+                    "PC_ADVANTAGE": bool(advantage[row, 0]),
+                    "MONSTER_ADVANTAGE": bool(advantage[row, 1]),
+                }
+            yield pc
+
+
+def encounter_records(num_groups, rng, level=None):
+    """
+    Generate synthetic monster groups
+
+    Parameters
+    ----------
+    num_groups : int
+        Number of monster groups
+    rng : numpy.random.Generator
+        Random number generator
+    level : float, optional
+        Party level to center the CRs on. Defaults to uniform CRs (see cr_weights)
+
+    Yields
+    ------
+    monster : dict
+        Monster group in the format of the encounter JSON file
+    """
+    crs = MONSTER_POWER.index.to_numpy(float)
+    weights = cr_weights(level)
+
+    index = 0
+    for size in _chunks(num_groups):
+        cr = rng.choice(crs, size=size, p=weights)
+        quantity = np.maximum(rng.geometric(0.4, size), 1)
+        # Keep the effective CRs on the monster power table
+        bypass = (rng.random(size) < 0.1) & (cr >= 2)
+        ohko = (rng.random(size) < 0.05) & (cr == np.floor(cr)) & (cr + 4 - 2 * bypass <= crs[-1])
+
+        for row in range(size):
+            index += 1
+            monster = {
+                "NAME": f"MONSTER_{index}",
+                "CR": int(cr[row]) if cr[row] >= 1 else float(cr[row]),
+                "QUANTITY": int(quantity[row]),
+            }
+            if bypass[row]:
+                monster["BYPASS_RESISTANCE"] = True
+            if ohko[row]:
+                monster["OHKO"] = True
+            yield monster
+
+
+def write_json(path, records):
+    """
+    Stream records to a JSON list
+
+    Parameters
+    ----------
+    path : str
+        Output file
+    records : iterable of dict
+
+    Returns
+    -------
+    count : int
+        Number of records written
+    """
+    count = 0
+    with open(path, "w") as json_file:
+        json_file.write("[")
+        for record in records:
+            json_file.write(("," if count else "") + "\n    " + json.dumps(record))
+            count += 1
+        json_file.write("\n]\n")
+    return count
+
+
+def write_party_json(path, num_pcs, seed=None, level=None):
+    """
+    Write a synthetic party JSON file
+
+    Parameters
+    ----------
+    path : str
+        Output file
+    num_pcs : int
+        Number of characters
+    seed : int, optional
+        Random seed. Defaults to None
+    level : int, optional
+        Party level. Defaults to a random level
+
+    Returns
+    -------
+    count : int
+        Number of characters written
+    """
+    return write_json(path, party_records(num_pcs, np.random.default_rng(seed), level))
+
+
+def write_encounter_json(path, num_groups, seed=None, level=None):
+    """
+    Write a synthetic encounter JSON file
+
+    Parameters
+    ----------
+    path : str
+        Output file
+    num_groups : int
+        Number of monster groups
+    seed : int, optional
+        Random seed. Defaults to None
+    level : float, optional
+        Party level to center the CRs on. Defaults to uniform CRs
+
+    Returns
+    -------
+    count : int
+        Number of monster groups written
+    """
+    return write_json(
+        path, encounter_records(num_groups, np.random.default_rng(seed), level)
+    )
+
+
+def _element(tag, text):
+    """XML element with escaped text"""
+    return f"<{tag}>{escape(str(text))}</{tag}>"
+
+
+def _source(rng, index):
+    """Source line of a compendium entry"""
+    return f"Source: {SOURCEBOOKS[rng.integers(len(SOURCEBOOKS))]} p. {index % 400 + 1}"
+
+
+def _items(start, size, rng):
+    """Synthetic magic item elements"""
+    types = np.array(list(TYPE_MAP))
+    item_types = types[rng.integers(len(types), size=size)]
+    rarities = rng.choice(RARITIES, size=size, p=RARITY_WEIGHTS)
+    damage = rng.choice(DAMAGE_TYPES, size=size)
+    for row in range(size):
+        index = start + row
+        yield (
+            "<item>"
+            + _element("name", f"Item {index}")
+            + _element("type", item_types[row])
+            + _element("magic", 1)
+            + _element("detail", f"{rarities[row]} (requires attunement)")
+            + _element("text", f"This item deals an extra 1d6 {damage[row]} damage.")
+            + _element("text", _source(rng, index))
+            + "</item>"
+        )
+
+
+def _spells(start, size, rng):
+    """Synthetic spell elements"""
+    class_names = np.array([name.title() for name in CLASS_CATEGORIES])
+    levels = rng.integers(0, 10, size)
+    schools = rng.choice(SPELL_SCHOOLS, size=size)
+    dice = rng.integers(1, 13, size)
+    for row in range(size):
+        index = start + row
+        classes = ", ".join(rng.choice(class_names, size=2, replace=False))
+        yield (
+            "<spell>"
+            + _element("name", f"Spell {index}")
+            + _element("level", levels[row])
+            + _element("school", schools[row])
+            + _element("classes", classes)
+            + _element("text", f"Each creature takes {dice[row]}d8 damage on a failed save.")
+            + _element("text", _source(rng, index))
+            + "</spell>"
+        )
+
+
+def _monsters(start, size, rng):
+    """Synthetic monster elements with stat blocks drawn from the DMG table for their CR"""
+    stats = MONSTER_STATISTICS.iloc[rng.integers(len(MONSTER_STATISTICS), size=size)]
+    cr = stats.index.to_numpy(float)
+    hp = np.maximum(rng.integers(stats["hp_min"], stats["hp_max"] + 1), 1)
+    ac = stats["ac"].to_numpy() + rng.integers(-1, 2, size)
+    to_hit = stats["attack_bonus"].to_numpy()
+    dpr = rng.uniform(stats["dpr_min"], stats["dpr_max"] + 1)
+    num_attacks = np.clip(1 + cr // 5, 1, 4).astype(int)
+    dice = np.maximum(np.round((dpr / num_attacks - 2) / 3.5), 1).astype(int)
+    breath_dice = np.maximum(np.round(dpr / 4.5), 1).astype(int)
+    recharge = rng.random(size) < 0.2
+    resist = rng.random(size) < 0.15
+    revised = rng.random(size) < 0.1
+    for row in range(size):
+        index = start + row
+        name = f"Monster {index}"
+        monster = (
+            "<monster>"
+            + _element("name", name)
+            + _element("size", "M")
+            + _element("type", "monstrosity")
+            + _element("ac", f"{ac[row]} (natural armor)")
+            + _element("hp", f"{hp[row]} ({hp[row] // 5}d8)")
+            + _element("cr", cr_num_to_str(cr[row]))
+        )
+        if resist[row]:
+            monster += _element("resist", DAMAGE_TYPES[index % len(DAMAGE_TYPES)])
+        # The source is the last text of the first trait
+        monster += (
+            "<trait>" + _element("name", "Keen Senses")
+            + _element("text", "The monster has advantage on Perception checks.")
+            + _element("text", _source(rng, index)) + "</trait>"
+            + "<trait>" + _element("name", "Pack Tactics")
+            + _element("text", "The monster has advantage on attacks near its allies.")
+            + "</trait>"
+        )
+        if num_attacks[row] > 1:
+            monster += (
+                "<action>" + _element("name", "Multiattack")
+                + _element("text", f"The monster makes {NUMBER_NAMES[num_attacks[row] - 1]} attacks.")
+                + "</action>"
+            )
+        monster += (
+            "<action>" + _element("name", "Claw")
+            + _element(
+                "text",
+                f"Melee Weapon Attack: +{to_hit[row]} to hit. Hit: ({dice[row]}d6 + 2) slashing damage."
+            )
+            + _element("attack", f"Claw|{to_hit[row]}|{dice[row]}d6+2")
+            + "</action>"
+        )
+        if recharge[row]:
+            monster += (
+                "<action>" + _element("name", "Breath (Recharge 5-6)")
+                + _element(
+                    "text",
+                    f"Each creature must make a DC {10 + to_hit[row]} Dexterity saving "
+                    f"throw, taking ({breath_dice[row]}d8) fire damage on a failed save."
+                )
+                + "</action>"
+            )
+        # Monsters from the 2024 Monster Manual have the source in the description
+        description = f"A synthetic monster of challenge rating {cr_num_to_str(cr[row])}."
+        if revised[row]:
+            description += f"\tSource: Monster Manual 2024 p. {index % 400 + 1}"
+        yield monster + _element("description", description) + "</monster>"
+
+
+def _simple(category):
+    """Synthetic elements of the categories with only names and text"""
+    def entries(start, size, rng):
+        for row in range(size):
+            index = start + row
+            yield (
+                f"<{category}>"
+                + _element("name", f"{category.title()} {index}")
+                + _element("text", f"Description of {category} {index}.")
+                + _element("text", _source(rng, index))
+                + f"</{category}>"
+            )
+    return entries
+
+
+ENTRY_GENERATORS = {
+    "item": _items,
+    "spell": _spells,
+    "monster": _monsters,
+    "race": _simple("race"),
+    "class": _simple("class"),
+    "feat": _simple("feat"),
+    "background": _simple("background"),
+}
+"""
+Generators of synthetic compendium entries by category
+"""
+
+
+def write_compendium_xml(path, sizes, seed=None):
+    """
+    Write a synthetic compendium XML file
+
+    The entries follow the structure that ebuilder.Randomizer.create_csv expects.
+
+    Parameters
+    ----------
+    path : str
+        Output file
+    sizes : dict or int
+        Number of entries of each category in COMPENDIUM_CATEGORIES, or the same
+        number for every category
+    seed : int, optional
+        Random seed. Defaults to None
+
+    Returns
+    -------
+    counts : dict
+        Number of entries written for each category
+    """
+    if isinstance(sizes, int):
+        sizes = {category: sizes for category in COMPENDIUM_CATEGORIES}
+    rng = np.random.default_rng(seed)
+
+    counts = {}
+    with open(path, "w", encoding="utf-8") as xml_file:
+        xml_file.write('<?xml version="1.0" encoding="UTF-8"?>\n<compendium version="5">\n')
+        for category, size in sizes.items():
+            start = 0
+            for chunk in _chunks(size):
+                for entry in ENTRY_GENERATORS[category](start, chunk, rng):
+                    xml_file.write(entry + "\n")
+                start += chunk
+            counts[category] = size
+        xml_file.write("</compendium>\n")
+    return counts
@@ -0,0 +1,224 @@
+"""
+
+==================
+async_load_test.py
+==================
+
+Measure event loop latency while serving concurrent requests
+
+Compares an idle loop, requests served through ebuilder.aio.AsyncBuilder, and the
+same requests made with the blocking API directly on the event loop.
+
+With --day-size, each request scores one long adventuring day of generated encounters
+instead of the encounter files, which shows how long a single scoring call would block
+the loop:
+
+    python scripts/async_load_test.py --day-size 1500 --requests 8 --concurrency 4
+
+"""
+
+import os
+import sys
+
+import time
+
+import asyncio
+
+import argparse
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import ebuilder
+import ebuilder.aio
+
+INPUT_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "inputs")
+
+
+ARG_PARSER = argparse.ArgumentParser(
+    description="Measure event loop latency under concurrent encounter builder requests"
+)
+
+ARG_PARSER.add_argument(
+    "--requests",
+    "-n",
+    type=int,
+    help="Total number of requests per scenario.",
+    default=500
+)
+
+ARG_PARSER.add_argument(
+    "--concurrency",
+    "-c",
+    type=int,
+    help="Number of concurrent clients.",
+    default=50
+)
+
+ARG_PARSER.add_argument(
+    "--workers",
+    "-w",
+    type=int,
+    help="Number of executor threads.",
+    default=4
+)
+
+ARG_PARSER.add_argument(
+    "--processes",
+    help="Use a process pool instead of threads for the async builder.",
+    action="store_true"
+)
+
+ARG_PARSER.add_argument(
+    "--party",
+    type=str,
+    help="Path to party JSON",
+    default=os.path.join(INPUT_DIR, "test_party.json")
+)
+
+ARG_PARSER.add_argument(
+    "--encounters",
+    type=str,
+    help="Paths to encounter JSON files",
+    nargs="*",
+    default=[os.path.join(INPUT_DIR, "test_monsters.json")]
+)
+
+ARG_PARSER.add_argument(
+    "--day-size",
+    type=int,
+    help="Score a day of this many generated encounters instead of the encounter files.",
+    default=0
+)
+
+TICK = 0.001
+"""
+Interval of the latency probe in seconds
+"""
+
+
+async def probe(lags, stop):
+    """Record how late the event loop wakes up from short sleeps"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - start - TICK)
+
+
+def long_day(party_json, day_size):
+    """Adventuring day of generated encounters with challenge ratings 1 to 10"""
+    party = ebuilder.Party.from_json(party_json)
+    adventuring_day = ebuilder.AdventuringDay(party)
+    for index in range(day_size):
+        adventuring_day.add(ebuilder.Encounter(
+            party, ebuilder.MonsterParty.from_cr([index % 10 + 1] * 3)
+        ))
+    return adventuring_day
+
+
+async def blocking_request(index, party_json, encounters):
+    """Request served with the blocking API on the event loop"""
+    if index % 10 == 0:
+        ebuilder.Randomizer().get_compendium("monster")
+    party = ebuilder.Party.from_json(party_json)
+    adventuring_day = ebuilder.AdventuringDay(party)
+    for encounter in encounters:
+        adventuring_day.add(
+            ebuilder.Encounter(party, ebuilder.MonsterParty.from_json(encounter))
+        )
+    return adventuring_day.to_dict()
+
+
+async def async_request(builder, index, party_json, encounters):
+    """Request served through the async builder"""
+    if index % 10 == 0:
+        await builder.get_compendium("monster")
+    return await builder.main(party_json, encounters)
+
+
+async def scenario(request, num_requests, concurrency):
+    """
+    Run requests from concurrent clients while probing the event loop
+
+    Returns
+    -------
+    lags : numpy.ndarray
+        Event loop lag of each probe in seconds
+    elapsed : float
+        Total time in seconds
+    """
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    queue = iter(range(num_requests))
+
+    async def client():
+        for index in queue:
+            await request(index)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    return np.array(lags), elapsed
+
+
+def summarize(name, lags, elapsed):
+    """Print the latency percentiles of a scenario"""
+    if len(lags) == 0:
+        lags = np.array([elapsed])
+    p50, p99 = np.percentile(lags, [50, 99]) * 1e3
+    print(
+        f"{name:<10} elapsed {elapsed:8.3f} s   lag p50 {p50:8.3f} ms   "
+        f"p99 {p99:8.3f} ms   max {lags.max() * 1e3:8.3f} ms   probes {len(lags)}"
+    )
+
+
+async def run(args):
+    """Run the idle, async, and blocking scenarios"""
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(0.5)
+    stop.set()
+    await probe_task
+    summarize("idle", np.array(lags), 0.5)
+
+    executor = None
+    if args.processes:
+        executor = ProcessPoolExecutor(max_workers=args.workers)
+    if args.day_size:
+        adventuring_day = long_day(args.party, args.day_size)
+
+        async def blocking(index):
+            return adventuring_day.to_dict()
+
+        def asynchronous(builder):
+            return lambda index: builder.score(adventuring_day)
+    else:
+        def blocking(index):
+            return blocking_request(index, args.party, args.encounters)
+
+        def asynchronous(builder):
+            return lambda index: async_request(
+                builder, index, args.party, args.encounters
+            )
+
+    async with ebuilder.aio.AsyncBuilder(executor, max_workers=args.workers) as builder:
+        summarize("async", *await scenario(
+            asynchronous(builder), args.requests, args.concurrency
+        ))
+    if executor is not None:
+        executor.shutdown()
+
+    summarize("blocking", *await scenario(
+        blocking, args.requests, args.concurrency
+    ))
+
+
+if __name__ == "__main__":
+    asyncio.run(run(ARG_PARSER.parse_args()))
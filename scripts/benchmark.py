@@ -0,0 +1,360 @@
+"""
+
+============
+benchmark.py
+============
+
+Benchmark the main paths of the encounter builder
+
+Results are written as JSON and can be compared between two runs:
+
+    python scripts/benchmark.py --output before.json
+    python scripts/benchmark.py --output after.json --compare before.json
+    python scripts/benchmark.py --compare before.json after.json
+
+The create_csv benchmarks build the compendium CSVs from copies of the XML files in a
+temporary directory, so the compendiums in the data directory are not rewritten.
+
+"""
+
+import os
+import sys
+
+import json
+
+import time
+
+import shutil
+
+import platform
+
+import tempfile
+
+import subprocess
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import ebuilder
+import ebuilder.workload
+
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+CATEGORIES = ["background", "class", "feat", "item", "monster", "race", "spell"]
+
+CLASSES = ["BARBARIAN", "CLERIC", "FIGHTER", "PALADIN", "ROGUE", "WIZARD"]
+
+
+ARG_PARSER = argparse.ArgumentParser(
+    description="Benchmark the encounter builder"
+)
+
+ARG_PARSER.add_argument(
+    "--scales",
+    "-s",
+    type=int,
+    help="Workload scales.",
+    nargs="*",
+    default=[1, 10, 100]
+)
+
+ARG_PARSER.add_argument(
+    "--repeat",
+    "-r",
+    type=int,
+    help="Number of timed runs of each benchmark.",
+    default=5
+)
+
+ARG_PARSER.add_argument(
+    "--benchmarks",
+    "-b",
+    type=str,
+    help="Only run benchmarks whose names contain one of these strings.",
+    nargs="*",
+    default=None
+)
+
+ARG_PARSER.add_argument(
+    "--output",
+    "-o",
+    type=str,
+    help="Path to write the JSON results.",
+    default=None
+)
+
+ARG_PARSER.add_argument(
+    "--compare",
+    "-c",
+    type=str,
+    help=(
+        "Baseline JSON results to compare against. With two files, compare them "
+        "without running the benchmarks."
+    ),
+    nargs="*",
+    default=None
+)
+
+
+def synthetic_monsters(num_groups, rng):
+    """Synthetic monster party"""
+    monster_party = ebuilder.MonsterParty()
+    for record in ebuilder.workload.encounter_records(num_groups, rng):
+        monster_party.add(
+            ebuilder.Monster(
+                record["NAME"],
+                record["CR"],
+                record.get("BYPASS_RESISTANCE", False),
+                record.get("OHKO", False)
+            ),
+            record["QUANTITY"]
+        )
+    return monster_party
+
+
+def default_party():
+    """Level 8 party of four"""
+    party = ebuilder.Party()
+    for index in range(4):
+        party.add(ebuilder.PlayerCharacter(
+            f"PC{index + 1}", {CLASSES[index]: 8}, {"WEAPON": 1}, {}
+        ))
+    return party
+
+
+def bench_import(scale, rng, work_dir):
+    """Cold import of ebuilder in a new interpreter"""
+    def run():
+        subprocess.run(
+            [sys.executable, "-c", "import ebuilder"], cwd=ROOT_DIR, check=True
+        )
+    return run
+
+
+def bench_party_from_json(scale, rng, work_dir):
+    """Party.from_json with 4 * scale characters"""
+    json_file = os.path.join(work_dir, f"party_{scale}.json")
+    ebuilder.workload.write_party_json(json_file, 4 * scale, int(rng.integers(2 ** 31)))
+    return lambda: ebuilder.Party.from_json(json_file)
+
+
+def bench_difficulty(method):
+    """Encounter.difficulty of scale encounters of 4 monster groups"""
+    def setup(scale, rng, work_dir):
+        party = default_party()
+        encounters = [
+            ebuilder.Encounter(party, synthetic_monsters(4, rng), method=method)
+            for _ in range(scale)
+        ]
+        return lambda: [encounter.difficulty() for encounter in encounters]
+    return setup
+
+
+def bench_fatigue(scale, rng, work_dir):
+    """AdventuringDay.fatigue of a day with 10 * scale encounters"""
+    party = default_party()
+    adventuring_day = ebuilder.AdventuringDay(party)
+    for _ in range(10 * scale):
+        adventuring_day.add(ebuilder.Encounter(party, synthetic_monsters(3, rng)))
+    return adventuring_day.fatigue
+
+
+def bench_create_csv(category):
+    """Randomizer.create_csv from copies of the XML files (parsed once per run)"""
+    def setup(scale, rng, work_dir):
+        data_dir = os.path.join(work_dir, "data")
+        if not os.path.isdir(data_dir):
+            os.makedirs(data_dir)
+            for compendium_file in ebuilder.randomizer.compendium_files():
+                shutil.copy(compendium_file, data_dir)
+        return lambda: ebuilder.Randomizer(data_dir=data_dir).create_csv(category)
+    return setup
+
+
+def bench_get_compendium(category):
+    """Randomizer.get_compendium from the CSV"""
+    def setup(scale, rng, work_dir):
+        return lambda: ebuilder.Randomizer().get_compendium(category)
+    return setup
+
+
+def bench_random_item(category):
+    """Randomizer.random_item of scale items"""
+    def setup(scale, rng, work_dir):
+        randomizer = ebuilder.Randomizer()
+        size = len(randomizer.get_compendium(category))
+        return lambda: randomizer.random_item(category, num=min(scale, size))
+    return setup
+
+
+def bench_random_item_filtered(scale, rng, work_dir):
+    """Randomizer.random_item of one item filtered by rarity and type, scale times"""
+    randomizer = ebuilder.Randomizer()
+    items = randomizer.get_compendium("item")
+    rarities = list(items["rarity"].dropna().unique()[:2])
+    types = [
+        ebuilder.randomizer.TYPE_MAP[item_type]
+        for item_type in items["type"].dropna().unique()[:3]
+    ]
+    return lambda: [
+        randomizer.random_item("item", rarity=rarities, type=types) for _ in range(scale)
+    ]
+
+
+def compendium_bytes():
+    """Memory of each loaded compendium in bytes"""
+    randomizer = ebuilder.Randomizer()
+    sizes = {}
+    for category in CATEGORIES:
+        if os.path.isfile(randomizer.csv_filename(category)):
+            df = randomizer.get_compendium(category)
+            sizes[category] = int(df.memory_usage(deep=True).sum())
+    return sizes
+
+
+def bench_monster_from_name(scale, rng, work_dir):
+    """Monster.from_name of scale monsters"""
+    names = rng.choice(ebuilder.monsters.MONSTERS.index.to_numpy(), size=scale)
+    return lambda: [ebuilder.Monster.from_name(name) for name in names]
+
+
+def bench_sorlock(scale, rng, work_dir):
+    """sorlock_table_level for every level"""
+    return lambda: [
+        ebuilder.sorlock_table_level(ebuilder.SorlockState.from_level(level))
+        for level in ebuilder.sorlock.CLASS_LEVELS
+    ]
+
+
+BENCHMARKS = {
+    "import": (bench_import, False),
+    "party_from_json": (bench_party_from_json, True),
+    "difficulty_cr2": (bench_difficulty("cr2"), True),
+    "difficulty_2024": (bench_difficulty("2024"), True),
+    "fatigue": (bench_fatigue, True),
+    "monster_from_name": (bench_monster_from_name, True),
+    "random_item_filtered": (bench_random_item_filtered, True),
+    "sorlock_table_level": (bench_sorlock, False),
+}
+for _category in CATEGORIES:
+    BENCHMARKS[f"create_csv_{_category}"] = (bench_create_csv(_category), False)
+    BENCHMARKS[f"get_compendium_{_category}"] = (bench_get_compendium(_category), False)
+    BENCHMARKS[f"random_item_{_category}"] = (bench_random_item(_category), True)
+"""
+Benchmark setups by name and whether they depend on the workload scale
+"""
+
+
+def run_benchmarks(scales, repeat, names=None):
+    """
+    Run the benchmarks
+
+    Parameters
+    ----------
+    scales : list of int
+        Workload scales
+    repeat : int
+        Number of timed runs of each benchmark
+    names : list of str, optional
+        Only run benchmarks whose names contain one of these strings
+
+    Returns
+    -------
+    results : dict
+        Metadata and one entry per benchmark and scale with timing statistics in
+        seconds
+    """
+    results = {
+        "metadata": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "data_version": ebuilder.cache.DATA_VERSION,
+            "compendium_bytes": compendium_bytes(),
+        },
+        "benchmarks": [],
+    }
+    # Files written by the benchmarks are removed after the run
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, (setup, scaled) in BENCHMARKS.items():
+            if names and not any([pattern in name for pattern in names]):
+                continue
+            for scale in (scales if scaled else [1]):
+                rng = np.random.default_rng(scale)
+                try:
+                    run = setup(scale, rng, work_dir)
+                    run()
+                    times = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        run()
+                        times.append(time.perf_counter() - start)
+                except (OSError, KeyError, RuntimeError, ValueError) as error:
+                    print(f"{name} (scale {scale}) failed: {error}", file=sys.stderr)
+                    continue
+
+                results["benchmarks"].append({
+                    "name": name,
+                    "scale": scale,
+                    "repeat": repeat,
+                    "min": min(times),
+                    "median": float(np.median(times)),
+                    "mean": float(np.mean(times)),
+                })
+                print(f"{name:<28} scale {scale:>5}: {np.median(times) * 1e3:12.3f} ms")
+    return results
+
+
+def compare_results(baseline, results):
+    """
+    Compare the median times of two benchmark runs
+
+    Parameters
+    ----------
+    baseline : dict
+        Results from run_benchmarks
+    results : dict
+        Results from run_benchmarks
+
+    Returns
+    -------
+    comparison : pandas.DataFrame
+        Median times of both runs and their ratio for the benchmarks in both
+    """
+    columns = ["name", "scale", "median"]
+    comparison = pd.merge(
+        pd.DataFrame(baseline["benchmarks"])[columns],
+        pd.DataFrame(results["benchmarks"])[columns],
+        on=["name", "scale"],
+        suffixes=("_baseline", "_new"),
+    )
+    comparison["ratio"] = comparison["median_new"] / comparison["median_baseline"]
+    return comparison
+
+
+if __name__ == "__main__":
+    ARGS = ARG_PARSER.parse_args()
+    COMPARE = ARGS.compare or []
+    if len(COMPARE) > 2:
+        raise ValueError("At most two result files can be compared.")
+
+    if len(COMPARE) == 2:
+        with open(COMPARE[1], "r") as results_file:
+            RESULTS = json.load(results_file)
+    else:
+        RESULTS = run_benchmarks(ARGS.scales, ARGS.repeat, ARGS.benchmarks)
+
+    if ARGS.output is not None:
+        with open(ARGS.output, "w") as results_file:
+            json.dump(RESULTS, results_file, indent=4)
+
+    if COMPARE:
+        with open(COMPARE[0], "r") as baseline_file:
+            BASELINE = json.load(baseline_file)
+        print(compare_results(BASELINE, RESULTS).to_string(index=False))
@@ -0,0 +1,93 @@
+"""
+
+==================
+difficulty_grid.py
+==================
+
+Print a difficulty cheat sheet for a party
+
+"""
+
+import os
+import sys
+
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import ebuilder
+
+
+ARG_PARSER = argparse.ArgumentParser(
+    description="Build a grid of encounter difficulties by CR and number of monsters"
+)
+
+ARG_PARSER.add_argument(
+    "--party",
+    type=str,
+    help="Path to party JSON",
+    default=os.path.join(os.path.join(
+        os.path.dirname(__file__),
+        os.pardir,
+        "defaults",
+        "party.json"
+    ))
+)
+
+ARG_PARSER.add_argument(
+    "--max_count",
+    "-n",
+    type=int,
+    help="Maximum number of monsters.",
+    default=20
+)
+
+ARG_PARSER.add_argument(
+    "--mixed",
+    "-m",
+    type=str,
+    help="Two monster names or CRs to mix instead of the CR grid.",
+    nargs=2,
+    default=None
+)
+
+ARG_PARSER.add_argument(
+    "--format",
+    "-f",
+    help="Output format.",
+    choices=["markdown", "csv", "json"],
+    default="markdown"
+)
+
+ARG_PARSER.add_argument(
+    "--output",
+    type=str,
+    help="Output file. Printed when not provided.",
+    default=None
+)
+
+
+def get_monster(name):
+    """Get a monster from a name or a CR"""
+    try:
+        return ebuilder.Monster.from_cr(ebuilder.cr_str_to_num(name))
+    except ValueError:
+        return ebuilder.Monster.from_name(name)
+
+
+if __name__ == "__main__":
+    ARGS = ARG_PARSER.parse_args()
+    PARTY = ebuilder.Party.from_json(ARGS.party)
+    if ARGS.mixed is None:
+        GRID = ebuilder.DifficultyGrid.by_cr(PARTY, counts=range(1, ARGS.max_count + 1))
+    else:
+        GRID = ebuilder.DifficultyGrid.mixed(
+            PARTY,
+            get_monster(ARGS.mixed[0]),
+            get_monster(ARGS.mixed[1]),
+            range(ARGS.max_count + 1),
+            range(ARGS.max_count + 1),
+        )
+
+    OUTPUT = getattr(GRID, f"to_{ARGS.format}")(ARGS.output)
+    if OUTPUT is not None:
+        print(OUTPUT)
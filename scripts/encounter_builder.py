@@ -11,14 +11,20 @@ Main script for encounter builder
 import os
 import sys
 
+import json
+
 import argparse
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+# Enable the stats before importing to also time the data loaded on import
+if any(arg == "--profile" or arg.startswith("--profile=") for arg in sys.argv):
+    os.environ["EBUILDER_STATS"] = "1"
 import ebuilder
 
 
 ARG_PARSER = argparse.ArgumentParser(
-    description="Build encounters using CR2.0"
+    description="Build encounters using CR2.0",
+    allow_abbrev=False
 )
 
 ARG_PARSER.add_argument(
@@ -64,15 +70,92 @@ ARG_PARSER.add_argument(
     default="2024"
 )
 
+ARG_PARSER.add_argument(
+    "--cache",
+    type=str,
+    help="Path to a result cache. Results are printed as JSON when provided.",
+    default=None
+)
+
+ARG_PARSER.add_argument(
+    "--batch",
+    type=str,
+    help=(
+        "Path to a JSONL file of jobs ('-' for stdin) to score in batch mode. "
+        "One JSON result is printed per line. See ebuilder.batch for the job format."
+    ),
+    default=None
+)
+
+ARG_PARSER.add_argument(
+    "--jobs",
+    "-j",
+    type=int,
+    help="Number of worker processes for batch mode.",
+    default=1
+)
+
+ARG_PARSER.add_argument(
+    "--unordered",
+    help="Print batch results as they complete instead of in input order.",
+    action="store_true"
+)
+
+ARG_PARSER.add_argument(
+    "--profile",
+    type=str,
+    help=(
+        "Print a per-stage timing breakdown and cProfile summary. When a file is "
+        "provided, the cProfile stats are also dumped to it for pstats."
+    ),
+    nargs="?",
+    const="",
+    default=None,
+    metavar="PSTATS_FILE"
+)
+
+
+def run_batch(batch, jobs, ordered):
+    """Print the results of a batch of jobs as JSON lines"""
+    batch_file = sys.stdin if batch == "-" else open(batch, "r")
+    try:
+        for result in ebuilder.run_batch(batch_file, jobs=jobs, ordered=ordered):
+            sys.stdout.write(json.dumps(result) + "\n")
+    finally:
+        if batch_file is not sys.stdin:
+            batch_file.close()
+
 
 if __name__ == "__main__":
     ARGS = ARG_PARSER.parse_args()
+    if ARGS.batch is not None:
+        if ARGS.profile is None:
+            run_batch(ARGS.batch, ARGS.jobs, not ARGS.unordered)
+        else:
+            _, REPORT = ebuilder.instrument.profile(
+                run_batch,
+                ARGS.batch,
+                ARGS.jobs,
+                not ARGS.unordered,
+                pstats_file=ARGS.profile or None
+            )
+            print(REPORT, file=sys.stderr)
+        sys.exit(0)
+
     if not ARGS.encounters:
         raise ValueError("At least one encounter required.")
-    ebuilder.main(
+    MAIN_ARGS = (
         ARGS.party,
         ARGS.encounters,
         ARGS.charge_consumables,
         ARGS.onetime_consumables,
-        ARGS.difficulty_method
+        ARGS.difficulty_method,
+        ARGS.cache
     )
+    if ARGS.profile is None:
+        ebuilder.main(*MAIN_ARGS)
+    else:
+        _, REPORT = ebuilder.instrument.profile(
+            ebuilder.main, *MAIN_ARGS, pstats_file=ARGS.profile or None
+        )
+        print(REPORT)
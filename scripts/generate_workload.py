@@ -0,0 +1,108 @@
+"""
+
+====================
+generate_workload.py
+====================
+
+Generate synthetic parties, encounters, and compendiums for load testing
+
+"""
+
+import os
+import sys
+
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import ebuilder.workload
+
+
+ARG_PARSER = argparse.ArgumentParser(
+    description="Generate synthetic workloads for the encounter builder"
+)
+
+ARG_PARSER.add_argument(
+    "output_dir",
+    type=str,
+    help="Directory to write the files to"
+)
+
+ARG_PARSER.add_argument(
+    "--parties",
+    type=int,
+    help="Number of party JSON files.",
+    default=1
+)
+
+ARG_PARSER.add_argument(
+    "--pcs",
+    type=int,
+    help="Number of characters per party.",
+    default=4
+)
+
+ARG_PARSER.add_argument(
+    "--encounters",
+    type=int,
+    help="Number of encounter JSON files.",
+    default=1
+)
+
+ARG_PARSER.add_argument(
+    "--groups",
+    type=int,
+    help="Number of monster groups per encounter.",
+    default=3
+)
+
+ARG_PARSER.add_argument(
+    "--level",
+    type=int,
+    help="Party level (also centers the encounter CRs). Random when not provided.",
+    default=None
+)
+
+ARG_PARSER.add_argument(
+    "--compendium",
+    type=int,
+    help="Number of compendium entries per category. No compendium when 0.",
+    default=0
+)
+
+ARG_PARSER.add_argument(
+    "--seed",
+    type=int,
+    help="Random seed.",
+    default=None
+)
+
+
+def file_seed(seed, offset):
+    """Different seed for each generated file"""
+    return None if seed is None else seed + offset
+
+
+if __name__ == "__main__":
+    ARGS = ARG_PARSER.parse_args()
+    os.makedirs(ARGS.output_dir, exist_ok=True)
+
+    for index in range(ARGS.parties):
+        ebuilder.workload.write_party_json(
+            os.path.join(ARGS.output_dir, f"party_{index}.json"),
+            ARGS.pcs,
+            file_seed(ARGS.seed, index),
+            ARGS.level
+        )
+    for index in range(ARGS.encounters):
+        ebuilder.workload.write_encounter_json(
+            os.path.join(ARGS.output_dir, f"encounter_{index}.json"),
+            ARGS.groups,
+            file_seed(ARGS.seed, ARGS.parties + index),
+            ARGS.level
+        )
+    if ARGS.compendium:
+        ebuilder.workload.write_compendium_xml(
+            os.path.join(ARGS.output_dir, "compendium.xml"),
+            ARGS.compendium,
+            file_seed(ARGS.seed, ARGS.parties + ARGS.encounters)
+        )
@@ -13,18 +13,19 @@ import sys
 
 import json
 
-import pandas as pd
-
-import textwrap
-
 import argparse
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+# Enable the stats before importing to also time the data loaded on import
+if any(arg == "--profile" or arg.startswith("--profile=") for arg in sys.argv):
+    os.environ["EBUILDER_STATS"] = "1"
 import ebuilder
+import ebuilder.render
 
 
 ARG_PARSER = argparse.ArgumentParser(
-    description="Generate random magic items"
+    description="Generate random magic items",
+    allow_abbrev=False
 )
 
 ARG_PARSER.add_argument(
@@ -89,11 +90,41 @@ ARG_PARSER.add_argument(
     nargs="*"
 )
 
+ARG_PARSER.add_argument(
+    "--library",
+    "-l",
+    type=str,
+    help="Sourcebooks to pick items from. Defaults to all sourcebooks.",
+    default=None,
+    nargs="*"
+)
+
 ARG_PARSER.add_argument(
     "--output_file",
     "-o",
     type=str,
-    help="Output file to save results.",
+    help="Output file to save results (.csv, .json/.jsonl, .md, or plain text).",
+)
+
+ARG_PARSER.add_argument(
+    "--format",
+    type=str,
+    choices=["text", "markdown", "jsonl", "csv"],
+    help="Format of the printed items.",
+    default="text"
+)
+
+ARG_PARSER.add_argument(
+    "--profile",
+    type=str,
+    help=(
+        "Print a per-stage timing breakdown and cProfile summary. When a file is "
+        "provided, the cProfile stats are also dumped to it for pstats."
+    ),
+    nargs="?",
+    const="",
+    default=None,
+    metavar="PSTATS_FILE"
 )
 
 class ParseKwargs(argparse.Action):
@@ -112,55 +143,58 @@ ARG_PARSER.add_argument(
 )
 
 
-def pretty_print(df):
+OUTPUT_FORMATS = {".csv": "csv", ".json": "jsonl", ".jsonl": "jsonl", ".md": "markdown"}
+"""
+Format of the output file by extension (plain text otherwise)
+"""
+
+
+def write_items(items, output_format="text", output_file=None):
     """
-    Pretty print out a dataframe
+    Write random items to the terminal (and a file) as they are generated
 
     Parameters
     ----------
-    df : pandas.DataFrame
+    items : iterable of dict
+        Items from ebuilder.Randomizer.iter_random_items
+    output_format : str, optional
+        Format of the terminal output (see ebuilder.render.RENDERERS)
+    output_file : str, optional
+        File to also write the items to, in the format of its extension
     """
+    renderers = [ebuilder.render.RENDERERS[output_format](width=150)]
+    output = None
+    if output_file:
+        output = open(output_file, "w", newline="")
+        file_format = OUTPUT_FORMATS.get(os.path.splitext(output_file)[1], "text")
+        renderers.append(ebuilder.render.RENDERERS[file_format](output, width=150))
+    try:
+        for item in items:
+            for renderer in renderers:
+                renderer.write(item)
+            # Show each item as soon as it is generated, even when piped
+            renderers[0].stream.flush()
+    finally:
+        if output is not None:
+            output.close()
 
-    for irow, row in df.iterrows():
-        print("\n")
-        print(row["name"])
-        print("_" * len(row["name"]))
-        for key, val in row.items():
-            if key in ["name", "text"]:
-                continue
-            print(f"{key:12s}: {val}")
-
-        text_key = "text"
-        if text_key in row.keys():
-            text = row["text"][2:-2]
-            text.replace("', '", ", \"")
-            text_vals = "\n              ".join(text.split(", \""))
-
-            prefix = f"{text_key:12s}: "
-            wrapper = textwrap.TextWrapper(
-                initial_indent=prefix,
-                width=150,
-                subsequent_indent=' '*len(prefix),
-                replace_whitespace=False
-            )
-            # print(f"{text_key:10s}:")
-            print(wrapper.fill(f"{text_vals}"))
 
 if __name__ == "__main__":
     args = ARG_PARSER.parse_args()
 
     kwargs = vars(args)
     filters = kwargs.pop("filters")
+    profile = kwargs.pop("profile")
+    output_format = kwargs.pop("format")
+    output_file = kwargs.pop("output_file")
     if filters is not None:
         for k, v in filters.items():
             kwargs[k] = v
-    results = ebuilder.Randomizer().random_item(
-        **kwargs
-    ).dropna(axis=1)
-    pretty_print(results)
-
-    if args.output_file:
-        if args.output_file.endswith(".csv"):
-            results.to_csv(args.output_file, index=False)
-        elif args.output_file.endswith(".json"):
-            results.to_json(args.output_file, orient="records", lines=True)
+    items = ebuilder.Randomizer().iter_random_items(**kwargs)
+    if profile is None:
+        write_items(items, output_format, output_file)
+    else:
+        _, report = ebuilder.instrument.profile(
+            write_items, items, output_format, output_file, pstats_file=profile or None
+        )
+        print(report)
@@ -0,0 +1,228 @@
+"""
+
+===================
+shared_benchmark.py
+===================
+
+Measure worker memory and load time with and without the shared compendium
+
+Exports the compendiums and the power cube (see ebuilder.shared), then starts pools of
+worker processes that each load every compendium either from the CSVs or by attaching
+to the export. The workers are measured while they are all alive, so the proportional
+set size (PSS) splits the shared pages between them.
+
+    python scripts/shared_benchmark.py --workers 4
+
+"""
+
+import os
+import sys
+
+import json
+
+import time
+
+import tempfile
+
+import argparse
+
+import multiprocessing
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import ebuilder
+import ebuilder.shared
+
+
+CATEGORIES = ["background", "class", "feat", "item", "monster", "race", "spell"]
+
+MEMORY_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Private_Clean": "uss",
+    "Private_Dirty": "uss",
+}
+"""
+Fields of /proc/self/smaps_rollup summed into the reported memory (in MB)
+"""
+
+
+ARG_PARSER = argparse.ArgumentParser(
+    description="Measure worker memory with and without the shared compendium"
+)
+
+ARG_PARSER.add_argument(
+    "--workers",
+    "-w",
+    type=int,
+    help="Number of worker processes.",
+    default=4
+)
+
+ARG_PARSER.add_argument(
+    "--repeat",
+    "-r",
+    type=int,
+    help="Number of timed attaches and loads of each compendium.",
+    default=5
+)
+
+ARG_PARSER.add_argument(
+    "--directory",
+    "-d",
+    type=str,
+    help="Directory for the export. Defaults to a temporary directory in /dev/shm.",
+    default=None
+)
+
+ARG_PARSER.add_argument(
+    "--output",
+    "-o",
+    type=str,
+    help="Path to write the JSON results.",
+    default=None
+)
+
+
+def memory():
+    """Resident, proportional, and private memory of this process in MB"""
+    usage = {"rss": 0.0, "pss": 0.0, "uss": 0.0}
+    with open("/proc/self/smaps_rollup", "r") as smaps:
+        for line in smaps:
+            field, _, value = line.partition(":")
+            if field in MEMORY_FIELDS:
+                usage[MEMORY_FIELDS[field]] += int(value.split()[0]) / 1024
+    return usage
+
+
+def categories():
+    """Categories with a compendium CSV"""
+    randomizer = ebuilder.Randomizer()
+    return [
+        category for category in CATEGORIES
+        if os.path.isfile(randomizer.csv_filename(category))
+    ]
+
+
+def worker(barrier, queue):
+    """Load and touch every compendium, then report the memory of the worker"""
+    start = time.perf_counter()
+    randomizer = ebuilder.Randomizer()
+    for category in categories():
+        df = randomizer.get_compendium(category)
+        # Read every column so its pages are resident
+        for column in df:
+            if df[column].dtype.kind in "biuf":
+                df[column].sum()
+            else:
+                df[column].str.len().sum()
+    int(ebuilder.pc.POWER_CUBE.sum())
+    load = time.perf_counter() - start
+
+    barrier.wait()
+    queue.put({"load": load, **memory()})
+    barrier.wait()
+
+
+def run_workers(num_workers, directory):
+    """
+    Start the workers and collect their measurements
+
+    Parameters
+    ----------
+    num_workers : int
+    directory : str or None
+        Export to attach to. None loads the compendiums from the CSVs
+
+    Returns
+    -------
+    summary : dict
+        Mean load time (s) and memory (MB) per worker
+    """
+    # Workers inherit the environment of the parent
+    ebuilder.shared.use_shared(directory)
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(num_workers)
+    queue = context.Queue()
+    workers = [
+        context.Process(target=worker, args=(barrier, queue)) for _ in range(num_workers)
+    ]
+    for process in workers:
+        process.start()
+    results = [queue.get() for _ in workers]
+    for process in workers:
+        process.join()
+    ebuilder.shared.use_shared(None)
+
+    return {key: float(np.mean([result[key] for result in results])) for key in results[0]}
+
+
+def time_loads(directory, repeat):
+    """
+    Median time to attach to each compendium and to load it from the CSV
+
+    Returns
+    -------
+    timings : dict
+        Attach and CSV load times in ms by name
+    """
+    names = [f"compendium_{category}" for category in categories()]
+    timings = {}
+    for name in names + ["power_cube"]:
+        attach = []
+        load = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if name == "power_cube":
+                ebuilder.shared.attach_array(name, directory)
+            else:
+                ebuilder.shared.attach_frame(name, directory)
+            attach.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            if name == "power_cube":
+                ebuilder.pc.build_power_cube()
+            else:
+                ebuilder.Randomizer().get_compendium(name.replace("compendium_", ""))
+            load.append(time.perf_counter() - start)
+        timings[name] = {
+            "attach": float(np.median(attach)) * 1e3,
+            "load": float(np.median(load)) * 1e3,
+        }
+        print(
+            f"{name:<24} attach {timings[name]['attach']:10.3f} ms   "
+            f"load {timings[name]['load']:10.3f} ms"
+        )
+    return timings
+
+
+if __name__ == "__main__":
+    ARGS = ARG_PARSER.parse_args()
+    DIRECTORY = ARGS.directory
+    if DIRECTORY is None:
+        DIRECTORY = tempfile.mkdtemp(
+            prefix="ebuilder_", dir="/dev/shm" if os.path.isdir("/dev/shm") else None
+        )
+
+    START = time.perf_counter()
+    ebuilder.shared.export_shared(DIRECTORY)
+    print(f"Exported to {DIRECTORY} in {(time.perf_counter() - START) * 1e3:.1f} ms")
+
+    RESULTS = {"directory": DIRECTORY, "timings": time_loads(DIRECTORY, ARGS.repeat)}
+    for MODE, MODE_DIRECTORY in [("private", None), ("shared", DIRECTORY)]:
+        RESULTS[MODE] = run_workers(ARGS.workers, MODE_DIRECTORY)
+        print(
+            f"{MODE:<8} per worker: load {RESULTS[MODE]['load'] * 1e3:8.1f} ms   "
+            f"RSS {RESULTS[MODE]['rss']:7.1f} MB   PSS {RESULTS[MODE]['pss']:7.1f} MB   "
+            f"USS {RESULTS[MODE]['uss']:7.1f} MB"
+        )
+    for KEY in ["rss", "pss", "uss"]:
+        print(
+            f"{KEY.upper()} reduction per worker: "
+            f"{RESULTS['private'][KEY] - RESULTS['shared'][KEY]:7.1f} MB"
+        )
+
+    if ARGS.output is not None:
+        with open(ARGS.output, "w") as results_file:
+            json.dump(RESULTS, results_file, indent=4)
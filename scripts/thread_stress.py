@@ -0,0 +1,225 @@
+"""
+
+================
+thread_stress.py
+================
+
+Stress the encounter builder from many threads sharing one process
+
+Every thread scores adventuring days against the shared data tables, compendium, and
+randomizer without locks. The results of each thread count are checked against a
+single-threaded run, and the throughput shows how scoring scales with threads. On a
+free-threaded build of CPython (e.g. python3.13t) the threads run in parallel.
+
+    python scripts/thread_stress.py --threads 1 2 4 8 --jobs 2000
+
+"""
+
+import os
+import sys
+
+import json
+
+import time
+
+import platform
+
+import sysconfig
+
+import argparse
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import ebuilder
+import ebuilder.batch
+import ebuilder.workload
+
+
+ARG_PARSER = argparse.ArgumentParser(
+    description="Score adventuring days from many threads and check the results"
+)
+
+ARG_PARSER.add_argument(
+    "--threads",
+    "-t",
+    type=int,
+    help="Thread counts to run.",
+    nargs="*",
+    default=[1, 2, 4, 8]
+)
+
+ARG_PARSER.add_argument(
+    "--jobs",
+    "-n",
+    type=int,
+    help="Number of adventuring days scored per thread count.",
+    default=1000
+)
+
+ARG_PARSER.add_argument(
+    "--seed",
+    type=int,
+    help="Seed of the synthetic adventuring days.",
+    default=0
+)
+
+ARG_PARSER.add_argument(
+    "--output",
+    "-o",
+    type=str,
+    help="Path to write the JSON results.",
+    default=None
+)
+
+NAMED_CHANCE = 0.2
+"""
+Chance of a job with monsters looked up by name in the compendium
+"""
+
+
+def free_threaded():
+    """
+    Check for a free-threaded build of CPython
+
+    Returns
+    -------
+    build : bool
+        Flag for a build that supports running without the GIL
+    gil_enabled : bool
+        Flag for the GIL being enabled at runtime
+    """
+    build = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    return build, gil_enabled
+
+
+def synthetic_jobs(num_jobs, seed):
+    """
+    Synthetic adventuring days in the batch job format (see ebuilder.batch)
+
+    Parameters
+    ----------
+    num_jobs : int
+    seed : int
+
+    Returns
+    -------
+    jobs : list of dict
+    """
+    rng = np.random.default_rng(seed)
+    names = ebuilder.monsters.MONSTERS.index.to_numpy()
+    jobs = []
+    for index in range(num_jobs):
+        level = int(rng.integers(1, 21))
+        encounters = []
+        for _ in range(int(rng.integers(1, 5))):
+            if rng.random() < NAMED_CHANCE:
+                encounters.append([str(name) for name in rng.choice(names, size=3)])
+            else:
+                encounters.append(list(ebuilder.workload.encounter_records(3, rng, level)))
+        jobs.append({
+            "id": index,
+            "party": list(ebuilder.workload.party_records(4, rng, level)),
+            "encounters": encounters,
+            "method": "cr2" if rng.random() < 0.8 else "2024",
+            "consumables": {"charge": ["UNCOMMON"]} if rng.random() < 0.2 else {},
+        })
+    return jobs
+
+
+def score_job(randomizer, job):
+    """Build and score one job and draw loot from the shared randomizer"""
+    results = ebuilder.batch.adventuring_day_from_job(job).to_dict()
+    randomizer.random_item("item", num=1)
+    return results
+
+
+def run_threads(jobs, num_threads, randomizer):
+    """
+    Score the jobs from a pool of threads
+
+    Returns
+    -------
+    results : list of dict
+        Results in job order
+    elapsed : float
+        Total time in seconds
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        results = list(executor.map(lambda job: score_job(randomizer, job), jobs))
+    return results, time.perf_counter() - start
+
+
+def stress(thread_counts, num_jobs, seed):
+    """
+    Run the stress test for each thread count
+
+    Parameters
+    ----------
+    thread_counts : list of int
+    num_jobs : int
+    seed : int
+
+    Returns
+    -------
+    results : dict
+        Metadata and the elapsed time, throughput, speedup, and number of results that
+        differ from the single-threaded run for each thread count
+    """
+    build, gil_enabled = free_threaded()
+    jobs = synthetic_jobs(num_jobs, seed)
+
+    # A randomizer shared by all threads, loaded lazily by the first caller
+    randomizer = ebuilder.Randomizer()
+    expected = [ebuilder.batch.adventuring_day_from_job(job).to_dict() for job in jobs]
+
+    results = {
+        "metadata": {
+            "python": platform.python_version(),
+            "free_threaded_build": build,
+            "gil_enabled": gil_enabled,
+            "cpus": os.cpu_count(),
+            "jobs": num_jobs,
+        },
+        "runs": [],
+    }
+    baseline = None
+    for num_threads in thread_counts:
+        scored, elapsed = run_threads(jobs, num_threads, randomizer)
+        mismatches = sum([result != truth for result, truth in zip(scored, expected)])
+        if baseline is None:
+            baseline = elapsed
+        results["runs"].append({
+            "threads": num_threads,
+            "elapsed": elapsed,
+            "jobs_per_second": num_jobs / elapsed,
+            "speedup": baseline / elapsed,
+            "mismatches": mismatches,
+        })
+        print(
+            f"threads {num_threads:>3}: {elapsed:8.3f} s  "
+            f"{num_jobs / elapsed:10.1f} jobs/s  speedup {baseline / elapsed:5.2f}  "
+            f"mismatches {mismatches}"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    ARGS = ARG_PARSER.parse_args()
+    BUILD, GIL_ENABLED = free_threaded()
+    print(
+        f"Python {platform.python_version()}, free-threaded build: {BUILD}, "
+        f"GIL enabled: {GIL_ENABLED}, CPUs: {os.cpu_count()}"
+    )
+    RESULTS = stress(ARGS.threads, ARGS.jobs, ARGS.seed)
+
+    if ARGS.output is not None:
+        with open(ARGS.output, "w") as results_file:
+            json.dump(RESULTS, results_file, indent=4)
+
+    if any([run["mismatches"] for run in RESULTS["runs"]]):
+        sys.exit("Threaded results differ from the single-threaded results.")
@@ -8,15 +8,27 @@ Tests for encounter builder
 
 """
 
+import io
+
+import time
+
+import asyncio
+
 import os
 
 import json
 
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+import pandas as pd
 
 import unittest
 
 from .context import ebuilder
+import ebuilder.aio
 
 
 class TestEBuilder(unittest.TestCase):
@@ -141,6 +153,68 @@ class TestEBuilder(unittest.TestCase):
         self.assertEqual(party.level(), (12 + 13 + 17) / 3)
         self.assertEqual(party.tier(), 3)
 
+    def test_batch_power(self):
+        """
+        Test computing the power of many player characters at once
+        """
+        party = ebuilder.Party.from_json(
+            os.path.join(self.input_dir, "test_party.json")
+        )
+        np.testing.assert_array_equal(
+            ebuilder.PlayerCharacter.powers(party.pcs),
+            [pc.power() for pc in party.pcs]
+        )
+
+        power = ebuilder.PlayerCharacter.batch_power(
+            [6, 7, 11], [2, 5, 6], [4, 1, 0], 10, [True, False, True],
+            [False, False, True], [False, True, False]
+        )
+        np.testing.assert_array_equal(power, [117, 165, 202])
+
+        # Auxiliary levels past the level point table
+        with self.assertRaises(ValueError):
+            ebuilder.PlayerCharacter.batch_power([5, 5], [0, 15], [0, 0], [0, 0])
+
+    def test_party_frame(self):
+        """
+        Test scoring many parties at once
+        """
+        json_file = os.path.join(self.input_dir, "test_party.json")
+        party = ebuilder.Party.from_json(json_file)
+        frame = ebuilder.PartyFrame.from_json([json_file, json_file])
+
+        self.assertEqual(len(frame), 2 * len(party))
+        np.testing.assert_array_equal(frame.party_power(), [party.power()] * 2)
+        np.testing.assert_array_equal(frame.party_level(), [party.level()] * 2)
+        np.testing.assert_array_equal(frame.party_tier(), [party.tier()] * 2)
+
+        # Levels split the same way as the PlayerCharacter
+        class_levels = np.zeros((3, len(ebuilder.party_frame.CLASS_NAMES)), dtype=int)
+        for row, levels in enumerate([
+            {"DRUID": 6, "CLERIC": 1, "PALADIN": 2, "FIGHTER": 3},
+            {"ROGUE": 7, "CLERIC": 1, "PALADIN": 2, "FIGHTER": 3},
+            {"RANGER": 11, "CLERIC": 1, "PALADIN": 2, "FIGHTER": 3},
+        ]):
+            for class_name, num_levels in levels.items():
+                class_levels[row, ebuilder.party_frame.CLASS_NAMES.index(class_name)] = (
+                    num_levels
+                )
+        primary, aux, junk = ebuilder.party_frame.extract_levels(class_levels)
+        np.testing.assert_array_equal(primary, [6, 7, 11])
+        np.testing.assert_array_equal(aux, [2, 5, 6])
+        np.testing.assert_array_equal(junk, [4, 1, 0])
+
+        # Round trip through Party
+        parties = ebuilder.PartyFrame.from_parties(frame.to_parties())
+        np.testing.assert_array_equal(parties.power(), frame.power())
+        encounter = ebuilder.Encounter(
+            frame.party(1), ebuilder.MonsterParty.from_cr([2, 2])
+        )
+        self.assertEqual(
+            encounter.difficulty(),
+            ebuilder.Encounter(party, ebuilder.MonsterParty.from_cr([2, 2])).difficulty()
+        )
+
     def test_monsters(self):
         """
         Test monster calculations
@@ -170,6 +244,43 @@ class TestEBuilder(unittest.TestCase):
             "Vampire", "Vampire [2024]"
         ])
 
+    def test_recalculate_cr(self):
+        """Test recalculating CRs from stat blocks"""
+        monsters = pd.DataFrame({
+            "cr": ["1/4", "2", "5", None],
+            "hp": ["7 (2d6)", "400 (32d12+192)", "140 (20d8+40)", "10 (3d6)"],
+            "ac": ["15 (leather armor)", "19 (natural armor)", "15", "12"],
+            "resist": [None, None, "fire", None],
+            "dpr_mean": [5.0, 10.0, 30.0, 5.0],
+            "to_hit": [4.0, 3.0, np.nan, 3.0],
+            "save_dc": [np.nan, np.nan, 15.0, np.nan],
+        })
+        crs = ebuilder.recalculate_cr(monsters)
+        print("")
+        print(crs)
+
+        self.assertEqual(crs.loc[0, "cr"], 0.25)
+        self.assertEqual(crs.loc[0, "cr_calc"], 0.25)
+        self.assertFalse(crs.loc[0, "mismatch"])
+
+        # Heavily armored bag of hit points with weak attacks
+        self.assertEqual(crs.loc[1, "defensive_cr"], 20)
+        self.assertEqual(crs.loc[1, "offensive_cr"], 1)
+        self.assertTrue(crs.loc[1, "mismatch"])
+
+        # Resistances raise the effective hit points
+        self.assertEqual(crs.loc[2, "defensive_cr"], 9)
+
+        # Missing listed CR is never flagged
+        self.assertFalse(crs.loc[3, "mismatch"])
+
+        # Recalculated CR feeds into the effective CR
+        name = ebuilder.monsters.MONSTERS.index[0]
+        monster = ebuilder.Monster.from_name(name, recalculate_cr=True)
+        self.assertEqual(
+            monster.cr_eff, ebuilder.monsters.calculated_cr().loc[name, "cr_calc"]
+        )
+
     def test_json(self):
         """Test creating encounters from JSON file"""
 
@@ -207,6 +318,286 @@ class TestEBuilder(unittest.TestCase):
 
         adventuring_day.fatigue()
 
+    def test_next_threshold(self):
+        """Test marginal contributions and next threshold analysis"""
+        party = ebuilder.Party.from_json(
+            os.path.join(self.input_dir, "test_party.json")
+        )
+        monster_party = ebuilder.MonsterParty.from_json(
+            os.path.join(self.input_dir, "test_monsters.json")
+        )
+        encounter = ebuilder.Encounter(party, monster_party)
+
+        contributions = encounter.marginal_contributions()
+        print(contributions)
+        self.assertAlmostEqual(contributions["power_share"].sum(), 1)
+        self.assertAlmostEqual(
+            contributions["ratio_contribution"].sum(),
+            monster_party.power(party.tier()) / party.power()
+        )
+
+        # Adding the suggested number of monsters reaches (at least) the next category
+        for method in ["cr2", "2024"]:
+            thresholds = encounter.next_threshold(method)
+            print(thresholds)
+            categories = list(ebuilder.encounter.ENCOUNTER["category"])
+            if method == "2024":
+                categories = ebuilder.encounter.DIFFICULTY_LABELS_2024
+            current = categories.index(encounter.difficulty(method)[0])
+            for row, (monster, quantity) in enumerate(monster_party.monsters):
+                extra = int(thresholds.loc[row, "extra_quantity"])
+                changed = ebuilder.MonsterParty()
+                for other, other_quantity in monster_party.monsters:
+                    changed.add(other, other_quantity + extra * (other is monster))
+                difficulty = ebuilder.Encounter(party, changed).difficulty(method)
+                self.assertGreaterEqual(
+                    categories.index(difficulty[0]),
+                    categories.index(thresholds.loc[row, "next_category"])
+                )
+
+                # One fewer monster is not enough
+                changed = ebuilder.MonsterParty()
+                for other, other_quantity in monster_party.monsters:
+                    changed.add(other, other_quantity + (extra - 1) * (other is monster))
+                difficulty = ebuilder.Encounter(party, changed).difficulty(method)
+                self.assertEqual(categories.index(difficulty[0]), current)
+
+        # Encounters below the 'low' threshold are labeled 'low' and need 'moderate'
+        weak = ebuilder.Encounter(party, ebuilder.MonsterParty.from_cr([0]), "2024")
+        self.assertEqual(weak.difficulty()[0], "low")
+        thresholds = weak.next_threshold()
+        self.assertEqual(thresholds.loc[0, "next_category"], "moderate")
+        self.assertGreater(thresholds.loc[0, "extra_quantity"], 0)
+
+    def test_difficulty_grid(self):
+        """Test difficulty grids against scoring each encounter"""
+        party = ebuilder.Party.from_json(
+            os.path.join(self.input_dir, "test_party.json")
+        )
+        grid = ebuilder.DifficultyGrid.by_cr(party)
+        print(grid.to_markdown())
+        self.assertEqual(grid.frame().shape, (len(ebuilder.monsters.MONSTER_POWER), 20))
+        for cr, count in [(0.25, 7), (2, 3), (5, 1), (10, 4), (30, 20)]:
+            encounter = ebuilder.Encounter(
+                party, ebuilder.MonsterParty.from_cr([cr] * count)
+            )
+            cr_str = ebuilder.cr_num_to_str(cr)
+            category, _, cost = encounter.difficulty("cr2")
+            self.assertEqual(grid.frame("cr2_category").loc[cr_str, count], category)
+            self.assertAlmostEqual(grid.frame("cr2_cost").loc[cr_str, count], cost)
+            category, _, nx_high = encounter.difficulty("2024")
+            self.assertEqual(grid.frame("category_2024").loc[cr_str, count], category)
+            self.assertAlmostEqual(grid.frame("nx_high").loc[cr_str, count], nx_high)
+
+        dragon = ebuilder.Monster("YOUNG_GREEN_DRAGON", 8)
+        drake = ebuilder.Monster("GUARD_DRAKE", 2)
+        mixed = ebuilder.DifficultyGrid.mixed(party, dragon, drake)
+        monster_party = ebuilder.MonsterParty()
+        monster_party.add(dragon, 1)
+        monster_party.add(drake, 3)
+        self.assertEqual(
+            mixed.frame().loc[1, 3],
+            ebuilder.Encounter(party, monster_party).difficulty("cr2")[0]
+        )
+
+        # The vectorized lookups match the scalar lookups at the table boundaries
+        multipliers = ebuilder.encounter.ENCOUNTER["multiplier"].to_numpy()
+        thresholds = ebuilder.encounter.thresholds_2024(party.level(), len(party))
+        ratios = np.concatenate([[-1], multipliers, multipliers + 0.01, [100]])
+        xps = np.concatenate([[0], thresholds - 1, thresholds, [10 ** 7]])
+        scores = ebuilder.grid.score_grid(
+            ratios * party.power(), np.resize(xps, len(ratios)), party.power(), thresholds
+        )
+        for ratio, xp, category, cost, category_2024 in zip(
+            scores["power_ratio"], scores["xp"], scores["cr2_category"],
+            scores["cr2_cost"], scores["category_2024"],
+        ):
+            expected = ebuilder.encounter.difficulty_cr2_from_ratio(ratio)
+            self.assertEqual(category, expected[0])
+            self.assertAlmostEqual(cost, expected[2])
+            self.assertEqual(
+                category_2024, ebuilder.encounter.difficulty_2024_from_xp(xp, thresholds)[0]
+            )
+
+        # Exports
+        frame = pd.read_csv(io.StringIO(mixed.to_csv()))
+        self.assertEqual(len(frame), 11 * 11)
+        results = json.loads(mixed.to_json())
+        self.assertEqual(results["cr2_category"][1][3], mixed.frame().loc[1, 3])
+
+    def test_campaign(self):
+        """Test campaign progression against scoring each day"""
+        party = ebuilder.Party.from_json(
+            os.path.join(self.input_dir, "test_party.json")
+        )
+        days = []
+        for crs in [[5, 5, 3], [8, 2], [1, 1, 1, 1]]:
+            adventuring_day = ebuilder.AdventuringDay(party)
+            for cr in crs:
+                adventuring_day.add(ebuilder.Encounter(
+                    party, ebuilder.MonsterParty.from_cr([cr] * 3)
+                ))
+            days.append(adventuring_day)
+        adventuring_day.add_consumable("RARE", "CHARGE")
+
+        plans = {"PC1": ebuilder.sorlock.CLASS_LEVELS}
+        simulator = ebuilder.CampaignSimulator(party, days, plans)
+        schedule = [0, 1, 2] * 4
+        results = simulator.run(schedule)
+        print(ebuilder.CampaignSimulator.summary(results))
+        self.assertEqual(results.level.shape, (1, len(schedule), len(party)))
+        self.assertTrue((np.diff(results.party_level[0]) >= 0).all())
+
+        # Matches building the party at each day
+        for day, (row, level) in enumerate(zip(schedule, results.level[0])):
+            day_party = ebuilder.Party()
+            for pc, pc_level in zip(party.pcs, level):
+                split = simulator.level_tables[len(day_party), pc_level]
+                day_party.add(ebuilder.PlayerCharacter(
+                    pc.name, split, pc.items, pc.advantages
+                ))
+            adventuring_day = ebuilder.AdventuringDay(day_party)
+            for encounter in days[row].encounters:
+                adventuring_day.add(ebuilder.Encounter(day_party, encounter.monster_party))
+            for rarity, consumable_category in days[row].consumable_items:
+                adventuring_day.add_consumable(rarity, consumable_category)
+
+            self.assertEqual(results.party_power[0, day], day_party.power())
+            self.assertEqual(results.tier[0, day], day_party.tier())
+            category, _, cost = adventuring_day.fatigue()
+            self.assertAlmostEqual(results.day_cost[0, day], cost)
+            self.assertEqual(
+                ebuilder.encounter.FATIGUE["category"].iat[results.fatigue[0, day]],
+                category
+            )
+
+        # Planned multiclass levels
+        self.assertEqual(
+            list(simulator.level_tables[0, 10]),
+            [5, 0, 5]
+        )
+
+        schedules = simulator.random_schedules(100, 30, np.random.default_rng(1))
+        results = simulator.run(schedules)
+        self.assertEqual(results.party_power.shape, (100, 30))
+
+        # Consumables save less at higher tiers
+        self.assertGreater(simulator.day_consumables[2, 0], simulator.day_consumables[2, 3])
+
+        # Days with other difficulty methods have no fatigue
+        mixed_day = ebuilder.AdventuringDay(party)
+        mixed_day.add(ebuilder.Encounter(party, ebuilder.MonsterParty.from_cr([5]), "2024"))
+        results = ebuilder.CampaignSimulator(party, [mixed_day]).run()
+        self.assertEqual(results.fatigue[0, 0], -1)
+        self.assertTrue(np.isnan(results.day_cost[0, 0]))
+        self.assertEqual(mixed_day.fatigue()[0], "N/A")
+        self.assertEqual(
+            ebuilder.CampaignSimulator.summary(results)["fatigue_mode"].iat[0], "N/A"
+        )
+
+        # Plans outside of the level point tables
+        with self.assertRaises(ValueError):
+            ebuilder.CampaignSimulator(
+                party, days, {"PC2": {20: {"ROGUE": 9, "FIGHTER": 6, "PALADIN": 5}}}
+            )
+
+    def test_stats(self):
+        """Test timers and counters of the instrumented stages"""
+        party = ebuilder.Party.from_json(
+            os.path.join(self.input_dir, "test_party.json")
+        )
+        monster_party = ebuilder.MonsterParty.from_json(
+            os.path.join(self.input_dir, "test_monsters.json")
+        )
+        encounter = ebuilder.Encounter(party, monster_party)
+
+        # Nothing is recorded while disabled
+        ebuilder.disable_stats()
+        ebuilder.reset_stats()
+        encounter.difficulty_cr2()
+        self.assertEqual(ebuilder.stats(), {"timers": {}, "counters": {}})
+
+        ebuilder.enable_stats()
+        try:
+            encounter.difficulty_cr2()
+            encounter.difficulty_cr2()
+            str(encounter)
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cache = ebuilder.ResultCache(os.path.join(cache_dir, "results.sqlite"))
+                adventuring_day = ebuilder.AdventuringDay(party)
+                adventuring_day.add(encounter)
+                cache.score(adventuring_day)
+                cache.score(adventuring_day)
+                cache.close()
+            snapshot = ebuilder.stats()
+            print(ebuilder.instrument.format_stats(snapshot))
+        finally:
+            ebuilder.disable_stats()
+            ebuilder.reset_stats()
+
+        # str and scoring on the cache miss (encounter and fatigue) call difficulty
+        self.assertEqual(snapshot["timers"]["encounter.difficulty_cr2"]["calls"], 5)
+        self.assertEqual(snapshot["timers"]["render.encounter"]["calls"], 1)
+        self.assertEqual(snapshot["counters"], {"cache.hits": 1, "cache.misses": 1})
+
+    def test_incremental(self):
+        """Test incremental re-scoring while editing encounters"""
+        party = ebuilder.Party.from_json(
+            os.path.join(self.input_dir, "test_party.json")
+        )
+        events = []
+        adventuring_day = ebuilder.IncrementalAdventuringDay(party)
+        adventuring_day.subscribe(events.append)
+
+        encounter = ebuilder.IncrementalEncounter(party)
+        adventuring_day.add(encounter)
+        dragon = encounter.add(ebuilder.Monster("YOUNG_GREEN_DRAGON", 8))
+        drakes = encounter.add(ebuilder.Monster("GUARD_DRAKE", 2), 2)
+        encounter.set_quantity(drakes, 4)
+
+        other = ebuilder.IncrementalEncounter(party)
+        other.add(ebuilder.Monster.from_cr(5), 3)
+        adventuring_day.add(other)
+        adventuring_day.add_consumable("RARE", "CHARGE")
+
+        # Matches scoring from scratch
+        expected = ebuilder.AdventuringDay(party)
+        expected.add(encounter.to_encounter())
+        expected.add(other.to_encounter())
+        expected.add_consumable("RARE", "CHARGE")
+        self.assertEqual(encounter.difficulty(), expected.encounters[0].difficulty())
+        self.assertEqual(adventuring_day.fatigue()[:2], expected.fatigue()[:2])
+        self.assertAlmostEqual(adventuring_day.fatigue()[2], expected.fatigue()[2])
+
+        self.assertEqual(
+            [event.action for event in events],
+            ["add_encounter", "add", "add", "quantity", "add_encounter", "consumable"]
+        )
+        self.assertEqual(events[-1].fatigue, adventuring_day.fatigue())
+
+        encounter.remove(dragon)
+        self.assertEqual(events[-1].action, "remove")
+        self.assertEqual(events[-1].difficulty, encounter.to_encounter().difficulty())
+
+        adventuring_day.remove(other)
+        self.assertEqual(len(adventuring_day.encounters), 1)
+
+        # An encounter is only counted once
+        total_cost = adventuring_day.total_cost
+        with self.assertRaises(ValueError):
+            adventuring_day.add(encounter)
+        self.assertEqual(adventuring_day.total_cost, total_cost)
+        self.assertEqual(len(adventuring_day.encounters), 1)
+
+        # The 2024 method has no fatigue
+        encounter_2024 = ebuilder.IncrementalEncounter(party, method="2024")
+        encounter_2024.add(ebuilder.Monster.from_cr(3), 2)
+        adventuring_day.add(encounter_2024)
+        self.assertEqual(
+            encounter_2024.difficulty(), encounter_2024.to_encounter().difficulty()
+        )
+        self.assertEqual(adventuring_day.fatigue()[0], "N/A")
+
     def test_main_json(self):
         """Test main function of encounter builder"""
         print("\n\n\n")
@@ -234,6 +625,282 @@ class TestEBuilder(unittest.TestCase):
             ["VERYRARE"]
         )
 
+    def test_batch(self):
+        """Test scoring a stream of JSON line jobs"""
+        party_json = os.path.join(self.input_dir, "test_party.json")
+        monsters_json = os.path.join(self.input_dir, "test_monsters.json")
+        with open(party_json, "r") as party_file:
+            party_list = json.load(party_file)
+
+        lines = []
+        for index in range(20):
+            lines.append(json.dumps({
+                "id": f"day{index}",
+                "party": party_json if index % 2 else party_list,
+                "encounters": [monsters_json, ["5", "1/2"], [
+                    {"NAME": "DRAKE", "CR": 2, "QUANTITY": index % 4 + 1}
+                ]],
+                "consumables": {"charge": ["RARE"], "onetime": ["UNCOMMON"]},
+                "method": "cr2",
+            }))
+        lines.insert(3, "")
+        lines.append("{not json")
+
+        results = list(ebuilder.run_batch(lines))
+        self.assertEqual(len(results), 21)
+        self.assertEqual(results[0]["id"], "day0")
+        self.assertEqual(results[3]["line"], 5)
+        self.assertIn("JSONDecodeError", results[-1]["error"])
+
+        # Matches scoring the day directly
+        party = ebuilder.Party.from_json(party_json)
+        adventuring_day = ebuilder.AdventuringDay(party)
+        adventuring_day.add(ebuilder.Encounter(
+            party, ebuilder.MonsterParty.from_json(monsters_json)
+        ))
+        adventuring_day.add(ebuilder.Encounter(party, ebuilder.MonsterParty.from_cr([5, 0.5])))
+        monster_party = ebuilder.MonsterParty()
+        monster_party.add(ebuilder.Monster("DRAKE", 2), 2)
+        adventuring_day.add(ebuilder.Encounter(party, monster_party))
+        adventuring_day.add_consumable("RARE", "CHARGE")
+        adventuring_day.add_consumable("UNCOMMON", "CONSUMABLE")
+        expected = adventuring_day.to_dict()
+        self.assertEqual(
+            {key: value for key, value in results[1].items() if key not in ["line", "id"]},
+            expected
+        )
+
+        # Worker pools keep the input order unless asked not to
+        parallel = list(ebuilder.run_batch(lines, jobs=2, chunk_size=4))
+        self.assertEqual(parallel, results)
+        unordered = list(ebuilder.run_batch(lines, jobs=2, ordered=False, chunk_size=4))
+        self.assertEqual(
+            sorted(unordered, key=lambda result: result["line"]), results
+        )
+
+    def test_threads(self):
+        """Test scoring from many threads against the shared frozen tables"""
+        # Shared tables cannot be modified in place
+        with self.assertRaises(ValueError):
+            ebuilder.encounter.ENCOUNTER.loc[0, "cost"] = 0
+        with self.assertRaises(ValueError):
+            ebuilder.encounter.ENCOUNTER.loc[0, "category"] = "x"
+        with self.assertRaises(ValueError):
+            ebuilder.monsters.MONSTERS.iat[0, 0] = "x"
+        # String columns are read-only however they are written to
+        compendium = ebuilder.Randomizer().get_compendium("item")
+        with self.assertRaises(ValueError):
+            compendium.loc[0, "name"] = "x"
+        with self.assertRaises(ValueError):
+            compendium.iloc[0, compendium.columns.get_loc("text")] = "x"
+        with self.assertRaises(ValueError):
+            compendium["name"].array[0] = "x"
+        with self.assertRaises(ValueError):
+            ebuilder.encounter.ENCOUNTER["description"].array[0] = "x"
+        with self.assertRaises(ValueError):
+            ebuilder.pc.POWER_CUBE[0, 0, 0, 0, 0] = 0
+        with self.assertRaises(TypeError):
+            ebuilder.pc.POWER[0] = 0
+        # Copies can be modified
+        encounter = ebuilder.encounter.ENCOUNTER.copy()
+        encounter.loc[0, "category"] = "x"
+        self.assertEqual(encounter.loc[0, "category"], "x")
+        self.assertNotEqual(ebuilder.encounter.ENCOUNTER.loc[0, "category"], "x")
+        names = compendium["name"].copy()
+        names.array[0] = "x"
+        self.assertEqual(names[0], "x")
+        self.assertNotEqual(compendium.loc[0, "name"], "x")
+
+        party = ebuilder.Party.from_json(
+            os.path.join(self.input_dir, "test_party.json")
+        )
+        names = list(ebuilder.monsters.MONSTERS.index[:8])
+
+        def score(index):
+            adventuring_day = ebuilder.AdventuringDay(party)
+            adventuring_day.add(ebuilder.Encounter(
+                party, ebuilder.MonsterParty.from_cr([index % 10 + 1] * 3)
+            ))
+            adventuring_day.add(ebuilder.Encounter(
+                party, ebuilder.MonsterParty.from_names(names[index % 8:]), "2024"
+            ))
+            return adventuring_day.to_dict()
+
+        expected = [score(index) for index in range(200)]
+        randomizer = ebuilder.Randomizer()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(score, range(200)))
+            compendiums = list(executor.map(
+                lambda _: randomizer.get_compendium("item"), range(16)
+            ))
+        self.assertEqual(results, expected)
+
+        # The compendium is loaded once, frozen, and shared
+        self.assertTrue(all([df is compendiums[0] for df in compendiums]))
+        self.assertIs(randomizer.get_compendium("item"), compendiums[0])
+
+    def test_shared(self):
+        """Test attaching to the compendium and tables exported for worker processes"""
+        with tempfile.TemporaryDirectory() as shared_dir:
+            manifest = ebuilder.shared.export_shared(shared_dir, ["monster", "item"])
+            self.assertEqual(
+                sorted(manifest["frames"]), ["compendium_item", "compendium_monster"]
+            )
+
+            np.testing.assert_array_equal(
+                ebuilder.shared.attach_array("power_cube", shared_dir),
+                ebuilder.pc.POWER_CUBE
+            )
+            self.assertIsNone(ebuilder.shared.attach_frame("compendium_spell", shared_dir))
+
+            ebuilder.shared.use_shared(shared_dir)
+            try:
+                attached = ebuilder.Randomizer().get_compendium("monster")
+            finally:
+                ebuilder.shared.use_shared(None)
+            loaded = ebuilder.Randomizer().get_compendium("monster")
+            print(attached.dtypes)
+            pd.testing.assert_frame_equal(attached, loaded, check_dtype=False)
+            self.assertEqual(list(attached.dtypes), list(loaded.dtypes))
+
+            # Read-only views of the memory-mapped file
+            with self.assertRaises(ValueError):
+                attached.loc[0, "dpr_mean"] = 0
+            del attached
+
+    def test_async_builder(self):
+        """Test the asyncio interface"""
+        party_json = os.path.join(self.input_dir, "test_party.json")
+        monsters_json = os.path.join(self.input_dir, "test_monsters.json")
+
+        class SlowRandomizer(ebuilder.Randomizer):
+            """Randomizer counting its (slow) compendium loads"""
+            loads = 0
+
+            def get_compendium(self, category):
+                SlowRandomizer.loads += 1
+                time.sleep(0.05)
+                return super().get_compendium(category)
+
+        async def run():
+            async with ebuilder.aio.AsyncBuilder(randomizer=SlowRandomizer()) as builder:
+                results = await builder.main(party_json, [monsters_json] * 2)
+
+                # Concurrent loads share one future, even when a caller is cancelled
+                first = asyncio.ensure_future(builder.get_compendium("monster"))
+                cancelled = asyncio.ensure_future(builder.get_compendium("monster"))
+                await asyncio.sleep(0)
+                cancelled.cancel()
+                compendiums = await asyncio.gather(
+                    first, builder.get_compendium("monster")
+                )
+                with self.assertRaises(asyncio.CancelledError):
+                    await cancelled
+                return results, compendiums
+
+        results, compendiums = asyncio.run(run())
+        self.assertEqual(SlowRandomizer.loads, 1)
+        self.assertIs(compendiums[0], compendiums[1])
+
+        party = ebuilder.Party.from_json(party_json)
+        adventuring_day = ebuilder.AdventuringDay(party)
+        for _ in range(2):
+            adventuring_day.add(ebuilder.Encounter(
+                party, ebuilder.MonsterParty.from_json(monsters_json)
+            ))
+        self.assertEqual(results, adventuring_day.to_dict())
+
+    def test_async_loop_lag(self):
+        """Test that the event loop keeps running while scoring"""
+        party = ebuilder.Party.from_json(
+            os.path.join(self.input_dir, "test_party.json")
+        )
+        adventuring_day = ebuilder.AdventuringDay(party)
+        for index in range(1500):
+            adventuring_day.add(ebuilder.Encounter(
+                party, ebuilder.MonsterParty.from_cr([index % 10 + 1] * 3)
+            ))
+        expected = adventuring_day.to_dict()
+
+        async def heartbeat(interval, lags, done):
+            loop = asyncio.get_running_loop()
+            while not done.is_set():
+                start = loop.time()
+                await asyncio.sleep(interval)
+                lags.append(loop.time() - start - interval)
+
+        async def run():
+            lags = []
+            done = asyncio.Event()
+            async with ebuilder.aio.AsyncBuilder(max_workers=2) as builder:
+                beat = asyncio.ensure_future(heartbeat(0.005, lags, done))
+                results = await asyncio.gather(*[
+                    builder.score(adventuring_day) for _ in range(4)
+                ])
+                done.set()
+                await beat
+            return results, lags
+
+        # Latency is measured by scripts/async_load_test.py --day-size
+        results, lags = asyncio.run(run())
+        self.assertEqual(results, [expected] * 4)
+        self.assertGreater(len(lags), 0)
+
+    def test_result_cache(self):
+        """Test caching adventuring day results"""
+        party = ebuilder.Party.from_json(
+            os.path.join(self.input_dir, "test_party.json")
+        )
+        monster_party = ebuilder.MonsterParty.from_json(
+            os.path.join(self.input_dir, "test_monsters.json")
+        )
+        adventuring_day = ebuilder.AdventuringDay(party)
+        adventuring_day.add(ebuilder.Encounter(party, monster_party))
+        adventuring_day.add_consumable("RARE", "CHARGE")
+
+        # Monster order and grouping do not change the key
+        regrouped = ebuilder.MonsterParty()
+        for monster, quantity in monster_party.monsters[::-1]:
+            for _ in range(quantity):
+                regrouped.add(monster)
+        same_day = ebuilder.AdventuringDay(party)
+        same_day.add(ebuilder.Encounter(party, regrouped))
+        same_day.add_consumable("RARE", "CHARGE")
+        self.assertEqual(
+            ebuilder.cache_key(adventuring_day), ebuilder.cache_key(same_day)
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = os.path.join(tmp_dir, "results.sqlite")
+            cache = ebuilder.ResultCache(cache_file, max_bytes=1000)
+            result = cache.score(adventuring_day)
+            self.assertEqual(len(cache), 1)
+            self.assertEqual(cache.get(ebuilder.cache_key(same_day)), result)
+            self.assertEqual(result["fatigue"][0], adventuring_day.fatigue()[0])
+
+            # Least recently used results are evicted past the size bound
+            for num in range(20):
+                cache.put(str(num), {"padding": "x" * 100})
+            self.assertLessEqual(cache.size(), 1000)
+            self.assertIsNone(cache.get(ebuilder.cache_key(adventuring_day)))
+            cache.close()
+
+            # Main returns the structured results from the cache
+            results = ebuilder.main(
+                os.path.join(self.input_dir, "test_party.json"),
+                [os.path.join(self.input_dir, "test_monsters.json")] * 2,
+                cache_file=cache_file
+            )
+            self.assertEqual(len(results["encounters"]), 2)
+            self.assertEqual(
+                results,
+                ebuilder.main(
+                    os.path.join(self.input_dir, "test_party.json"),
+                    [os.path.join(self.input_dir, "test_monsters.json")] * 2,
+                    cache_file=cache_file
+                )
+            )
+
     def test_encounter_2024(self):
         """
         Test 2024 encounter building rules
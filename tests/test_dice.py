@@ -0,0 +1,82 @@
+"""
+
+============
+test_dice.py
+============
+
+Tests for dice expressions and the damage per round index
+
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from .context import ebuilder
+
+
+class TestDice(unittest.TestCase):
+    """
+    Tests for dice tools
+    """
+
+    def test_dice_expression(self):
+        """Test parsing dice expressions"""
+        dice = ebuilder.DiceExpression("2d6+3")
+        self.assertEqual(dice.mean(), 10)
+        self.assertAlmostEqual(dice.variance(), 35 / 6)
+
+        dice = ebuilder.DiceExpression("1d8 + 2d6 - 1")
+        self.assertEqual(dice.mean(), 4.5 + 7 - 1)
+
+        rolls = dice.roll(np.random.default_rng(0), size=1000)
+        self.assertEqual(rolls.shape, (1000,))
+        self.assertTrue(((rolls >= 2) & (rolls <= 19)).all())
+
+        with self.assertRaises(ValueError):
+            ebuilder.DiceExpression("3")
+
+    def test_damage_index(self):
+        """Test computing the damage per round of monsters"""
+        monsters = pd.DataFrame({"action": [
+            [
+                {
+                    "name": "Multiattack",
+                    "text": "The dragon makes three attacks: one with its bite and "
+                    "two with its claws."
+                },
+                {
+                    "name": "Bite",
+                    "text": "Melee Weapon Attack: +7 to hit, reach 10 ft. Hit: 15 "
+                    "(2d10 + 4) piercing damage plus 4 (1d8) fire damage."
+                },
+                {
+                    "name": "Claw",
+                    "text": "Melee Weapon Attack: +7 to hit. Hit: 11 (2d6 + 4) slashing "
+                    "damage."
+                },
+                {
+                    "name": "Fire Breath (Recharge 5-6)",
+                    "text": "Each creature must make a DC 15 Dexterity saving throw, "
+                    "taking 91 (26d6) fire damage on a failed save."
+                },
+            ],
+            str({"name": "Slam", "attack": "Slam|+3|1d6+1"}),
+            None,
+        ]})
+
+        index = ebuilder.damage_index(monsters)
+        print("")
+        print(index)
+
+        # The breath weapon beats three bites on a third of the rounds
+        self.assertAlmostEqual(index.loc[0, "dpr_mean"], 91 / 3 + 58.5 * 2 / 3)
+        self.assertEqual(index.loc[0, "to_hit"], 7)
+        self.assertEqual(index.loc[0, "save_dc"], 15)
+
+        self.assertEqual(index.loc[1, "dpr_mean"], 4.5)
+        self.assertEqual(index.loc[1, "to_hit"], 3)
+
+        self.assertEqual(index.loc[2, "dpr_mean"], 0)
+        self.assertTrue(np.isnan(index.loc[2, "to_hit"]))
@@ -8,12 +8,22 @@ Tests for encounter builder
 
 """
 
+import io
+
 import os
 
+import shutil
+
 import json
 
+import tempfile
+
 import unittest
 
+from unittest import mock
+
+import pandas as pd
+
 from .context import ebuilder
 
 
@@ -40,6 +50,35 @@ class TestRandomizer(unittest.TestCase):
         import pprint
         pprint.pprint(sorted(list(set(sources))))
     
+    def test_shards(self):
+        """Test that only changed compendium files are parsed again"""
+        with tempfile.TemporaryDirectory() as data_dir:
+            for compendium_file in ebuilder.randomizer.compendium_files():
+                shutil.copy(compendium_file, data_dir)
+            rand = ebuilder.Randomizer(data_dir=data_dir)
+            files = ebuilder.randomizer.compendium_files(data_dir)
+            self.assertEqual(rand.update_shards(), files)
+            self.assertEqual(rand.update_shards(), [])
+
+            # A newer file with the same contents is hashed but not parsed
+            for compendium_file in files:
+                os.utime(compendium_file)
+                manifest = rand.read_shard(compendium_file)
+                print(manifest)
+                self.assertEqual(rand.update_shards(), [])
+                self.assertEqual(
+                    rand.read_shard(compendium_file)["sha256"], manifest["sha256"]
+                )
+            df = rand.create_csv("spell")
+            self.assertEqual(len(df), sum(
+                rand.read_shard(f)["categories"].get("spell", 0) for f in files
+            ))
+            self.assertTrue(os.path.isfile(os.path.join(data_dir, "compendium_spell.csv")))
+
+            # Partial shards are rebuilt
+            os.remove(os.path.join(rand.shard_directory(files[0]), "manifest.json"))
+            self.assertEqual(len(rand.create_csv("spell")), len(df))
+
     def test_random(self):
         """Test generating a random item"""
         rand = ebuilder.Randomizer()
@@ -47,3 +86,251 @@ class TestRandomizer(unittest.TestCase):
         rand.random_item("item", rarity=["rare", "very"], type=["wand"])
         rand.random_item("spell", level=["1"])
 
+
+    def test_compact(self):
+        """Test the compact compendium dtypes and filtering on them"""
+        rand = ebuilder.Randomizer()
+        monsters = rand.get_compendium("monster")
+        print(monsters.dtypes)
+        self.assertEqual(monsters["owned"].dtype, bool)
+        self.assertTrue(monsters["cr"].cat.ordered)
+        self.assertTrue((monsters["cr"] >= "1/2").equals(
+            monsters["cr"].astype(str).map(ebuilder.cr_str_to_num) >= 0.5
+        ))
+        self.assertEqual(rand.get_compendium("spell")["level"].dtype.name, "Int8")
+        # Integer columns with text are kept as text
+        odd = ebuilder.randomizer.compact_compendium(pd.DataFrame({"level": ["1", "x"]}))
+        self.assertEqual(odd["level"].tolist(), ["1", "x"])
+
+        items = rand.get_compendium("item")
+        self.assertEqual(items["rarity"].dtype, "category")
+        for _ in range(10):
+            picked = rand.random_item("item", num=2, rarity=["rare", "very"], type=["wand"])
+            self.assertTrue(picked["rarity"].isin(["rare", "very"]).all())
+            self.assertTrue((picked["type"] == "WD").all())
+        first = monsters.iloc[0]
+        picked = rand.random_item("monster", cr=[first["cr"]], owned=[str(first["owned"])])
+        self.assertEqual(picked.loc[0, "cr"], first["cr"])
+        self.assertEqual(picked.loc[0, "owned"], first["owned"])
+
+    def test_projection(self):
+        """Test loading compendiums without their long text columns"""
+        rand = ebuilder.Randomizer()
+        light = rand.get_compendium("monster", text=False)
+        print(light.dtypes)
+        self.assertFalse(set(light.columns) & set(ebuilder.randomizer.TEXT_COLUMNS))
+        self.assertIn("dpr_mean", light.columns)
+        names = rand.get_compendium("monster", columns=["name", "cr"])
+        self.assertEqual(list(names.columns), ["name", "cr"])
+        with self.assertRaises(KeyError):
+            rand.get_compendium("monster", columns=["hit_points"])
+
+        # Text read for selected rows matches the full compendium
+        rows = [2, 0, len(light) - 1]
+        text = rand.get_text("monster", rows)
+        full = ebuilder.Randomizer().get_compendium("monster")
+        for column in text:
+            self.assertEqual(
+                text[column].tolist(), full[column].iloc[rows].tolist()
+            )
+
+        picked = rand.random_item("item", num=3)
+        self.assertEqual(list(picked.columns), rand.columns("item"))
+        self.assertTrue(picked["text"].notna().any())
+
+    def test_search(self):
+        """Test keyword queries combined with the column filters"""
+        rand = ebuilder.Randomizer()
+        monsters = rand.get_compendium("monster")
+        name = monsters.loc[0, "name"]
+
+        # The name is weighted above the text
+        matches = rand.search("monster", f'"{name}"')
+        print(matches[["name", "cr", "score"]])
+        self.assertEqual(matches.loc[0, "name"], name)
+        self.assertTrue(matches["score"].is_monotonic_decreasing)
+        self.assertEqual(ebuilder.Monster.from_search(f'"{name}"').name, name)
+
+        # Filters and the query both apply
+        cr = monsters.loc[0, "cr"]
+        filtered = rand.search("monster", f'"{name}"', cr=[cr])
+        self.assertTrue((filtered["cr"] == cr).all())
+        picked = rand.random_item("monster", search=f'"{name}"', cr=[cr])
+        self.assertIn(picked.loc[0, "name"], set(filtered["name"]))
+
+        self.assertTrue(rand.search("monster", "zzzunmatchedzzz").empty)
+
+        # The keys of the blocks and the source citations are not indexed
+        with tempfile.TemporaryDirectory() as index_dir:
+            filename = os.path.join(index_dir, "search.sqlite")
+            ebuilder.search.SearchIndex.write(filename, pd.DataFrame({
+                "name": ["Goblin", "Wolf"],
+                "trait": [
+                    json.dumps([{"name": "Nimble Escape", "text": ["Disengage."]}]),
+                    json.dumps([
+                        {"name": "Pack Tactics", "text": ["Advantage."]},
+                        {"name": "Keen Hearing", "text": ["Source: Monster Manual p. 341"]},
+                    ]),
+                ],
+            }))
+            index = ebuilder.search.SearchIndex(filename)
+            for word in ["text", "name", "source", "manual"]:
+                self.assertEqual(len(index.search(word)[0]), 0)
+            self.assertEqual(index.search('"pack tactics"')[0].tolist(), [1])
+            self.assertEqual(index.search("disengage")[0].tolist(), [0])
+        with self.assertRaises(ValueError):
+            rand.search("monster", '"unbalanced')
+
+    def test_library(self):
+        """Test filtering by the books of a library at query time"""
+        rand = ebuilder.Randomizer()
+        monsters = rand.get_compendium("monster")
+        book = monsters.loc[0, "book"]
+        library = ebuilder.Library([book + ","])
+        print(library)
+        self.assertIn(book, library)
+
+        owned = library.owned(monsters["book"])
+        self.assertTrue((owned == (monsters["book"] == book).to_numpy()).all())
+        for _ in range(5):
+            picked = rand.random_item("monster", num=2, library=library)
+            self.assertTrue((picked["book"] == book).all())
+            self.assertTrue(picked["owned"].all())
+            picked = rand.random_item("monster", library=library, owned=["True"])
+            self.assertEqual(picked.loc[0, "book"], book)
+
+        # The owned filter does not widen the library
+        with self.assertRaises(RuntimeError):
+            rand.random_item("monster", library=library, owned=["False"])
+        picked = rand.random_item("monster", owned=["False"])
+        self.assertFalse(picked.loc[0, "owned"])
+
+        other = monsters.loc[monsters["book"] != book, "name"].iloc[0]
+        ebuilder.Monster.from_name(other)
+        with self.assertRaises(KeyError):
+            ebuilder.Monster.from_name(other, library=library)
+
+    def test_loot_sampler(self):
+        """Test that loot does not repeat until every candidate has been issued"""
+        sampler = ebuilder.LootSampler("item", seed=0)
+        num_wands = len(sampler.randomizer.candidates("item", type=["wand"])[1])
+        names = []
+        for _ in range(num_wands):
+            names.extend(sampler.draw(type=["wand"])["name"])
+        print(names)
+        self.assertEqual(len(set(names)), num_wands)
+        self.assertEqual(len(sampler), num_wands)
+        # Every wand has been issued, so the next draw repeats one
+        self.assertIn(sampler.draw(type=["wand"]).loc[0, "name"], names)
+
+        other = sampler.draw(num=3)
+        self.assertEqual(len(set(other["name"])), 3)
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "loot.npz")
+            sampler.save(filename)
+            restored = ebuilder.LootSampler.load(filename)
+        self.assertTrue((restored.issued_rows() == sampler.issued_rows()).all())
+        issued = set(names) | set(other["name"])
+        self.assertFalse(set(restored.draw(num=3)["name"]) & issued)
+
+    def test_render(self):
+        """Test the structured text and the streaming renderers"""
+        entry = [{"name": "Bite", "text": "Hit: 7 (2d6) piercing damage."}, None]
+        encoded = ebuilder.textstore.encode_text(entry)
+        self.assertEqual(ebuilder.textstore.parse_text(encoded), entry[:1])
+        # Compendiums built before the text was stored as JSON
+        self.assertEqual(ebuilder.textstore.parse_text(str(entry[:1])), entry[:1])
+        self.assertEqual(
+            ebuilder.textstore.paragraphs(encoded), ["Bite. Hit: 7 (2d6) piercing damage."]
+        )
+
+        rand = ebuilder.Randomizer()
+        items = list(rand.iter_random_items("monster", num=5, chunk_size=2))
+        self.assertEqual(len(items), 5)
+        self.assertEqual(len({item["name"] for item in items}), 5)
+        self.assertIsInstance(items[0]["action"], list)
+
+        for output_format in ebuilder.render.RENDERERS:
+            stream = io.StringIO()
+            self.assertEqual(ebuilder.render_items(items, output_format, stream), 5)
+            print(stream.getvalue()[:500])
+            self.assertIn(items[0]["name"], stream.getvalue())
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 6)
+        with self.assertRaises(TypeError):
+            ebuilder.render.Renderer(stream)
+
+    def test_deduplicate(self):
+        """Test merging entries of several books and the unique lookups"""
+        def goblin(book, text="Nimble Escape."):
+            return {
+                "name": "Goblin",
+                "cr": "1/4",
+                "trait": json.dumps([{"name": "Nimble", "text": [text, f"Source: {book} p. 1"]}]),
+                "source": f"Source: {book} p. 1",
+                "book": book,
+                "owned": "True",
+            }
+
+        df = pd.DataFrame([
+            goblin("Monster Manual"),
+            goblin("Monster Manual 2024"),
+            goblin("Lost Mines of Phandelver"),
+            goblin("Monster Manual 2024", "Different text."),
+        ])
+        merged, aliases = ebuilder.randomizer.deduplicate(df)
+        print(merged)
+        print(aliases)
+        self.assertEqual(len(merged), 2)
+        self.assertTrue(merged["entity_id"].is_unique)
+        self.assertEqual(merged.loc[merged["canonical"], "book"].tolist(), ["Monster Manual 2024"])
+        self.assertEqual(
+            sorted(aliases["alias"]),
+            ["goblin (lost mines of phandelver)", "goblin (monster manual)"],
+        )
+        merged, _ = ebuilder.randomizer.deduplicate(df, precedence=["Monster Manual"])
+        self.assertEqual(merged.loc[merged["canonical"], "book"].tolist(), ["Monster Manual"])
+
+        monsters = ebuilder.monsters.MONSTERS
+        self.assertTrue(monsters.index.is_unique)
+        rand = ebuilder.Randomizer()
+        keys, aliases = rand.entities("monster")
+        self.assertTrue(keys.equals(monsters.index))
+        for alias, key in list(aliases.items())[:5]:
+            self.assertEqual(ebuilder.Monster.from_name(alias).cr, ebuilder.Monster.from_name(key).cr)
+
+    def test_library_lookup(self):
+        """Test finding the copy of a monster from the books of a library"""
+        df = pd.DataFrame({
+            "name": ["Goblin", "Goblin", "Goblin"],
+            "cr": ["1/4", "1/4", "1"],
+            "trait": ["Nimble Escape.", "Nimble Escape.", "Goblin Boss."],
+            "book": ["Monster Manual 2024", "Monster Manual", "Lost Mines of Phandelver"],
+        })
+        merged, aliases = ebuilder.randomizer.deduplicate(df)
+        keys, aliases = ebuilder.Randomizer._entities(merged, aliases)
+        monsters = merged.set_axis(keys)
+        print(monsters)
+
+        with mock.patch.multiple(
+            ebuilder.monsters, MONSTERS=monsters, MONSTER_ALIASES=aliases
+        ):
+            monster_key = ebuilder.monsters.monster_key
+            self.assertEqual(monster_key("Goblin"), "goblin")
+            # Merged into the entry of another book
+            self.assertEqual(monster_key("Goblin", ["Monster Manual"]), "goblin")
+            # Variant of the name in the library
+            variant = monster_key("Goblin", ["Lost Mines of Phandelver"])
+            self.assertEqual(variant, "goblin (lost mines of phandelver)")
+            self.assertEqual(
+                ebuilder.Monster.from_name("Goblin", library=["Lost Mines of Phandelver"]).cr,
+                1
+            )
+            self.assertIsNone(monster_key("Goblin", ["Tome of Beasts"]))
+            with self.assertRaises(KeyError):
+                ebuilder.Monster.from_name("Goblin", library=["Tome of Beasts"])
+
+            # Matches keep the book they were found in
+            self.assertEqual(ebuilder.Monster.from_key(variant).name, "Goblin")
+            self.assertEqual(ebuilder.Monster.from_key(variant).cr, 1)
@@ -0,0 +1,82 @@
+"""
+
+=================
+test_simulator.py
+=================
+
+Tests for the combat simulator
+
+"""
+
+import os
+
+import unittest
+
+import numpy as np
+
+from .context import ebuilder
+
+
+class TestSimulator(unittest.TestCase):
+    """
+    Tests for CombatSimulator
+    """
+
+    def setUp(self):
+        """
+        Common setup for all tests
+        """
+        self.input_dir = os.path.join(os.path.dirname(__file__), "inputs")
+        self.party = ebuilder.Party.from_json(
+            os.path.join(self.input_dir, "test_party.json")
+        )
+
+    def test_simulate(self):
+        """Test simulating an encounter"""
+        monster_party = ebuilder.MonsterParty.from_json(
+            os.path.join(self.input_dir, "test_monsters.json")
+        )
+        encounter = ebuilder.Encounter(self.party, monster_party)
+
+        simulator = ebuilder.CombatSimulator(encounter)
+        results = simulator.run(num_fights=2000, seed=0)
+
+        self.assertEqual(results["fights"], 2000)
+        self.assertTrue(0 <= results["win_rate"] <= 1)
+        self.assertTrue(0 <= results["pcs_down"] <= len(self.party))
+        self.assertTrue(0 <= results["hp_lost"] <= 1)
+        self.assertEqual(results["difficulty"], encounter.difficulty(method="cr2"))
+
+        # Same seed gives the same results
+        self.assertEqual(results, simulator.run(num_fights=2000, seed=0))
+
+    def test_simulate_jobs(self):
+        """Test splitting a simulation across processes"""
+        encounter = ebuilder.Encounter(
+            self.party, ebuilder.MonsterParty.from_cr([0.125] * 20)
+        )
+        results = ebuilder.CombatSimulator(encounter).run(
+            num_fights=2000, jobs=2, seed=0
+        )
+        self.assertEqual(results["fights"], 2000)
+
+    def test_simulate_ordering(self):
+        """Test harder encounters are lost more often"""
+        easy = ebuilder.Encounter(self.party, ebuilder.MonsterParty.from_cr([1]))
+        hard = ebuilder.Encounter(self.party, ebuilder.MonsterParty.from_cr([20]))
+
+        easy_results = ebuilder.CombatSimulator(easy).run(num_fights=1000, seed=0)
+        hard_results = ebuilder.CombatSimulator(hard).run(num_fights=1000, seed=0)
+        self.assertGreater(easy_results["win_rate"], hard_results["win_rate"])
+        self.assertLess(easy_results["hp_lost"], hard_results["hp_lost"])
+
+    def test_roll_d20(self):
+        """Test that advantage and disadvantage cancel out"""
+        flags = np.array([[False, False], [True, False], [False, True], [True, True]])
+        shape = (len(flags), 20000)
+        rolls = ebuilder.simulator._roll_d20(
+            np.random.default_rng(0), shape, flags[:, :1], flags[:, 1:]
+        )
+        means = rolls.mean(axis=1)
+        # A straight roll averages 10.5, advantage 13.8, and disadvantage 7.2
+        np.testing.assert_allclose(means, [10.5, 13.825, 7.175, 10.5], atol=0.15)
@@ -0,0 +1,68 @@
+"""
+
+================
+test_workload.py
+================
+
+Tests for the synthetic workload generators
+
+"""
+
+import os
+
+import json
+
+import tempfile
+
+import pandas as pd
+
+import xmltodict
+
+import unittest
+
+from .context import ebuilder
+import ebuilder.workload
+
+
+class TestWorkload(unittest.TestCase):
+    """
+    Tests for synthetic workloads
+    """
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def test_party_and_encounter(self):
+        """Test synthetic party and encounter JSON files load and score"""
+        party_json = os.path.join(self.output_dir, "party.json")
+        encounter_json = os.path.join(self.output_dir, "encounter.json")
+        self.assertEqual(ebuilder.workload.write_party_json(party_json, 500, seed=1), 500)
+        ebuilder.workload.write_encounter_json(encounter_json, 500, seed=1, level=10)
+
+        party = ebuilder.Party.from_json(party_json)
+        monster_party = ebuilder.MonsterParty.from_json(encounter_json)
+        print(ebuilder.Encounter(party, monster_party).difficulty())
+        self.assertEqual(len(party), 500)
+        self.assertTrue(all([pc.power() > 0 for pc in party.pcs]))
+        self.assertEqual(monster_party.count(), 500)
+        monster_party.power(party.tier())
+
+        # Seeded output is reproducible
+        other_json = os.path.join(self.output_dir, "other.json")
+        ebuilder.workload.write_party_json(other_json, 500, seed=1)
+        with open(party_json, "r") as first, open(other_json, "r") as second:
+            self.assertEqual(json.load(first), json.load(second))
+
+    def test_compendium(self):
+        """Test synthetic compendium XML has the expected structure"""
+        xml_file = os.path.join(self.output_dir, "compendium.xml")
+        counts = ebuilder.workload.write_compendium_xml(xml_file, 25, seed=2)
+        self.assertEqual(set(counts), set(ebuilder.workload.COMPENDIUM_CATEGORIES))
+
+        with open(xml_file, "rb") as fd:
+            compendium = xmltodict.parse(fd.read())["compendium"]
+        for category in ebuilder.workload.COMPENDIUM_CATEGORIES:
+            self.assertEqual(len(compendium[category]), 25)
+
+        # Monster stat blocks parse into damage per round
+        monsters = ebuilder.dice.damage_index(pd.DataFrame(compendium["monster"]))
+        self.assertTrue((monsters["dpr_mean"] > 0).all())